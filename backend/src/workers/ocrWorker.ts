@@ -17,6 +17,10 @@ const supabase = createClient(
 );
 
 const OCR_SERVICE_URL = process.env.OCR_SERVICE_URL || "http://localhost:8000/ocr";
+// Async job API of the same service: submit once, then long-poll for the result
+const OCR_JOBS_URL = process.env.OCR_JOBS_URL || OCR_SERVICE_URL.replace(/\/ocr$/, "/jobs");
+const OCR_JOB_DEADLINE_MS = Number(process.env.OCR_JOB_DEADLINE_MS || 10 * 60 * 1000);
+const OCR_POLL_WAIT_SECONDS = 20; // Server caps a long-poll at 30s
 
 interface OcrJobData {
   jobId: string;
@@ -24,6 +28,7 @@ interface OcrJobData {
   filePath: string;
   businessId: string;
   requestId: string; // ✅ TRACING
+  priority?: "interactive" | "bulk"; // Backfills pass "bulk" so uploads go first
 }
 
 logger.info("🚀 OCR WORKER BOOTING...");
@@ -60,10 +65,25 @@ const updateJobStatus = async (jobId: string, status: string, errorMsg?: string)
   }
 };
 
+// ✅ HELPER: Wait for an OCR job (202 = still queued/running; errors throw like /ocr did)
+const waitForOcrJob = async (jobId: string, requestId?: string) => {
+  const deadline = Date.now() + OCR_JOB_DEADLINE_MS;
+  while (Date.now() < deadline) {
+    const response = await axios.get(`${OCR_JOBS_URL}/${encodeURIComponent(jobId)}`, {
+      params: { wait: OCR_POLL_WAIT_SECONDS },
+      headers: requestId ? { "X-Request-ID": requestId } : {},
+      timeout: (OCR_POLL_WAIT_SECONDS + 10) * 1000,
+      maxContentLength: Infinity,
+    });
+    if (response.status !== 202) return response;
+  }
+  throw new Error(`OCR job ${jobId} not finished after ${OCR_JOB_DEADLINE_MS}ms`);
+};
+
 const worker = new Worker<OcrJobData>(
   "ocr",
   async (job: Job<OcrJobData>) => {
-    const { jobId, invoiceId, filePath, businessId, requestId } = job.data;
+    const { jobId, invoiceId, filePath, businessId, requestId, priority } = job.data;
     const endTimer = ocrJobDurationSeconds.startTimer(); 
     
     const jobLogger = createChildLogger({ 
@@ -90,26 +110,33 @@ const worker = new Worker<OcrJobData>(
         filePath
       );
 
-      // 4️⃣ CALL OCR SERVICE
+      // 4️⃣ SUBMIT OCR JOB, THEN POLL
+      // Submission is idempotent on job_id: a retry attaches to the job still running
+      // (or its finished result) instead of starting the OCR over
       const form = new FormData();
       form.append("file", fileStream, { filename: "invoice.pdf" });
       form.append("business_id", businessId);
       form.append("job_id", jobId);
+      form.append("priority", priority || "interactive");
 
-      jobLogger.info({ msg: "Sending to Python Service", url: OCR_SERVICE_URL });
-      
-      const response = await axios.post(OCR_SERVICE_URL, form, {
-        headers: { ...form.getHeaders() },
-        timeout: 60000, 
+      jobLogger.info({ msg: "Submitting to Python Service", url: OCR_JOBS_URL });
+
+      const submitted = await axios.post(OCR_JOBS_URL, form, {
+        headers: { ...form.getHeaders(), ...(requestId ? { "X-Request-ID": requestId } : {}) },
+        timeout: 60000,
         maxContentLength: Infinity,
         maxBodyLength: Infinity,
       });
+      jobLogger.info({ msg: "OCR job submitted", status: submitted.data.status, attached: submitted.data.attached });
+
+      const response = await waitForOcrJob(jobId, requestId);
 
       if (response.data.status !== "success") {
         throw new Error(response.data.message || "OCR Service returned failure");
       }
 
-      jobLogger.info("✅ OCR Success");
+      // Where the OCR service spent its time (the trace id finds its trace log line)
+      jobLogger.info({ msg: "✅ OCR Success", traceId: response.data.metrics?.trace?.trace_id, job: response.data.job });
 
       // 5️⃣ SAVE RESULTS (Atomic-ish)
       const versionId = uuid();
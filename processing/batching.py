@@ -0,0 +1,152 @@
+"""
+Micro-Batching Module
+Groups OCR requests and PDF pages into batches so text recognition runs
+over all of their crops at once instead of one image per ocr() call.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from inference_pool import InferencePool, get_engine
+from tokens import TokenTable
+
+logger = logging.getLogger("ocr-service.batching")
+
+
+def ocr_batch(images: List[np.ndarray], cls: bool = True) -> List[TokenTable]:
+    """
+    Run PaddleOCR over several images, batching recognition across all of them.
+    Detection still runs per image (inputs have different sizes); the crops of
+    every image then go through the angle classifier and recognizer together.
+    Returns one TokenTable per input image, in order.
+    """
+    # PaddleOCR puts its own `tools` package on sys.path when imported
+    from tools.infer.predict_system import sorted_boxes
+    from tools.infer.utility import get_rotate_crop_image
+
+    engine = get_engine()
+    owners: List[Tuple[int, np.ndarray]] = []
+    crops: List[np.ndarray] = []
+    for index, img in enumerate(images):
+        dt_boxes, _ = engine.text_detector(img)
+        if dt_boxes is None:
+            continue
+        for box in sorted_boxes(dt_boxes):
+            owners.append((index, box))
+            crops.append(get_rotate_crop_image(img, box.copy()))
+
+    if not crops:
+        return [TokenTable.empty() for _ in images]
+
+    if engine.use_angle_cls and cls:
+        crops, _, _ = engine.text_classifier(crops)
+    rec_res, _ = engine.text_recognizer(crops)
+
+    # Column lists per image, turned into one table each at the end
+    columns: List[Tuple[List[str], List[np.ndarray], List[float]]] = [([], [], []) for _ in images]
+    for (index, box), (text, score) in zip(owners, rec_res):
+        if score < engine.drop_score:
+            continue
+        texts, boxes, scores = columns[index]
+        texts.append(text)
+        boxes.append(box)
+        scores.append(float(score))
+    return [TokenTable(texts, np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2), scores)
+            for texts, boxes, scores in columns]
+
+
+class MicroBatcher:
+    """
+    Collects images submitted from many requests and flushes them as one
+    batch when `max_batch_size` is reached or `max_wait_ms` has passed since
+    the first queued image. Up to `pool.workers` batches run at once; while
+    they run, new submissions accumulate into the next (fuller) batch.
+    """
+
+    def __init__(self, pool: InferencePool, max_batch_size: int = 8, max_wait_ms: float = 20):
+        self.pool = pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatched: set = set()
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+
+    def start(self) -> None:
+        """Start the scheduler on the running event loop."""
+        if self._runner is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.pool.workers)
+        self._runner = asyncio.create_task(self._run())
+        logger.info(f"Micro-batcher started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:g})")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    async def submit(self, img: np.ndarray) -> TokenTable:
+        """Queue one image and wait for its OCR result."""
+        if self._queue is None:
+            raise RuntimeError("Micro-batcher not started")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((img, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Keep filling the next batch while every worker is busy
+            await self._slots.acquire()
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatched.add(task)
+            task.add_done_callback(self._dispatched.discard)
+
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        self._batches += 1
+        self._items += len(batch)
+        self._largest = max(self._largest, len(batch))
+        try:
+            results = await self.pool.run(ocr_batch, [img for img, _ in batch])
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters; fill_ratio is the mean batch size over max_batch_size."""
+        mean = self._items / self._batches if self._batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": round(mean, 3),
+            "largest_batch": self._largest,
+            "fill_ratio": round(mean / self.max_batch_size, 3),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -0,0 +1,89 @@
+"""
+Layout Benchmark
+Compares the NumPy layout_reconstruction against the previous per-item
+Python implementation on synthetic invoice pages.
+
+Usage: python benchmarks/bench_layout.py [--sizes 100 1000 5000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from layout_reconstruction import layout_reconstruction  # noqa: E402
+
+
+def legacy_layout(ocr_output: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The previous implementation: fixed 30px row gap, no column order."""
+    ocr_sorted = sorted(ocr_output, key=lambda x: min([pt[1] for pt in x["box"]]))
+    rows = []
+    current_row = []
+    last_y = None
+    for item in ocr_sorted:
+        y = min([pt[1] for pt in item["box"]])
+        if last_y is None or abs(y - last_y) < 30:
+            current_row.append(item)
+        else:
+            rows.append(current_row)
+            current_row = [item]
+        last_y = y
+    if current_row:
+        rows.append(current_row)
+    header_text = " ".join([cell["text"] for row in rows[:2] for cell in row])
+    footer_text = " ".join([cell["text"] for row in rows[-2:] for cell in row])
+    table_rows = [[cell["text"] for cell in row] for row in rows[2:-2]] if len(rows) > 4 else []
+    return {"header_text": header_text, "table_rows": table_rows, "footer_text": footer_text}
+
+
+def synthetic_page(n_tokens: int, columns: int = 6, seed: int = 0) -> List[Dict[str, Any]]:
+    """A table of n_tokens cells in shuffled order, with slight baseline jitter."""
+    rng = np.random.default_rng(seed)
+    col_x = np.cumsum([40] + [160] * (columns - 1))
+    out = []
+    for i in range(n_tokens):
+        row, col = divmod(i, columns)
+        x0 = col_x[col] + rng.uniform(-3, 3)
+        y0 = 40 + row * 34 + rng.uniform(-3, 3)
+        x1, y1 = x0 + rng.uniform(60, 120), y0 + 22
+        out.append({
+            "text": f"r{row}c{col}",
+            "box": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]],
+            "confidence": float(rng.uniform(0.8, 1.0)),
+        })
+    rng.shuffle(out)
+    return out
+
+
+def best_of(fn, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} | {'legacy ms':>10} {'rows':>6} | {'numpy ms':>10} {'rows':>6} {'columns':>8}")
+    for n in args.sizes:
+        page = synthetic_page(n)
+        legacy = legacy_layout(page)
+        new = layout_reconstruction(page)
+        print(
+            f"{n:>8} | {best_of(legacy_layout, page, args.repeat) * 1000:>10.2f} {len(legacy['table_rows']) + 4:>6} | "
+            f"{best_of(layout_reconstruction, page, args.repeat) * 1000:>10.2f} {len(new['rows']):>6} {len(new['columns']):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Merge Benchmark
+Compares the grid/IoU merge_ocr_results against the previous exact-coordinate
+dict merge on synthetic three-pass OCR output.
+
+Usage: python benchmarks/bench_merge.py [--sizes 100 1000 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_engine import merge_ocr_results  # noqa: E402
+
+
+def dict_merge(*results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The previous merge: boxes only merge when every coordinate matches."""
+    merged = {}
+    for res in results:
+        for item in res:
+            key = tuple(map(lambda x: int(x), np.array(item["box"]).flatten()))
+            if key not in merged or item["confidence"] > merged[key]["confidence"]:
+                merged[key] = item
+    return list(merged.values())
+
+
+def synthetic_passes(n_tokens: int, passes: int = 3, jitter: float = 2.0, seed: int = 0) -> List[List[Dict[str, Any]]]:
+    """
+    n_tokens words laid out in lines on a page; each pass sees the same words
+    with a few pixels of box jitter, like real multi-pass PaddleOCR output.
+    """
+    rng = np.random.default_rng(seed)
+    per_line = 12
+    lines = int(np.ceil(n_tokens / per_line))
+    base = []
+    for i in range(n_tokens):
+        row, col = divmod(i, per_line)
+        x0, y0 = 20 + col * 110, 20 + row * 40
+        base.append((x0, y0, x0 + 90 + rng.integers(0, 15), y0 + 26))
+    out = []
+    for p in range(passes):
+        res = []
+        for i, (x0, y0, x1, y1) in enumerate(base):
+            dx, dy = rng.uniform(-jitter, jitter, 2)
+            box = [[x0 + dx, y0 + dy], [x1 + dx, y0 + dy], [x1 + dx, y1 + dy], [x0 + dx, y1 + dy]]
+            res.append({"text": f"tok{i}", "box": box, "confidence": float(rng.uniform(0.6, 1.0))})
+        out.append(res)
+    assert lines > 0
+    return out
+
+
+def time_call(fn, args, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} {'passes':>6} | {'dict ms':>9} {'dict out':>9} | {'grid ms':>9} {'grid out':>9}")
+    for n in args.sizes:
+        passes = synthetic_passes(n)
+        t_dict = time_call(dict_merge, passes, args.repeat)
+        t_grid = time_call(merge_ocr_results, passes, args.repeat)
+        n_dict = len(dict_merge(*passes))
+        n_grid = len(merge_ocr_results(*passes))
+        print(f"{n:>8} {len(passes):>6} | {t_dict * 1000:>9.2f} {n_dict:>9} | {t_grid * 1000:>9.2f} {n_grid:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Normalization Benchmark
+Compares normalize_image against the previous implementation (minAreaRect
+over every non-zero pixel, then a full-resolution cubic warp) on synthetic
+A4 scans at 300 DPI with known skew: latency, peak RSS above the input,
+and the angle each deskew recovers.
+
+Usage: python benchmarks/bench_normalize.py [--skews 0 0.3 1.5 -4 9] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+from typing import Any, Callable, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import memstats  # noqa: E402
+from bench_quality import synthetic_page  # noqa: E402
+from normalization import estimate_skew_angle, normalize_image  # noqa: E402
+
+A4_300_DPI = (3508, 2480)
+
+
+def legacy_deskew_angle(img: np.ndarray) -> float:
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    coords = np.column_stack(np.where(gray > 0))
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle > 45:
+        angle -= 90
+    return -(90 + angle) if angle < -45 else -angle
+
+
+def legacy_normalize(img: np.ndarray) -> np.ndarray:
+    """The previous normalize_image (auto_rotate off, no recovery filters)."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    coords = np.column_stack(np.where(gray > 0))
+    if coords.shape[0] > 0:
+        angle = legacy_deskew_angle(img)
+        (h, w) = img.shape[:2]
+        M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+        img = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10)
+    blur = cv2.medianBlur(thresh, 3)
+    return cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(blur)
+
+
+def skewed_scan(rng: np.random.Generator, skew: float) -> np.ndarray:
+    """An A4 page whose text lines are rotated clockwise by skew degrees."""
+    page = synthetic_page(rng, *A4_300_DPI)
+    h, w = page.shape[:2]
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), -skew, 1.0)
+    return cv2.warpAffine(page, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, float]:
+    """(best seconds, peak RSS growth in MB of one call)."""
+    gc.collect()
+    baseline = memstats.current_rss_mb()
+    memstats.reset_peak_rss()
+    fn()
+    peak = memstats.peak_rss_mb() - baseline
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--skews", type=float, nargs="+", default=[0, 0.3, 1.5, -4, 9])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    if not memstats.reset_peak_rss():
+        print("peak RSS reset unavailable: memory column is process-wide")
+    print(f"A4 at 300 DPI ({A4_300_DPI[1]}x{A4_300_DPI[0]}), best of {args.repeat}")
+    print(f"{'skew':>6} {'legacy angle':>12} {'new angle':>10} {'legacy ms':>10} {'new ms':>8} "
+          f"{'legacy MB':>10} {'new MB':>7}")
+    for skew in args.skews:
+        img = skewed_scan(rng, skew)
+        legacy_s, legacy_mb = measure(lambda: legacy_normalize(img), args.repeat)
+        new_s, new_mb = measure(lambda: normalize_image(img, auto_rotate=False), args.repeat)
+        new_angle = estimate_skew_angle(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        print(f"{skew:6.1f} {legacy_deskew_angle(img):12.2f} {new_angle:10.2f} {legacy_s * 1000:10.1f} "
+              f"{new_s * 1000:8.1f} {legacy_mb:10.1f} {new_mb:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Preprocessing Benchmark
+Time spent preparing OCR inputs for one document that needs the recovery
+attempt (the worst case), without the OCR itself:
+
+- legacy: normalize_image per attempt, then each pass derives its input
+  from the normalized BGR image (convertScaleAbs, fastNlMeansDenoisingColored)
+- fused: one DocumentVariants per document; variants are built once from
+  the shared deskewed gray image and the recovery attempt only adds its
+  own variant. Reported for every denoiser.
+
+Usage: python benchmarks/bench_preprocess.py [--dimension 2000] [--skip-legacy]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_quality import degrade, synthetic_page  # noqa: E402
+from normalization import normalize_image  # noqa: E402
+from preprocessing import DENOISERS, DocumentVariants  # noqa: E402
+
+LEGACY_PASSES = [
+    lambda img: img,
+    lambda img: cv2.convertScaleAbs(img, alpha=1.5, beta=0),
+    lambda img: cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21),
+]
+
+
+def legacy_inputs(img: np.ndarray) -> List[np.ndarray]:
+    """Both attempts as before: normalize per attempt, three passes each."""
+    inputs = []
+    for recovery_mode in (False, True):
+        normalized = cv2.cvtColor(normalize_image(img, recovery_mode=recovery_mode, auto_rotate=False),
+                                  cv2.COLOR_GRAY2BGR)
+        inputs += [prepare(normalized) for prepare in LEGACY_PASSES]
+    return inputs
+
+
+def fused_inputs(img: np.ndarray, denoiser: str) -> List[np.ndarray]:
+    """Both attempts through one DocumentVariants: five distinct variants."""
+    doc = DocumentVariants(img, denoiser=denoiser)
+    return [doc.get(name) for name in ("binarized", "high_contrast", "denoised", "recovery")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dimension", type=int, default=2000, help="Page height (the service's MAX_IMAGE_DIMENSION)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Colored NL-means takes tens of seconds per page")
+    parser.add_argument("--seed", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    page = synthetic_page(rng, args.dimension, int(args.dimension / 1.414))
+    img = degrade(page, rng, blur=0.8, noise=4, exposure=0.85)
+    print(f"page {img.shape[1]}x{img.shape[0]}, both attempts (first + recovery)")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        legacy_inputs(img)
+        print(f"{'legacy':>22} {(time.perf_counter() - start) * 1000:10.1f} ms  (6 inputs)")
+
+    for denoiser in DENOISERS:
+        start = time.perf_counter()
+        fused_inputs(img, denoiser)
+        total = time.perf_counter() - start
+        # Denoise pass skipped on confident documents: the variant is never built
+        start = time.perf_counter()
+        doc = DocumentVariants(img, denoiser=denoiser)
+        for name in ("binarized", "high_contrast", "recovery"):
+            doc.get(name)
+        without = time.perf_counter() - start
+        print(f"{'fused/' + denoiser:>22} {total * 1000:10.1f} ms  (4 inputs; {without * 1000:.1f} ms without denoise pass)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Quality Gate Benchmark
+Compares check_image_quality against the previous full-resolution gate on
+synthetic invoice photos (blur, sensor noise, exposure): agreement of the
+verdicts, error of the sampled sharpness/brightness, and time per image
+for decoded arrays and for encoded phone-size JPEGs.
+
+The reference is the previous gate exactly as it ran: on the upload
+decoded at full resolution, so the JPEG timings are end to end and the
+agreement includes the effect of measuring at REFERENCE_DIMENSION.
+
+Usage: python benchmarks/bench_quality.py [--pages 6] [--photo-size 4000 3000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quality_gate import check_image_quality  # noqa: E402
+
+CHARS = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .,:/-")
+BLUR_SIGMAS = [0, 0.7, 1.2, 1.8, 2.5, 3.5, 5]
+NOISE_SIGMAS = [0, 1.5, 3]
+EXPOSURES = [0.3, 1.0, 1.15]
+
+
+def legacy_check(image: Any) -> Dict[str, Any]:
+    """The previous gate: full-resolution gray conversion and float64 Laplacian."""
+    img = image if isinstance(image, np.ndarray) else cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return {"status": "rejected", "reason": "File not readable"}
+    h, w = img.shape[:2]
+    if h < 1000 or w < 1000:
+        return {"status": "rejected", "reason": "Image too small (<1000px)"}
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    lap_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+    brightness = float(np.mean(gray))
+    metrics = {"sharpness": lap_var, "brightness": brightness}
+    if lap_var < 100:
+        return {"status": "rejected", "reason": "Image too blurry (variance < 100)", "metrics": metrics}
+    if brightness < 80:
+        return {"status": "rejected", "reason": "Image too dark (brightness < 80)", "metrics": metrics}
+    if brightness > 200:
+        return {"status": "rejected", "reason": "Image too bright (brightness > 200)", "metrics": metrics}
+    return {"status": "passed", "reason": "OK", "metrics": metrics}
+
+
+def synthetic_page(rng: np.random.Generator, height: int, width: int) -> np.ndarray:
+    """A BGR page of printed text lines on slightly tinted paper."""
+    paper = rng.integers(205, 245, size=3).tolist()
+    page = np.empty((height, width, 3), dtype=np.uint8)
+    page[:] = paper
+    unit = height / 2000
+    y = int(80 * unit)
+    while y < height - 40 * unit:
+        scale = rng.uniform(0.5, 1.3) * unit
+        text = "".join(rng.choice(CHARS, size=int(rng.integers(10, 70))))
+        ink = int(rng.integers(10, 80))
+        cv2.putText(page, text, (int(rng.integers(30, 200) * unit), y), cv2.FONT_HERSHEY_SIMPLEX,
+                    scale, (ink, ink, ink), max(1, int(rng.integers(1, 3) * unit)), cv2.LINE_AA)
+        y += int(rng.integers(25, 90) * unit)
+    return page
+
+
+def degrade(page: np.ndarray, rng: np.random.Generator, blur: float, noise: float, exposure: float) -> np.ndarray:
+    img = page.astype(np.float32) * exposure
+    if blur:
+        img = cv2.GaussianBlur(img, (0, 0), blur * page.shape[0] / 2000)
+    if noise:
+        img += rng.normal(0, noise, img.shape).astype(np.float32)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def best_time(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(cases: List[Tuple[Any, Any]], repeat: int) -> Dict[str, Any]:
+    """cases: (input for the new gate, input for the legacy gate)."""
+    agree = 0
+    sharp_err: List[float] = []
+    bright_err: List[float] = []
+    legacy_s = new_s = 0.0
+    for new_input, legacy_input in cases:
+        old = legacy_check(legacy_input)
+        new = check_image_quality(new_input)
+        agree += old["status"] == new["status"]
+        if "metrics" in old and "sharpness" in new["metrics"]:
+            sharp_err.append(abs(new["metrics"]["sharpness"] / old["metrics"]["sharpness"] - 1))
+            bright_err.append(abs(new["metrics"]["brightness"] - old["metrics"]["brightness"]))
+        legacy_s += best_time(lambda: legacy_check(legacy_input), repeat)
+        new_s += best_time(lambda: check_image_quality(new_input), repeat)
+    return {
+        "agreement": round(agree / len(cases), 3),
+        "sharpness_rel_err_p50": round(float(np.median(sharp_err)), 4),
+        "sharpness_rel_err_max": round(float(np.max(sharp_err)), 4),
+        "brightness_abs_err_max": round(float(np.max(bright_err)), 3),
+        "legacy_ms": round(legacy_s / len(cases) * 1000, 2),
+        "new_ms": round(new_s / len(cases) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--photo-size", type=int, nargs=2, default=[4000, 3000], help="Phone photo height width")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    arrays = []
+    for _ in range(args.pages):
+        page = synthetic_page(rng, 2000, 1414)
+        for blur in BLUR_SIGMAS:
+            for noise in NOISE_SIGMAS:
+                img = degrade(page, rng, blur, noise, EXPOSURES[int(rng.integers(len(EXPOSURES)))])
+                arrays.append((img, img))
+    print(f"decoded 2000x1414 arrays ({len(arrays)}):", compare(arrays, args.repeat))
+
+    photos = []
+    height, width = args.photo_size
+    for _ in range(max(1, args.pages // 3)):
+        page = synthetic_page(rng, height, width)
+        for blur in BLUR_SIGMAS[::2]:
+            img = degrade(page, rng, blur, NOISE_SIGMAS[1], 1.0)
+            jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+            photos.append((jpeg, jpeg))  # Legacy decodes at full size
+    print(f"{width}x{height} JPEG bytes ({len(photos)}):", compare(photos, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
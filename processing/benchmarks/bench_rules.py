@@ -0,0 +1,177 @@
+"""
+Rule Extractor Benchmark
+Compares the single-pass rule_based_extract against the previous
+per-field implementation (first hit only, and extended to collect every
+match) on a corpus of synthetic Indian invoices, and reports how often the
+rules alone yield the fields needed to skip the LLM.
+
+Usage: python benchmarks/bench_rules.py [--docs 2000] [--items 5 40] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rule_extractor import rule_based_extract  # noqa: E402
+
+STATES = [("Karnataka", "29"), ("Maharashtra", "27"), ("Tamil Nadu", "33"), ("Delhi", "07"), ("Gujarat", "24")]
+INVOICE_LABELS = ["Invoice No", "Invoice No.", "Invoice Number", "Inv No", "Bill No", "Tax Invoice No", "Invoice #"]
+DATE_LABELS = ["Invoice Date", "Date", "Dated", "Bill Date", "Date of Invoice"]
+HSN_CODES = ["8471", "847130", "998314", "3004", "85176290", "9403", "620520"]
+RATES = [5, 12, 18, 28]
+
+
+def legacy_extract(text: str) -> Dict[str, Any]:
+    """The previous implementation: six independent re.search calls, first hit only."""
+    patterns = {
+        "gstin": r"[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}",
+        "invoice_number": r"(?:Invoice\s*No\.?|Inv\.?\s*No\.?|Bill\s*No\.?)[^\dA-Z]*([A-Z0-9\-/]+)",
+        "date": r"\b(\d{2}[/-]\d{2}[/-]\d{4})\b",
+        "phone": r"\b[6-9][0-9]{9}\b",
+        "hsn": r"\b[0-9]{4,8}\b",
+        "tax_percent": r"(\d{1,2}\.\d{1,2}|\d{1,2})%"
+    }
+    result = {}
+    for key, pat in patterns.items():
+        m = re.search(pat, text, re.IGNORECASE)
+        if m:
+            result[key] = m.group(1) if m.lastindex else m.group(0)
+    return result
+
+
+_LEGACY_PATTERNS = {
+    "gstin": re.compile(r"[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}", re.IGNORECASE),
+    "invoice_number": re.compile(r"(?:Invoice\s*No\.?|Inv\.?\s*No\.?|Bill\s*No\.?)[^\dA-Z]*([A-Z0-9\-/]+)", re.IGNORECASE),
+    "date": re.compile(r"\b(\d{2}[/-]\d{2}[/-]\d{4})\b", re.IGNORECASE),
+    "phone": re.compile(r"\b[6-9][0-9]{9}\b", re.IGNORECASE),
+    "hsn": re.compile(r"\b[0-9]{4,8}\b", re.IGNORECASE),
+    "tax_percent": re.compile(r"(\d{1,2}\.\d{1,2}|\d{1,2})%", re.IGNORECASE),
+}
+
+
+def legacy_all_matches(text: str) -> Dict[str, Any]:
+    """Legacy patterns, precompiled, collecting every match: one scan per field."""
+    result = {}
+    for key, pattern in _LEGACY_PATTERNS.items():
+        values = [m.group(1) if m.lastindex else m.group(0) for m in pattern.finditer(text)]
+        if values:
+            result[key] = values[0]
+            result[key + "_all"] = values
+    return result
+
+
+def _gstin(rng: random.Random, state_code: str) -> str:
+    letters = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(5))
+    return f"{state_code}{letters}{rng.randint(0, 9999):04d}{rng.choice('ABCDEFGHJK')}1Z{rng.choice('0123456789ABCDEF')}"
+
+
+def _indian(amount: float) -> str:
+    """1,23,456.00 grouping."""
+    whole, frac = f"{amount:.2f}".split(".")
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ",".join(groups + [tail]) + "." + frac
+
+
+def synthetic_invoice(rng: random.Random, items: int) -> Dict[str, Any]:
+    """
+    One invoice as OCR-like text plus the values it was generated from.
+    """
+    state, code = rng.choice(STATES)
+    gstin = _gstin(rng, code)
+    invoice_number = f"{rng.choice(['INV', 'KA', 'GST', 'B'])}/{rng.randint(2023, 2026)}-{rng.randint(10, 99)}/{rng.randint(1, 9999):04d}"
+    sep = rng.choice("/-.")
+    date = f"{rng.randint(1, 28):02d}{sep}{rng.randint(1, 12):02d}{sep}2026"
+    rate = rng.choice(RATES)
+    lines = [
+        "TAX INVOICE",
+        f"{rng.choice(['ACME Traders', 'Sri Balaji Stores', 'Om Sai Enterprises'])}",
+        f"GSTIN/UIN: {gstin}  PAN: {gstin[2:12]}",
+        f"{rng.choice(INVOICE_LABELS)}: {invoice_number}   {rng.choice(DATE_LABELS)}: {date}",
+        f"Place of Supply: {state} ({code})",
+        f"Buyer GSTIN: {_gstin(rng, rng.choice(STATES)[1])}",
+        "Sl Description HSN/SAC Qty Rate Amount",
+    ]
+    hsn_codes = []
+    taxable = 0.0
+    for i in range(items):
+        hsn = rng.choice(HSN_CODES)
+        hsn_codes.append(hsn)
+        qty = rng.randint(1, 20)
+        price = rng.randint(10, 5000)
+        taxable += qty * price
+        lines.append(f"{i + 1} Item {i + 1} {hsn} {qty} {price:.2f} {_indian(qty * price)}")
+    tax = round(taxable * rate / 100, 2)
+    lines += [
+        f"Taxable Value: Rs. {_indian(taxable)}",
+        f"CGST @ {rate / 2:g}%: {_indian(tax / 2)}",
+        f"SGST @ {rate / 2:g}%: {_indian(tax / 2)}",
+        f"Grand Total (INR): {_indian(taxable + tax)}",
+        f"Phone: {rng.choice('6789')}{rng.randint(0, 999999999):09d}",
+    ]
+    return {
+        "text": "\n".join(lines),
+        "gstin": gstin,
+        "invoice_number": invoice_number,
+        "date": date,
+        "hsn_codes": list(dict.fromkeys(hsn_codes)),
+    }
+
+
+def bench(fn: Callable[[str], Dict[str, Any]], texts: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def accuracy(fn: Callable[[str], Dict[str, Any]], corpus: List[Dict[str, Any]]) -> Dict[str, float]:
+    hits = {"gstin": 0, "invoice_number": 0, "date": 0, "all_required": 0, "hsn_recall": 0.0}
+    for doc in corpus:
+        out = fn(doc["text"])
+        ok = [out.get(field) == doc[field] for field in ("gstin", "invoice_number", "date")]
+        for field, hit in zip(("gstin", "invoice_number", "date"), ok):
+            hits[field] += hit
+        hits["all_required"] += all(ok)
+        found = set(out.get("hsn_codes") or ([out["hsn"]] if out.get("hsn") else []))
+        hits["hsn_recall"] += len(found & set(doc["hsn_codes"])) / len(doc["hsn_codes"])
+    return {key: round(value / len(corpus), 3) for key, value in hits.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--items", type=int, nargs=2, default=[5, 40], help="Min/max line items per invoice")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [synthetic_invoice(rng, rng.randint(*args.items)) for _ in range(args.docs)]
+    texts = [doc["text"] for doc in corpus]
+    chars = sum(len(t) for t in texts)
+    print(f"{args.docs} invoices, {chars / args.docs:.0f} chars avg")
+
+    print(f"{'extractor':>10} {'ms total':>10} {'us/doc':>8} {'MB/s':>7}  accuracy")
+    runs = (("legacy", legacy_extract), ("legacy-all", legacy_all_matches), ("single", rule_based_extract))
+    for name, fn in runs:
+        seconds = bench(fn, texts, args.repeat)
+        print(f"{name:>10} {seconds * 1000:10.1f} {seconds / args.docs * 1e6:8.1f} "
+              f"{chars / seconds / 1e6:7.1f}  {accuracy(fn, corpus)}")
+
+
+if __name__ == "__main__":
+    main()
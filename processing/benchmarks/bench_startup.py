@@ -0,0 +1,154 @@
+"""
+Startup Benchmark
+Cold start of the OCR service per model-load mode: a fresh uvicorn process
+per run, timed from launch to
+
+- live: /health/live answers (imports done, port bound)
+- ready: /health/ready answers 200 (every worker loaded and warm)
+- first answer: the first POST /ocr of a corpus document, sent as soon as the
+  service is live, answers 200 (with its field accuracy against the truth)
+
+plus the latency of a second request, the service's own startup report
+(phase and per-worker load / warm-up times) and the RSS of the service and
+its pool workers once ready. Extra service settings come from the environment.
+
+Usage: python benchmarks/bench_startup.py [--modes eager background lazy] [--repeat 3] [--kind image] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import KINDS, build_corpus  # noqa: E402
+from run_suite import field_accuracy  # noqa: E402
+from startup import MODEL_LOAD_MODES  # noqa: E402
+
+PROCESSING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMEOUT_SECONDS = 600
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def tree_rss_mb(pid: int) -> Optional[float]:
+    """RSS of a process and all its descendants (Linux /proc), else None."""
+    total_kb, pending = 0, [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status", "r") as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+            with open(f"/proc/{current}/task/{current}/children", "r") as f:
+                pending.extend(int(child) for child in f.read().split())
+    except (OSError, StopIteration, ValueError):
+        return None
+    return round(total_kb / 1024, 1)
+
+
+def wait_for(client: httpx.Client, path: str, deadline: float) -> bool:
+    while time.monotonic() < deadline:
+        try:
+            response = client.get(path)
+            if response.status_code == 200:
+                return True
+            if response.json().get("status") == "failed":
+                return False
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def cold_start(mode: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    port = free_port()
+    env = dict(os.environ, OCR_MODEL_LOAD=mode, OCR_CACHE_MAX_ENTRIES="0")
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ocr_service:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=PROCESSING_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    files = {"file": (doc["filename"], doc["data"], doc["content_type"])}
+    out: Dict[str, Any] = {"mode": mode}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=TIMEOUT_SECONDS) as client:
+            deadline = started + TIMEOUT_SECONDS
+            if not wait_for(client, "/health/live", deadline):
+                out["error"] = "never live"
+                return out
+            out["live_s"] = round(time.monotonic() - started, 3)
+
+            # First request as soon as the port answers: in background mode it waits behind the load
+            response = client.post("/ocr", files=files)
+            out["first_answer_s"] = round(time.monotonic() - started, 3)
+            out["first_status"] = response.status_code
+            if response.status_code == 200:
+                invoice = (response.json()["data"].get("extraction") or {}).get("invoice")
+                if invoice is not None:
+                    out["first_accuracy"] = field_accuracy([invoice], [doc["truth"]])["overall"]
+
+            if not wait_for(client, "/health/ready", deadline):
+                out["error"] = "never ready"
+                return out
+            out["ready_s"] = round(time.monotonic() - started, 3)
+
+            t0 = time.perf_counter()
+            client.post("/ocr", files=files)
+            out["second_request_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            out["rss_mb"] = tree_rss_mb(proc.pid)
+            out["startup"] = client.get("/health").json().get("startup")
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    return out
+
+
+def median(runs: List[Dict[str, Any]], key: str) -> Optional[float]:
+    values = [run[key] for run in runs if run.get(key) is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", choices=MODEL_LOAD_MODES, default=["eager", "background", "lazy"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--kind", choices=sorted(set(KINDS)), default="image", help="Corpus document kind sent to /ocr")
+    parser.add_argument("--output", help="Write every run as JSON")
+    args = parser.parse_args()
+
+    doc = build_corpus(16, kinds=[args.kind])[0]  # Kinds are drawn at random: the first of this kind
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    print(f"{'mode':>10} {'live s':>8} {'ready s':>8} {'first s':>8} {'2nd ms':>8} {'RSS MB':>8}  errors")
+    for mode in args.modes:
+        runs = results[mode] = [cold_start(mode, doc) for _ in range(args.repeat)]
+        errors = sorted({run["error"] for run in runs if "error" in run})
+        cells = [median(runs, key) for key in ("live_s", "ready_s", "first_answer_s", "second_request_ms", "rss_mb")]
+        print(f"{mode:>10} " + " ".join(f"{c:8.2f}" if c is not None else f"{'-':>8}" for c in cells)
+              + f"  {', '.join(errors) or '-'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Runs written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+PDF Text Layer Benchmark
+Per-page cost of reading tokens from the text layer of a machine-generated
+invoice PDF, against rendering the same page for OCR (the raster path
+before any inference, so a lower bound of what the fast path saves).
+Also checks that every text-layer box lies on ink in the rendered raster,
+i.e. that the tokens are in the coordinates raster OCR would return.
+
+Usage: python benchmarks/bench_text_layer.py [--pages 10] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Callable
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_io import render_pdf_page  # noqa: E402
+from text_layer import pdf_text_tokens  # noqa: E402
+
+DPI = 300
+MAX_DIMENSION = 2000
+
+
+def invoice_pdf(pages: int) -> fitz.Document:
+    """A4 pages laid out like accounting-software invoices: header fields and an item table."""
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=595, height=842)
+        header = ["TAX INVOICE", "GSTIN: 27AAPFU0939F1ZV", f"Invoice No: INV-{p + 1:04d}", "Date: 12/02/2026"]
+        for i, line in enumerate(header):
+            page.insert_text((40, 60 + i * 18), line, fontsize=10)
+        for row in range(25):
+            y = 160 + row * 20
+            for x, cell in zip((40, 260, 330, 400, 480), (f"Item {row + 1}", "8471", "2", "500.00", "1000.00")):
+                page.insert_text((x, y), cell, fontsize=9)
+        for i, line in enumerate(["Taxable Value: 25000.00", "CGST @ 9%: 2250.00", "SGST @ 9%: 2250.00",
+                                  "Grand Total: 29500.00"]):
+            page.insert_text((360, 700 + i * 18), line, fontsize=10)
+    return doc
+
+
+def best_ms(fn: Callable[[], None], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    doc = invoice_pdf(args.pages)
+    pages = range(len(doc))
+    text_ms = best_ms(lambda: [pdf_text_tokens(doc, i, DPI, MAX_DIMENSION) for i in pages], args.repeat)
+    render_ms = best_ms(lambda: [render_pdf_page(doc, i, DPI, MAX_DIMENSION) for i in pages], args.repeat)
+
+    tokens = pdf_text_tokens(doc, 0, DPI, MAX_DIMENSION)
+    gray = render_pdf_page(doc, 0, DPI, MAX_DIMENSION).min(axis=2)
+    on_ink = sum(
+        (gray[int(t["box"][0][1]):int(t["box"][2][1]) + 1, int(t["box"][0][0]):int(t["box"][2][0]) + 1] < 128).any()
+        for t in tokens
+    )
+
+    print(f"{args.pages} pages, best of {args.repeat}")
+    print(f"{'text layer':>12} {text_ms / args.pages:8.2f} ms/page  ({len(tokens)} tokens on page 1, no inference)")
+    print(f"{'render':>12} {render_ms / args.pages:8.2f} ms/page  (+ multi-pass OCR on the raster path)")
+    print(f"boxes on ink: {on_ink}/{len(tokens)}")
+
+
+if __name__ == "__main__":
+    main()
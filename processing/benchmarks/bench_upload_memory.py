@@ -0,0 +1,101 @@
+"""
+Upload Memory Benchmark
+Peak RSS of the OCR service against the page count of a scanned PDF: with
+large uploads memory-mapped, page rasters drawn from the raster buffer pool
+and MuPDF's decoded-image store emptied after every page, the peak should
+stay flat as pages are added.
+
+Each size runs in a fresh service process (in-process TestClient, result
+cache off): RSS once ready, then the process peak over two POST /ocr of the
+document, and the second request's wall time. Pages are corpus scans (JPEG
+in PDF, A4 at 300 DPI by default) cycled to the requested count. Service
+settings come from the environment, e.g. UPLOAD_MAP_THRESHOLD_KB=1048576
+OCR_RASTER_BUFFERS=0 to read uploads into RAM and allocate every raster.
+
+Usage: python benchmarks/bench_upload_memory.py [--pages 1 5 10 20 40] [--height 3508]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(path: str, pages: int) -> None:
+    """Child process: load the service, post the document twice, print one JSON line."""
+    # Limits high enough for the document; set before the service is imported
+    os.environ["MAX_PDF_PAGES"] = str(pages)
+    os.environ.setdefault("MAX_FILE_SIZE_MB", "200")
+    os.environ["OCR_CACHE_MAX_ENTRIES"] = "0"
+
+    import memstats
+    from fastapi.testclient import TestClient
+    import ocr_service
+
+    with open(path, "rb") as f:
+        data = f.read()
+    files = {"file": ("scan.pdf", data, "application/pdf")}
+    with TestClient(ocr_service.app) as client:
+        while client.get("/health/ready").status_code == 503:
+            time.sleep(0.1)
+        idle = memstats.current_rss_mb()
+        memstats.reset_peak_rss()
+        for _ in range(2):
+            started = time.perf_counter()
+            response = client.post("/ocr", files=files)
+            elapsed = time.perf_counter() - started
+        print(json.dumps({
+            "status": response.status_code,
+            "idle_mb": idle,
+            "peak_mb": memstats.peak_rss_mb(),
+            "seconds": round(elapsed, 2),
+            "rasters": client.get("/health").json().get("rasters"),
+        }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 10, 20, 40])
+    parser.add_argument("--height", type=int, default=3508, help="Scan height in pixels (3508 = A4 at 300 DPI)")
+    parser.add_argument("--measure", nargs=2, metavar=("PDF", "PAGES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure[0], int(args.measure[1]))
+        return
+
+    import cv2
+    import numpy as np
+    from corpus import build_corpus, scan_pdf
+
+    scans = [img for doc in build_corpus(16, kinds=["pdf_scan"]) for img in doc["images"]]
+    scans = [cv2.resize(img, (int(img.shape[1] * args.height / img.shape[0]), args.height)) for img in scans]
+
+    print(f"{'pages':>6} {'upload MB':>10} {'idle MB':>8} {'peak MB':>8} {'growth MB':>10} {'s':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            # Shifted a pixel per cycle: identical images would be stored once
+            data = scan_pdf([np.roll(scans[i % len(scans)], i // len(scans), axis=1) for i in range(pages)])
+            path = os.path.join(tmp, f"scan-{pages}.pdf")
+            with open(path, "wb") as f:
+                f.write(data)
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", path, str(pages)],
+                                   capture_output=True, text=True)
+            lines = [line for line in child.stdout.splitlines() if line.startswith("{")]
+            if not lines:
+                print(f"{pages:6d} failed: {child.stderr.strip().splitlines()[-1:] or child.returncode}")
+                continue
+            result = json.loads(lines[-1])
+            if result["status"] != 200:
+                print(f"{pages:6d} {len(data) / 2 ** 20:10.1f}  HTTP {result['status']}")
+                continue
+            print(f"{pages:6d} {len(data) / 2 ** 20:10.1f} {result['idle_mb']:8.1f} {result['peak_mb']:8.1f} "
+                  f"{result['peak_mb'] - result['idle_mb']:10.1f} {result['seconds']:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
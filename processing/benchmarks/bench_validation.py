@@ -0,0 +1,117 @@
+"""
+Validation Benchmark
+Times validate_invoices_batch against validate_invoice called per invoice
+and checks that both return exactly the same results, on synthetic
+invoices with recurring suppliers and a share of malformed values
+(exponents, NaN, None, >2 decimals, huge amounts) that take the Decimal path.
+
+Usage: python benchmarks/bench_validation.py [--invoices 100000] [--suppliers 2000] [--odd 0.02] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validation_engine  # noqa: E402
+from validation_engine import validate_invoice, validate_invoices_batch  # noqa: E402
+
+CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+ODD_VALUES = ["1e3", "NaN", None, "12.345", 10 ** 12, " 5 ", True, Decimal("2.50"), "-0.5", "1_000", 0.1, "abc"]
+
+
+def checksum_gstin(rng: random.Random) -> str:
+    body = (f"{rng.randint(1, 37):02d}" + "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(5))
+            + f"{rng.randint(0, 9999):04d}" + rng.choice("ABCDEFGHIJ") + rng.choice("123456789") + "Z")
+    total = sum((1, 2)[i % 2] * CHARSET.index(c) for i, c in enumerate(body))
+    return body + CHARSET[total % 36]
+
+
+def synthetic_invoices(n: int, suppliers: int, odd: float, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    gstins = [checksum_gstin(rng) if rng.random() < 0.9 else checksum_gstin(rng)[:-1] + "0"
+              for _ in range(suppliers)] + ["22AAAAA0000A1Z5", "short", "22aaaaa0000a1z5", ""]
+    invoices = []
+    for _ in range(n):
+        lines = []
+        for _ in range(rng.randint(0, 12)):
+            qty = rng.randint(1, 50)
+            rate = rng.choice([rng.randint(1, 5000), round(rng.uniform(1, 999), 2), f"{rng.uniform(1, 999):.2f}"])
+            total = Decimal(str(qty)) * Decimal(str(rate))
+            if rng.random() < 0.05:
+                total += 1  # Math error
+            lines.append({"qty": qty, "rate": rate, "total": str(total) if rng.random() < 0.5 else float(total)})
+        taxable = sum((Decimal(str(line["total"])) for line in lines), Decimal("0"))
+        if rng.random() < 0.05:
+            taxable += Decimal("0.01")
+        tax = (taxable * Decimal("0.18")).quantize(Decimal("0.01"))
+        invoice: Dict[str, Any] = {
+            "gstin": rng.choice(gstins),
+            "lines": lines,
+            "taxable": str(taxable),
+            "tax": str(tax),
+            "grand_total": str(taxable + tax) if rng.random() < 0.95 else str(taxable),
+        }
+        if rng.random() < 0.5:
+            invoice["cgst"], invoice["sgst"] = str(tax / 2), str(tax / 2)
+        else:
+            invoice["igst"] = str(tax)
+        if rng.random() < 0.03:
+            invoice["cgst"] = "1"  # GST rule violation
+        if rng.random() < odd:
+            target = rng.choice(lines) if lines and rng.random() < 0.7 else invoice
+            target[rng.choice(["qty", "rate", "total"] if target is not invoice else ["taxable", "tax"])] = rng.choice(ODD_VALUES)
+        invoices.append(invoice)
+    return invoices
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invoices", type=int, default=100_000)
+    parser.add_argument("--suppliers", type=int, default=2000)
+    parser.add_argument("--odd", type=float, default=0.02, help="Share of invoices with a malformed value")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    invoices = synthetic_invoices(args.invoices, args.suppliers, args.odd, args.seed)
+
+    expected = [validate_invoice(invoice) for invoice in invoices]
+    scalar = best_of(lambda: [validate_invoice(invoice) for invoice in invoices], args.repeat)
+
+    validation_engine._gstin_cache.clear()
+    start = time.perf_counter()
+    batch = validate_invoices_batch(invoices)
+    cold = time.perf_counter() - start
+    warm = best_of(lambda: validate_invoices_batch(invoices), args.repeat)
+
+    mismatches = [i for i, (a, b) in enumerate(zip(expected, batch)) if a != b or list(a["field_errors"]) != list(b["field_errors"])]
+    valid = sum(r["is_valid"] for r in expected)
+    print(f"{args.invoices} invoices, {sum(len(i['lines']) for i in invoices)} rows, {valid} valid")
+    print(f"validate_invoice loop   {scalar * 1000:9.1f} ms")
+    print(f"batch (cold GSTIN memo) {cold * 1000:9.1f} ms  x{scalar / cold:.1f}")
+    print(f"batch (warm GSTIN memo) {warm * 1000:9.1f} ms  x{scalar / warm:.1f}")
+    print(f"identical results: {not mismatches}" + (f" (first mismatch at {mismatches[0]})" if mismatches else ""))
+    if mismatches:
+        i = mismatches[0]
+        print(invoices[i], expected[i], batch[i], sep="\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Wire Format Benchmark
+Encode time, decode time and payload size of one OCR response per format:
+
+- legacy: record dicts with list-of-lists boxes through json.dumps (as the
+  service built them before TokenTable)
+- json: the default format, TokenTable written as the same records
+- columnar: Accept: application/vnd.autogst.columnar+json
+- msgpack: Accept: application/msgpack (float32 columns as raw bytes)
+
+Usage: python benchmarks/bench_wire.py [--sizes 200 2000 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import response_format  # noqa: E402
+from tokens import TokenTable  # noqa: E402
+
+
+def synthetic_tokens(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Records as PaddleOCR produces them: float boxes, 4-place confidences."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        x0, y0 = float(rng.uniform(0, 1300)), float(rng.uniform(0, 1900))
+        x1, y1 = x0 + float(rng.uniform(40, 300)), y0 + 24.0
+        out.append({
+            "text": f"Item {i} 8471 2 500.00",
+            "confidence": round(float(rng.uniform(0.6, 1.0)), 4),
+            "box": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]],
+        })
+    return out
+
+
+def best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def decoder(media_type: str) -> Callable[[bytes], Any]:
+    if media_type == response_format.MSGPACK:
+        return lambda payload: response_format.msgpack.unpackb(payload, raw=False)
+    return json.loads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    formats = {"json": response_format.JSON, "columnar": response_format.COLUMNAR_JSON}
+    if response_format.msgpack is not None:
+        formats["msgpack"] = response_format.MSGPACK
+    else:
+        print("msgpack not installed: skipping the msgpack format")
+
+    print(f"{'tokens':>7} {'format':>9} {'encode ms':>10} {'decode ms':>10} {'KB':>9}")
+    for n in args.sizes:
+        records = synthetic_tokens(n)
+        table = TokenTable.from_records(records)
+        legacy = {"status": "success", "data": {"type": "image", "content": records}}
+        payload = json.dumps(legacy, ensure_ascii=False, separators=(",", ":")).encode()
+        encode = best_ms(lambda: json.dumps(legacy, ensure_ascii=False, separators=(",", ":")).encode(), args.repeat)
+        decode = best_ms(lambda: json.loads(payload), args.repeat)
+        print(f"{n:7d} {'legacy':>9} {encode:10.2f} {decode:10.2f} {len(payload) / 1024:9.1f}")
+
+        content = {"status": "success", "data": {"type": "image", "content": table}}
+        for name, media_type in formats.items():
+            payload = response_format.dumps(content, media_type)
+            encode = best_ms(lambda: response_format.dumps(content, media_type), args.repeat)
+            decode = best_ms(lambda: decoder(media_type)(payload), args.repeat)
+            print(f"{n:7d} {name:>9} {encode:10.2f} {decode:10.2f} {len(payload) / 1024:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
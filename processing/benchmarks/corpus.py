@@ -0,0 +1,245 @@
+"""
+Synthetic Invoice Corpus
+Generates GST invoices with known ground truth, locally and reproducibly
+from a seed, for the benchmark suite:
+
+- image     one page, PNG (clean) or JPEG (noisy), drawn at a given height
+- pdf_scan  the same pages as raster images inside a PDF (no text layer)
+- pdf_text  a machine-generated PDF with a text layer (1..n pages)
+
+Pages vary in size, skew, blur, noise and exposure; the heaviest blur sits
+around the quality gate's threshold, so a few pages are rejected as in
+production. Every document carries
+its ground truth (fields and amounts) and, for raster pages, the token
+boxes as drawn (after skew), so text stages can be measured without OCR.
+
+Usage: python benchmarks/corpus.py --out /tmp/corpus [--docs 24] [--seed 7]
+       writes the documents and truth.json (ground truth per file)
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_quality import degrade  # noqa: E402
+from tokens import TokenTable  # noqa: E402
+from validation_engine import validate_gstin  # noqa: E402
+
+GSTIN_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Variation axes, cycled with coprime lengths so a few dozen documents
+# cover the combinations
+HEIGHTS = [1500, 2000, 3508]               # Phone photo, service cap, A4 at 300 DPI
+SKEWS = [0.0, 1.5, -4.0, 0.4, 8.0]         # Degrees
+DEGRADATIONS = [(0, 0, 1.0), (0.6, 3, 0.95), (0.9, 1.5, 1.08)]  # (blur, noise, exposure)
+KINDS = ["image", "image", "pdf_text", "pdf_scan"]
+PAGE_COUNTS = [1, 2, 3]
+
+# Column positions as a share of the page width: description, HSN, qty, rate, amount
+TABLE_X = [0.06, 0.42, 0.55, 0.65, 0.80]
+ROWS_PER_PAGE = 36
+PDF_PAGE_SIZE = (595, 842)  # A4 in points
+
+
+def _gstin(rng: np.random.Generator) -> str:
+    """A random GSTIN with a valid checksum character."""
+    body = (f"{int(rng.integers(1, 38)):02d}" + "".join(rng.choice(list(LETTERS), 5))
+            + f"{int(rng.integers(0, 10000)):04d}" + str(rng.choice(list(LETTERS)))
+            + str(rng.choice(list("123456789"))) + "Z")
+    return next(body + c for c in GSTIN_CHARSET if validate_gstin(body + c))
+
+
+def invoice_truth(rng: np.random.Generator, items: int) -> Dict[str, Any]:
+    """Ground truth of one invoice: header fields, item lines and amounts in rupees."""
+    lines = []
+    for i in range(items):
+        qty = int(rng.integers(1, 20))
+        rate = int(rng.integers(1, 400)) * 25
+        lines.append({"description": f"Item {i + 1}", "hsn": str(rng.choice(["8471", "8443", "9983", "4820"])),
+                      "qty": qty, "rate": rate, "amount": qty * rate})
+    taxable = sum(line["amount"] for line in lines)
+    tax = round(taxable * 0.09, 2)
+    return {
+        "gstin": _gstin(rng),
+        "invoice_number": f"INV-{int(rng.integers(1, 100000)):05d}",
+        "date": f"{int(rng.integers(1, 29)):02d}/{int(rng.integers(1, 13)):02d}/2026",
+        "tax_percent": "9",
+        "lines": lines,
+        "amounts": {
+            "taxable_value": f"{taxable:.2f}",
+            "cgst": f"{tax:.2f}",
+            "sgst": f"{tax:.2f}",
+            "grand_total": f"{taxable + 2 * tax:.2f}",
+        },
+    }
+
+
+def invoice_rows(truth: Dict[str, Any]) -> List[List[Tuple[str, float]]]:
+    """Printed rows of the invoice as (text, x share of page width) cells."""
+    amounts = truth["amounts"]
+    rows = [
+        [("TAX INVOICE", 0.40)],
+        [("Acme Traders Pvt Ltd, Pune", 0.06)],
+        [(f"GSTIN: {truth['gstin']}", 0.06)],
+        [(f"Invoice No: {truth['invoice_number']}", 0.06), (f"Date: {truth['date']}", 0.60)],
+        [(h, x) for h, x in zip(("Description", "HSN", "Qty", "Rate", "Amount"), TABLE_X)],
+    ]
+    for line in truth["lines"]:
+        cells = (line["description"], line["hsn"], str(line["qty"]), f"{line['rate']:.2f}", f"{line['amount']:.2f}")
+        rows.append(list(zip(cells, TABLE_X)))
+    rows += [
+        [(f"Taxable Value: {amounts['taxable_value']}", 0.55)],
+        [(f"CGST @ 9%: {amounts['cgst']}", 0.55)],
+        [(f"SGST @ 9%: {amounts['sgst']}", 0.55)],
+        [(f"Grand Total: {amounts['grand_total']}", 0.55)],
+    ]
+    return rows
+
+
+def paginate(rows: List[List[Tuple[str, float]]], pages: int) -> List[List[List[Tuple[str, float]]]]:
+    """Split rows over `pages` pages (header on the first, totals on the last)."""
+    per_page = max(1, -(-len(rows) // pages))
+    return [rows[i:i + per_page] for i in range(0, len(rows), per_page)]
+
+
+def render_page(rows: List[List[Tuple[str, float]]], height: int, rng: np.random.Generator) -> Tuple[np.ndarray, TokenTable]:
+    """Draw the rows on a page `height` px tall; returns the BGR page and its token boxes."""
+    width = int(height / 1.414)
+    page = np.empty((height, width, 3), dtype=np.uint8)
+    page[:] = rng.integers(165, 190, size=3).tolist()  # Paper as a phone camera sees it: inside the gate's range
+    unit = height / 2000
+    scale, thickness = 1.0 * unit, max(1, int(round(2 * unit)))
+    pitch = (height - 160 * unit) / ROWS_PER_PAGE
+    texts, boxes = [], []
+    for r, row in enumerate(rows):
+        baseline = int(100 * unit + r * pitch)
+        if len(row) > 1:  # Ruled table rows, as printed invoices have
+            rule_y = baseline + int(0.3 * pitch)
+            cv2.line(page, (int(0.04 * width), rule_y), (int(0.96 * width), rule_y), (60, 60, 60), thickness)
+        for text, x_share in row:
+            x = int(x_share * width)
+            (w, h), descent = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+            cv2.putText(page, text, (x, baseline), cv2.FONT_HERSHEY_SIMPLEX, scale, (30, 30, 30), thickness, cv2.LINE_AA)
+            texts.append(text)
+            boxes.append(((x, baseline - h), (x + w, baseline - h), (x + w, baseline + descent), (x, baseline + descent)))
+    return page, TokenTable(texts, boxes, np.ones(len(texts)))
+
+
+def skew_page(page: np.ndarray, tokens: TokenTable, degrees: float) -> Tuple[np.ndarray, TokenTable]:
+    """Rotate the page content clockwise by `degrees` (a crooked scan); boxes follow."""
+    if not degrees:
+        return page, tokens
+    h, w = page.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), -degrees, 1.0)
+    rotated = cv2.warpAffine(page, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    boxes = cv2.transform(tokens.boxes.reshape(-1, 1, 2), M).reshape(-1, 4, 2)
+    return rotated, TokenTable(tokens.texts, boxes, tokens.confidences)
+
+
+def pdf_bytes(doc: fitz.Document) -> bytes:
+    """Serialize without a creation date or a fresh file ID: same seed, same bytes."""
+    doc.set_metadata({})
+    data = doc.tobytes(no_new_id=True)
+    doc.close()
+    return data
+
+
+def text_pdf(pages: List[List[List[Tuple[str, float]]]]) -> bytes:
+    """A PDF with a text layer, laid out like the raster pages."""
+    doc = fitz.open()
+    width, height = PDF_PAGE_SIZE
+    pitch = (height - 80) / ROWS_PER_PAGE
+    for rows in pages:
+        page = doc.new_page(width=width, height=height)
+        for r, row in enumerate(rows):
+            for text, x_share in row:
+                page.insert_text((x_share * width, 50 + r * pitch), text, fontsize=9)
+    data = pdf_bytes(doc)
+    return data
+
+
+def scan_pdf(images: List[np.ndarray]) -> bytes:
+    """A PDF whose pages are JPEG scans (no text layer)."""
+    doc = fitz.open()
+    width, height = PDF_PAGE_SIZE
+    for img in images:
+        page = doc.new_page(width=width, height=height)
+        page.insert_image(page.rect, stream=cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    data = pdf_bytes(doc)
+    return data
+
+
+def make_document(index: int, rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Document `index` of the corpus; its variation comes from cycling the axes.
+    Returns {id, kind, filename, content_type, data, pages, params, truth,
+    images (raster pages or None), tokens (drawn boxes per raster page or None)}.
+    """
+    kind = KINDS[index % len(KINDS)]
+    height = HEIGHTS[index % len(HEIGHTS)]
+    skew = SKEWS[index % len(SKEWS)]
+    blur, noise, exposure = DEGRADATIONS[(index // len(HEIGHTS)) % len(DEGRADATIONS)]
+    pages = 1 if kind == "image" else PAGE_COUNTS[(index // len(KINDS)) % len(PAGE_COUNTS)]
+    items = int(rng.integers(3, 12)) + (pages - 1) * 30
+    truth = invoice_truth(rng, items)
+    layout = paginate(invoice_rows(truth), pages)
+    doc_id = f"doc-{index:04d}"
+    params = {"height": height, "skew": skew, "blur": blur, "noise": noise, "exposure": exposure}
+
+    if kind == "pdf_text":
+        return {"id": doc_id, "kind": kind, "filename": f"{doc_id}.pdf", "content_type": "application/pdf",
+                "data": text_pdf(layout), "pages": len(layout), "params": {}, "truth": truth,
+                "images": None, "tokens": None}
+
+    images, tokens = [], []
+    for rows in layout:
+        page, page_tokens = skew_page(*render_page(rows, height, rng), skew)
+        images.append(degrade(page, rng, blur, noise, exposure))
+        tokens.append(page_tokens)
+    if kind == "pdf_scan":
+        filename, content_type, data = f"{doc_id}.pdf", "application/pdf", scan_pdf(images)
+    elif noise:
+        filename, content_type = f"{doc_id}.jpg", "image/jpeg"
+        data = cv2.imencode(".jpg", images[0], [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+    else:
+        filename, content_type, data = f"{doc_id}.png", "image/png", cv2.imencode(".png", images[0])[1].tobytes()
+    return {"id": doc_id, "kind": kind, "filename": filename, "content_type": content_type, "data": data,
+            "pages": len(layout), "params": params, "truth": truth, "images": images, "tokens": tokens}
+
+
+def build_corpus(docs: int, seed: int = 7, kinds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """`docs` documents from one seed (same seed, same bytes), optionally only some kinds."""
+    rng = np.random.default_rng(seed)
+    corpus = [make_document(i, rng) for i in range(docs)]
+    return [doc for doc in corpus if not kinds or doc["kind"] in kinds]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--out", required=True, help="Directory for the documents and truth.json")
+    parser.add_argument("--docs", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    truth = {}
+    for doc in build_corpus(args.docs, args.seed):
+        with open(os.path.join(args.out, doc["filename"]), "wb") as f:
+            f.write(doc["data"])
+        truth[doc["filename"]] = {"kind": doc["kind"], "pages": doc["pages"], "params": doc["params"], **doc["truth"]}
+    with open(os.path.join(args.out, "truth.json"), "w") as f:
+        json.dump(truth, f, indent=2)
+    print(f"Wrote {len(truth)} documents to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
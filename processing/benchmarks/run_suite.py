@@ -0,0 +1,386 @@
+"""
+Benchmark Suite
+Reproducible performance run of the processing package over the synthetic
+corpus (benchmarks/corpus.py): latency percentiles, throughput and peak RSS
+per stage and for /ocr end to end, written as a JSON report and compared
+against a saved baseline report.
+
+Stages (inputs come from the corpus):
+    quality     check_image_quality on every raster page
+    normalize   normalize_image on every raster page
+    text_layer  pdf_text_tokens on every page of the text-layer PDFs
+    ocr         multi-pass ocr_engine on every raster page            [PaddleOCR]
+    merge       merge_ocr_results over three jittered passes of a page
+    layout      layout_reconstruction on every page's tokens
+    rules       rule_based_extract on each document's layout text
+    validation  validate_invoice on each document's rule output
+    end_to_end  POST /ocr per document, in-process or against --url    [PaddleOCR in-process]
+
+Text stages start from the token boxes the corpus drew (or the text layer),
+so they are measured, and their field accuracy checked against the ground
+truth, without an OCR model. Stages whose dependencies are missing are
+reported as skipped.
+
+Usage:
+    python benchmarks/run_suite.py [--docs 24] [--seed 7] [--repeat 3] [--stages quality layout ...]
+        [--url http://localhost:8000] [--output report.json]
+        [--baseline old_report.json] [--tolerance 0.25] [--fail-on-regression]
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fitz  # noqa: E402  PyMuPDF
+
+import memstats  # noqa: E402
+from corpus import build_corpus  # noqa: E402
+from layout_reconstruction import layout_reconstruction  # noqa: E402
+from normalization import normalize_image  # noqa: E402
+from pipeline import layout_text  # noqa: E402
+from quality_gate import check_image_quality  # noqa: E402
+from rule_extractor import rule_based_extract  # noqa: E402
+from text_layer import pdf_text_tokens  # noqa: E402
+from tokens import TokenTable  # noqa: E402
+from validation_engine import validate_invoice  # noqa: E402
+
+STAGES = ["quality", "normalize", "text_layer", "ocr", "merge", "layout", "rules", "validation", "end_to_end"]
+# Run once per input whatever --repeat says: minutes per corpus otherwise
+HEAVY_STAGES = {"ocr", "end_to_end"}
+PERCENTILES = (50, 95, 99)
+# Fields compared with the ground truth
+TRUTH_FIELDS = ("gstin", "invoice_number", "date")
+TRUTH_AMOUNTS = ("taxable_value", "cgst", "sgst", "grand_total")
+PDF_RENDER_DPI = 300
+MAX_IMAGE_DIMENSION = 2000
+READY_TIMEOUT_SECONDS = 600
+
+
+def summarize(samples_ms: Sequence[float], peak_rss_mb: Optional[float] = None) -> Dict[str, Any]:
+    """Latency percentiles and throughput (items per second of stage time) of one stage."""
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    if not arr.size:
+        return {"samples": 0}
+    points = np.percentile(arr, PERCENTILES)
+    out = {
+        "samples": int(arr.size),
+        "throughput_per_s": round(arr.size / float(arr.sum() / 1000), 3) if arr.sum() > 0 else None,
+        "mean_ms": round(float(arr.mean()), 3),
+        **{f"p{p}_ms": round(float(v), 3) for p, v in zip(PERCENTILES, points)},
+        "max_ms": round(float(arr.max()), 3),
+    }
+    if peak_rss_mb is not None:
+        out["peak_rss_mb"] = peak_rss_mb
+    return out
+
+
+def measure(fn: Callable[[Any], Any], inputs: Sequence[Any], repeat: int) -> Dict[str, Any]:
+    """
+    Time fn on every input `repeat` times (after one warm-up call) and
+    record how far peak RSS rose above the RSS at the start.
+    """
+    if not inputs:
+        return {"samples": 0}
+    fn(inputs[0])
+    gc.collect()
+    start_rss = memstats.current_rss_mb()
+    exact_peak = memstats.reset_peak_rss()
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            samples.append((time.perf_counter() - start) * 1000)
+    peak = round(memstats.peak_rss_mb() - start_rss, 1) if exact_peak else None
+    return summarize(samples, peak)
+
+
+def field_accuracy(invoices: Sequence[Dict[str, Any]], truths: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Share of ground-truth fields extracted exactly, per field and overall."""
+    per_field = {}
+    for field in TRUTH_FIELDS + TRUTH_AMOUNTS:
+        hits = sum(
+            ((inv.get("amounts") or {}).get(field) if field in TRUTH_AMOUNTS else inv.get(field))
+            == (truth["amounts"][field] if field in TRUTH_AMOUNTS else truth[field])
+            for inv, truth in zip(invoices, truths)
+        )
+        per_field[field] = round(hits / len(truths), 3) if truths else None
+    values = [v for v in per_field.values() if v is not None]
+    return {"overall": round(sum(values) / len(values), 3) if values else None, "fields": per_field}
+
+
+def jittered_passes(tokens: TokenTable, rng: np.random.Generator, passes: int = 3) -> List[TokenTable]:
+    """What three OCR passes over one page look like: the same boxes, moved by a pixel or two."""
+    return [
+        TokenTable(tokens.texts, tokens.boxes + rng.uniform(-1.5, 1.5, (len(tokens), 1, 2)).astype(np.float32),
+                   rng.uniform(0.6, 1.0, len(tokens)))
+        for _ in range(passes)
+    ]
+
+
+def text_layer_pages(doc: Dict[str, Any]) -> List[TokenTable]:
+    pdf = fitz.open(stream=doc["data"], filetype="pdf")
+    try:
+        return [pdf_text_tokens(pdf, i, PDF_RENDER_DPI, MAX_IMAGE_DIMENSION) for i in range(len(pdf))]
+    finally:
+        pdf.close()
+
+
+def run_end_to_end(corpus: List[Dict[str, Any]], url: Optional[str]) -> Dict[str, Any]:
+    """
+    POST every document to /ocr once and time the full request. In-process
+    (TestClient on ocr_service.app, result cache off) unless url is given.
+    Timing starts once /health/ready answers: model loading is bench_startup's.
+    """
+    def wait_ready(client: Any) -> Optional[str]:
+        """None once the service is ready, else why it never got there."""
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            response = client.get("/health/ready")
+            if response.status_code != 503:  # 200, or a service without readiness (404)
+                return None
+            if response.json().get("status") == "failed":
+                return f"startup failed: {response.json()['startup']['error']}"
+            time.sleep(0.1)
+        return f"not ready after {READY_TIMEOUT_SECONDS}s"
+
+    def post_all(post: Callable[[Dict[str, Any]], Any]) -> Dict[str, Any]:
+        post(corpus[0])  # Warm-up: first request pays lazy initialisation
+        gc.collect()
+        start_rss = memstats.current_rss_mb()
+        exact_peak = memstats.reset_peak_rss() and url is None
+        samples, statuses, invoices, truths, service_peak = [], {}, [], [], []
+        started = time.perf_counter()
+        for doc in corpus:
+            t0 = time.perf_counter()
+            response = post(doc)
+            samples.append((time.perf_counter() - t0) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            invoice = {}
+            if response.status_code == 200:
+                body = response.json()
+                invoice = (body["data"].get("extraction") or {}).get("invoice") or {}
+                service_peak.append(body.get("metrics", {}).get("memory", {}).get("peak_rss_mb", 0))
+            invoices.append(invoice)  # Rejected documents count as misses
+            truths.append(doc["truth"])
+        wall = time.perf_counter() - started
+        peak = round(memstats.peak_rss_mb() - start_rss, 1) if exact_peak else None
+        out = summarize(samples, peak)
+        out["docs_per_s"] = round(len(corpus) / wall, 3) if wall > 0 else None
+        out["status_codes"] = statuses
+        if url:
+            out["service_peak_rss_mb"] = max(service_peak) if service_peak else None
+        if any(invoices):  # No extraction at all: the pipeline is off
+            out["accuracy"] = field_accuracy(invoices, truths)
+        return out
+
+    def files(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {"file": (doc["filename"], doc["data"], doc["content_type"])}
+
+    if url:
+        import httpx
+        with httpx.Client(base_url=url, timeout=600) as client:
+            not_ready = wait_ready(client)
+            if not_ready:
+                return {"skipped": not_ready}
+            return post_all(lambda doc: client.post("/ocr", files=files(doc)))
+
+    # Every document once, never from the cache: this measures the work
+    os.environ["OCR_CACHE_MAX_ENTRIES"] = "0"
+    from fastapi.testclient import TestClient
+    import ocr_service
+    with TestClient(ocr_service.app) as client:
+        not_ready = wait_ready(client)
+        if not_ready:
+            return {"skipped": not_ready}
+        return post_all(lambda doc: client.post("/ocr", files=files(doc)))
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    started = time.perf_counter()
+    corpus = build_corpus(args.docs, args.seed, args.kinds)
+    build_seconds = time.perf_counter() - started
+    rng = np.random.default_rng(args.seed)
+
+    raster_pages = [img for doc in corpus if doc["images"] for img in doc["images"]]
+    text_docs = [doc for doc in corpus if doc["kind"] == "pdf_text"]
+    # Tokens per page and per document: as drawn for raster pages, from the text layer for text PDFs
+    doc_tokens = {doc["id"]: doc["tokens"] or text_layer_pages(doc) for doc in corpus}
+    pages_tokens = [table for doc in corpus for table in doc_tokens[doc["id"]] if table is not None]
+    layouts = {doc["id"]: [layout_reconstruction(t) for t in doc_tokens[doc["id"]] if t is not None] for doc in corpus}
+    texts = ["\n".join(layout_text(layout) for layout in layouts[doc["id"]]) for doc in corpus]
+    invoices = [rule_based_extract(text) for text in texts]
+
+    stages: Dict[str, Any] = {}
+    selected = [s for s in STAGES if s in args.stages]
+    for stage in selected:
+        repeat = 1 if stage in HEAVY_STAGES else args.repeat
+        print(f"  {stage} ...", flush=True)
+        try:
+            if stage == "quality":
+                stages[stage] = measure(check_image_quality, raster_pages, repeat)
+            elif stage == "normalize":
+                stages[stage] = measure(lambda img: normalize_image(img, auto_rotate=False), raster_pages, repeat)
+            elif stage == "text_layer":
+                stages[stage] = measure(text_layer_pages, text_docs, repeat)
+            elif stage == "ocr":
+                from ocr_engine import ocr_engine
+                stages[stage] = measure(ocr_engine, raster_pages, repeat)
+            elif stage == "merge":
+                from ocr_engine import merge_ocr_results
+                passes = [jittered_passes(t, rng) for t in pages_tokens]
+                stages[stage] = measure(lambda p: merge_ocr_results(*p), passes, repeat)
+            elif stage == "layout":
+                stages[stage] = measure(layout_reconstruction, pages_tokens, repeat)
+            elif stage == "rules":
+                stages[stage] = measure(rule_based_extract, texts, repeat)
+                stages[stage]["accuracy"] = field_accuracy(invoices, [doc["truth"] for doc in corpus])
+            elif stage == "validation":
+                stages[stage] = measure(validate_invoice, invoices, repeat)
+            elif stage == "end_to_end":
+                stages[stage] = run_end_to_end(corpus, args.url)
+        except ImportError as e:
+            stages[stage] = {"skipped": f"missing dependency: {e}"}
+
+    fingerprint = hashlib.sha256()
+    for doc in corpus:
+        fingerprint.update(doc["data"])
+    kinds: Dict[str, int] = {}
+    for doc in corpus:
+        kinds[doc["kind"]] = kinds.get(doc["kind"], 0) + 1
+    return {
+        "meta": environment(),
+        "config": {"docs": len(corpus), "seed": args.seed, "repeat": args.repeat, "kinds": kinds,
+                   "corpus_sha256": fingerprint.hexdigest()[:16], "raster_pages": len(raster_pages), "token_pages": len(pages_tokens), "url": args.url,
+                   "corpus_build_seconds": round(build_seconds, 2)},
+        "stages": stages,
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """What a result depends on besides the code: compare like with like."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> Dict[str, Any]:
+    """
+    Stage-by-stage comparison with a baseline report. A stage regresses when
+    its p50 or p95 grew, or its throughput dropped, by more than
+    `tolerance` and by at least min_delta_ms (per item), so sub-millisecond
+    noise never fails a run.
+    """
+    rows = []
+    for stage, current in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or "skipped" in current or "skipped" in base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if current.get(metric) is None or not base.get(metric):
+                continue
+            ratio = current[metric] / base[metric]
+            regressed = ratio > 1 + tolerance and current[metric] - base[metric] >= min_delta_ms
+            rows.append({"stage": stage, "metric": metric, "baseline": base[metric], "current": current[metric],
+                         "ratio": round(ratio, 3), "regressed": regressed})
+        if current.get("throughput_per_s") and base.get("throughput_per_s"):
+            ratio = current["throughput_per_s"] / base["throughput_per_s"]
+            per_item_delta_ms = 1000 / current["throughput_per_s"] - 1000 / base["throughput_per_s"]
+            rows.append({"stage": stage, "metric": "throughput_per_s", "baseline": base["throughput_per_s"],
+                         "current": current["throughput_per_s"], "ratio": round(ratio, 3),
+                         "regressed": ratio < 1 / (1 + tolerance) and per_item_delta_ms >= min_delta_ms})
+    differs = {k: [baseline.get("meta", {}).get(k), report["meta"][k]]
+               for k in ("platform", "cpu_count", "python", "numpy", "opencv")
+               if baseline.get("meta", {}).get(k) != report["meta"][k]}
+    config_differs = {k: [baseline.get("config", {}).get(k), report["config"][k]]
+                      for k in ("docs", "seed", "kinds", "corpus_sha256") if baseline.get("config", {}).get(k) != report["config"][k]}
+    return {
+        "baseline_commit": baseline.get("meta", {}).get("commit"),
+        "tolerance": tolerance,
+        "regressions": [r for r in rows if r["regressed"]],
+        "rows": rows,
+        "environment_differs": differs,
+        "config_differs": config_differs,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{'stage':>11} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'items/s':>9} {'peak MB':>8}")
+    for stage, s in report["stages"].items():
+        if "skipped" in s:
+            print(f"{stage:>11}  skipped: {s['skipped']}")
+            continue
+        if not s.get("samples"):
+            print(f"{stage:>11}  no inputs")
+            continue
+        peak = s.get("peak_rss_mb")
+        print(f"{stage:>11} {s['samples']:5d} {s['p50_ms']:9.2f} {s['p95_ms']:9.2f} {s['p99_ms']:9.2f} "
+              f"{s['throughput_per_s']:9.1f} {peak if peak is not None else '-':>8}")
+        if "accuracy" in s:
+            print(f"{'':>11} field accuracy {s['accuracy']['overall']}")
+    comparison = report.get("comparison")
+    if comparison:
+        print(f"\nvs baseline {comparison['baseline_commit']} (tolerance {comparison['tolerance']:.0%})")
+        for key in ("environment_differs", "config_differs"):
+            if comparison[key]:
+                print(f"  warning: {key.replace('_', ' ')}: {comparison[key]}")
+        for row in comparison["rows"]:
+            flag = "REGRESSED" if row["regressed"] else ""
+            print(f"  {row['stage']:>11} {row['metric']:>16} {row['baseline']:>10} -> {row['current']:<10} "
+                  f"x{row['ratio']:<6} {flag}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=24, help="Corpus size (documents)")
+    parser.add_argument("--seed", type=int, default=7, help="Corpus seed: same seed, same documents")
+    parser.add_argument("--kinds", nargs="+", choices=["image", "pdf_text", "pdf_scan"], help="Only these document kinds")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the inputs for light stages")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--url", help="Run end_to_end against a running service instead of in-process")
+    parser.add_argument("--output", default="benchmark_report.json", help="Where the JSON report is written")
+    parser.add_argument("--baseline", help="A previous report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown per metric")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency changes smaller than this")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when any stage regressed")
+    args = parser.parse_args()
+
+    print(f"Building corpus ({args.docs} documents, seed {args.seed}) and running stages:")
+    report = run_suite(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\nReport written to {args.output}")
+    if args.fail_on_regression and report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,465 @@
+"""
+Bulk Ingest Module
+Reprocesses a backlog of stored invoices (a directory or a manifest) over a
+pool of worker processes, each holding one warm PaddleOCR instance.
+
+Results are appended to a JSONL file as each document finishes; the same
+file is the checkpoint, so an interrupted run picks up where it stopped.
+Workers that grow past the per-worker memory budget retire after their
+current document and are replaced by a fresh process. A budget a worker
+already exceeds once its models are loaded stops the run, since every
+document would respawn it; --hard-memory-limit also makes the budget an
+allocation limit inside the worker (Linux RLIMIT_DATA).
+
+Usage:
+    python bulk_ingest.py ./invoices --output results.jsonl
+    python bulk_ingest.py manifest.txt --output results.jsonl --workers 16 --memory-budget-mb 1500
+"""
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+import memstats
+
+logger = logging.getLogger("ocr-service.bulk")
+
+SUPPORTED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+
+# Same raster limits as the HTTP service, so bulk and online results agree
+MAX_IMAGE_DIMENSION = 2000
+PDF_RENDER_DPI = 300
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "20"))
+
+BULK_WORKER_MEMORY_MB = int(os.getenv("BULK_WORKER_MEMORY_MB", "2048"))  # 0 = no budget
+BULK_THREADS_PER_WORKER = int(os.getenv("BULK_THREADS_PER_WORKER", "1"))
+BULK_WORKER_HARD_LIMIT = os.getenv("BULK_WORKER_HARD_LIMIT", "0") == "1"  # Budget as an allocation limit
+FSYNC_EVERY = 50  # Records between fsyncs of the output / checkpoint
+
+STAGE_PERCENTILES = (50, 90, 99)
+
+# Native thread pools sized per worker, so N workers use N * threads cores
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+class MemoryBudgetTooSmall(RuntimeError):
+    """Raised when a warm worker is already over the per-worker memory budget."""
+
+
+def discover_inputs(source: str) -> List[str]:
+    """
+    Documents to process, in a stable order.
+    Args:
+        source: a directory (searched recursively) or a manifest file with one
+            path per line, either plain or as JSON {"path": ...}; relative
+            manifest paths are resolved against the manifest's directory
+    Returns:
+        list: absolute document paths
+    """
+    if os.path.isdir(source):
+        found = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    found.append(os.path.abspath(os.path.join(root, name)))
+        return sorted(found)
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(os.path.abspath(os.path.join(base, path)))
+    return list(dict.fromkeys(paths))
+
+
+def load_checkpoint(output: str, retry_failed: bool = False) -> Set[str]:
+    """
+    Paths already recorded in the output JSONL.
+    A partially written last line (crash mid-write) is cut off so appending
+    resumes on a clean line boundary.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(output):
+        return done
+    valid_bytes = 0
+    with open(output, "rb") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                break
+            if not raw.endswith(b"\n"):
+                break
+            valid_bytes += len(raw)
+            if retry_failed and record.get("status") == "error":
+                continue
+            done.add(record["path"])
+    if valid_bytes != os.path.getsize(output):
+        logger.warning(f"Truncating partial record at byte {valid_bytes} of {output}")
+        with open(output, "r+b") as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+def percentiles(values: Iterable[float]) -> Dict[str, float]:
+    arr = np.fromiter(values, dtype=np.float64)
+    if not arr.size:
+        return {}
+    points = np.percentile(arr, STAGE_PERCENTILES)
+    return {f"p{p}": round(float(v), 2) for p, v in zip(STAGE_PERCENTILES, points)}
+
+
+def summarize(records: List[Dict[str, Any]], elapsed: float, workers: int, respawns: int) -> Dict[str, Any]:
+    """
+    Throughput and per-stage latency (ms) over the records of this run.
+    """
+    stages: Dict[str, List[float]] = {}
+    for record in records:
+        for stage, ms in (record.get("timings") or {}).items():
+            stages.setdefault(stage, []).append(ms)
+    statuses: Dict[str, int] = {}
+    for record in records:
+        statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+    return {
+        "documents": len(records),
+        "statuses": statuses,
+        "elapsed_seconds": round(elapsed, 2),
+        "docs_per_second": round(len(records) / elapsed, 3) if elapsed > 0 else 0.0,
+        "workers": workers,
+        "worker_respawns": respawns,
+        "total_ms": percentiles(r["total_ms"] for r in records if "total_ms" in r),
+        "stages_ms": {stage: {"count": len(v), **percentiles(v)} for stage, v in sorted(stages.items())},
+    }
+
+
+def process_document(path: str, pipeline: Any, max_pages: int) -> Dict[str, Any]:
+    """
+    Run the extraction pipeline on one stored document (worker side).
+    """
+    import fitz  # PyMuPDF
+    from image_io import decode_image_buffer, fit_to_dimension, render_pdf_page
+    from pipeline import StageTimer
+    from quality_gate import check_image_quality
+    from text_layer import PDF_TEXT_LAYER, pdf_text_tokens
+
+    timer = StageTimer()
+    if path.lower().endswith(".pdf"):
+        with timer.stage("render"):
+            doc = fitz.open(path)
+        try:
+            if len(doc) > max_pages:
+                raise ValueError(f"PDF exceeds max allowed pages ({max_pages})")
+            pages = []
+            for i in range(len(doc)):
+                if PDF_TEXT_LAYER:
+                    with timer.stage("text_layer"):
+                        tokens = pdf_text_tokens(doc, i, PDF_RENDER_DPI, MAX_IMAGE_DIMENSION)
+                    if tokens is not None:
+                        pages.append({"page": i + 1, "content": tokens})
+                        continue
+                with timer.stage("render"):
+                    img = render_pdf_page(doc, i, PDF_RENDER_DPI, MAX_IMAGE_DIMENSION)
+                with timer.stage("ocr"):
+                    pages.append({"page": i + 1, "content": pipeline.ocr.run(img)})
+                del img
+        finally:
+            doc.close()
+        result = pipeline.run_pages(pages, timer)
+        result["pages"] = len(pages)
+    else:
+        with timer.stage("read"):
+            with open(path, "rb") as f:
+                data = f.read()
+        # Gated on the file as uploaded, like the service, not on the fitted image
+        with timer.stage("quality_gate"):
+            quality = check_image_quality(data)
+        with timer.stage("read"):
+            img = decode_image_buffer(data, MAX_IMAGE_DIMENSION)
+            del data
+        if img is None:
+            raise ValueError("Could not decode image")
+        result = pipeline.run(fit_to_dimension(img, MAX_IMAGE_DIMENSION), timer, quality=quality)
+        result["pages"] = 1
+
+    return {
+        "path": path,
+        "status": result["status"],
+        "exit_reason": result["exit_reason"],
+        "pages": result["pages"],
+        "invoice": result["invoice"],
+        "validation": result["validation"],
+        "source": result["source"],
+        "llm_error": result["llm_error"],
+        "recovery_used": result["recovery_used"],
+        "recovery": result["recovery"],
+        "quality": result["quality"],
+        "timings": result["timings"],
+    }
+
+
+def _worker_main(worker_id: int, tasks: Any, results: Any, use_llm: bool, memory_budget_mb: int,
+                 threads: int, max_pages: int, hard_limit: bool = False) -> None:
+    """
+    Worker process: warm one pipeline, then take one document at a time from
+    its own task queue until told to stop or over the memory budget.
+    With hard_limit, allocations past the budget fail with MemoryError.
+    """
+    import cv2
+    from pipeline import get_worker_pipeline
+
+    cv2.setNumThreads(threads)
+    pipeline = get_worker_pipeline(use_llm)  # Loads this worker's PaddleOCR up front
+    rss = memstats.current_rss_mb()
+    results.put(("ready", worker_id, rss))  # Also starts the queue's feeder thread, before any limit
+    if hard_limit and memory_budget_mb and rss < memory_budget_mb:
+        # The data segment may grow by what is left of the budget after warm-up
+        if not memstats.limit_data_growth(memory_budget_mb - rss):
+            logger.warning(f"Worker {worker_id}: memory limit not supported here, budget checked after documents only")
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        start = time.perf_counter()
+        over_limit = False
+        try:
+            record = process_document(task, pipeline, max_pages)
+        except Exception as e:
+            record = {"path": task, "status": "error", "error": f"{type(e).__name__}: {e}"}
+            # Out of memory: start over in a fresh process. OpenCV reports it as its own error;
+            # under the hard limit, native code and thread starts surface refused allocations as RuntimeError
+            over_limit = (isinstance(e, MemoryError) or getattr(e, "code", None) == cv2.Error.StsNoMem
+                          or (hard_limit and isinstance(e, RuntimeError)))
+        record["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        rss = memstats.current_rss_mb()
+        record["worker"] = worker_id
+        record["rss_mb"] = rss
+        retire = over_limit or (bool(memory_budget_mb) and rss > memory_budget_mb)
+        results.put(("done", worker_id, record, retire))
+        if retire:
+            return
+
+
+class BulkRunner:
+    """
+    Fans documents out over worker processes and appends each result to the
+    output JSONL as soon as it arrives.
+
+    Every worker has its own task queue holding at most one document, so the
+    parent always knows which document a crashed worker was on.
+    """
+
+    def __init__(self, output: str, workers: int, use_llm: bool = True,
+                 memory_budget_mb: int = BULK_WORKER_MEMORY_MB, threads: int = BULK_THREADS_PER_WORKER,
+                 max_pages: int = MAX_PDF_PAGES, hard_limit: bool = BULK_WORKER_HARD_LIMIT):
+        self.output = output
+        self.workers = max(1, workers)
+        self.use_llm = use_llm
+        self.memory_budget_mb = memory_budget_mb
+        self.threads = max(1, threads)
+        self.max_pages = max_pages
+        self.hard_limit = hard_limit
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._procs: Dict[int, Any] = {}
+        self._queues: Dict[int, Any] = {}
+        self._current: Dict[int, str] = {}
+        self._next_id = 0
+        self.respawns = 0
+
+    def _spawn(self) -> int:
+        worker_id = self._next_id
+        self._next_id += 1
+        tasks = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, tasks, self._results, self.use_llm, self.memory_budget_mb,
+                  self.threads, self.max_pages, self.hard_limit),
+            daemon=True,
+        )
+        proc.start()
+        self._procs[worker_id] = proc
+        self._queues[worker_id] = tasks
+        return worker_id
+
+    def _assign(self, worker_id: int, pending: List[str]) -> None:
+        if pending:
+            path = pending.pop()
+            self._current[worker_id] = path
+            self._queues[worker_id].put(path)
+
+    def _retire(self, worker_id: int) -> None:
+        proc = self._procs.pop(worker_id)
+        self._queues.pop(worker_id)
+        self._current.pop(worker_id, None)
+        proc.join(timeout=30)
+
+    def run(self, paths: List[str]) -> Dict[str, Any]:
+        """
+        Process every path and return the run summary.
+        Raises MemoryBudgetTooSmall when a worker is over the budget as soon
+        as its models are loaded.
+        """
+        pending = list(reversed(paths))  # pop() from the end keeps input order
+        records: List[Dict[str, Any]] = []
+        start = time.perf_counter()
+
+        # Must be in the environment before the workers import numpy/Paddle
+        for var in _THREAD_ENV_VARS:
+            os.environ[var] = str(self.threads)
+
+        for _ in range(min(self.workers, len(pending))):
+            self._assign(self._spawn(), pending)
+
+        try:
+            with open(self.output, "a") as out:
+                while self._current:
+                    try:
+                        message = self._results.get(timeout=1)
+                    except queue.Empty:
+                        self._reap_crashed(out, records, pending)
+                        continue
+
+                    if message[0] == "ready":
+                        _, worker_id, rss = message
+                        logger.info(f"Worker {worker_id} ready ({rss} MB)")
+                        if self.memory_budget_mb and rss >= self.memory_budget_mb:
+                            # It would be retired and reloaded after every single document
+                            raise MemoryBudgetTooSmall(
+                                f"Worker {worker_id} uses {rss} MB once its models are loaded, above the "
+                                f"{self.memory_budget_mb} MB budget; raise --memory-budget-mb (0 = no budget)"
+                            )
+                        continue
+
+                    _, worker_id, record, retire = message
+                    self._current.pop(worker_id, None)
+                    self._write(out, record, records)
+                    if worker_id not in self._procs:
+                        continue  # Result that arrived after its worker was reaped
+                    if retire:
+                        logger.info(f"Worker {worker_id} reached its memory budget ({record['rss_mb']} MB), replacing")
+                        self._retire(worker_id)
+                        if pending:
+                            self.respawns += 1
+                            self._assign(self._spawn(), pending)
+                    else:
+                        self._assign(worker_id, pending)
+                out.flush()
+                os.fsync(out.fileno())
+        finally:
+            self.shutdown()
+
+        return summarize(records, time.perf_counter() - start, self.workers, self.respawns)
+
+    def _write(self, out: Any, record: Dict[str, Any], records: List[Dict[str, Any]]) -> None:
+        out.write(json.dumps(record, default=str) + "\n")
+        out.flush()
+        records.append(record)
+        if len(records) % FSYNC_EVERY == 0:
+            os.fsync(out.fileno())
+        if record["status"] == "error":
+            logger.warning(f"{record['path']}: {record.get('error')}")
+        elif len(records) % 100 == 0:
+            logger.info(f"{len(records)} documents processed")
+
+    def _reap_crashed(self, out: Any, records: List[Dict[str, Any]], pending: List[str]) -> None:
+        """
+        Record an error for the document a dead worker was holding (e.g. the
+        kernel OOM killer) and replace the worker.
+        """
+        for worker_id, proc in list(self._procs.items()):
+            # Clean exits are retirements; their last result is still in the queue
+            if proc.is_alive() or proc.exitcode == 0:
+                continue
+            path = self._current.get(worker_id)
+            logger.error(f"Worker {worker_id} exited with code {proc.exitcode}")
+            self._retire(worker_id)
+            if path:
+                self._write(out, {"path": path, "status": "error",
+                                  "error": f"worker exited with code {proc.exitcode}"}, records)
+            if pending:
+                self.respawns += 1
+                self._assign(self._spawn(), pending)
+
+    def shutdown(self) -> None:
+        for tasks in self._queues.values():
+            tasks.put(None)
+        for proc in self._procs.values():
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs.clear()
+        self._queues.clear()
+        self._current.clear()
+
+
+def default_workers(memory_budget_mb: int, threads: int) -> int:
+    """
+    One worker per `threads` cores, capped so every worker can reach its
+    memory budget within the memory currently available.
+    """
+    workers = max(1, (os.cpu_count() or 1) // max(1, threads))
+    available = memstats.available_memory_mb()
+    if memory_budget_mb and available:
+        workers = min(workers, max(1, int(available // memory_budget_mb)))
+    return workers
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk invoice extraction over a process pool")
+    parser.add_argument("source", help="Directory of invoices or a manifest file (one path per line)")
+    parser.add_argument("--output", "-o", required=True, help="JSONL results file; also the resume checkpoint")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: cores / threads, memory capped)")
+    parser.add_argument("--threads-per-worker", type=int, default=BULK_THREADS_PER_WORKER)
+    parser.add_argument("--memory-budget-mb", type=int, default=BULK_WORKER_MEMORY_MB,
+                        help="Replace a worker once its RSS exceeds this (0 = no budget)")
+    parser.add_argument("--hard-memory-limit", action="store_true", default=BULK_WORKER_HARD_LIMIT,
+                        help="Fail a worker's allocations past the budget instead of only replacing it afterwards")
+    parser.add_argument("--max-pages", type=int, default=MAX_PDF_PAGES)
+    parser.add_argument("--no-llm", action="store_true", help="Rules + validation only")
+    parser.add_argument("--retry-failed", action="store_true", help="Reprocess documents recorded as errors")
+    parser.add_argument("--fresh", action="store_true", help="Ignore and overwrite an existing output file")
+    parser.add_argument("--report", help="Also write the run summary JSON here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    paths = discover_inputs(args.source)
+    if args.fresh and os.path.exists(args.output):
+        os.remove(args.output)
+    done = load_checkpoint(args.output, retry_failed=args.retry_failed)
+    todo = [p for p in paths if p not in done]
+    logger.info(f"{len(paths)} documents, {len(paths) - len(todo)} already done, {len(todo)} to process")
+
+    workers = args.workers or default_workers(args.memory_budget_mb, args.threads_per_worker)
+    runner = BulkRunner(args.output, workers, use_llm=not args.no_llm, memory_budget_mb=args.memory_budget_mb,
+                        threads=args.threads_per_worker, max_pages=args.max_pages,
+                        hard_limit=args.hard_memory_limit)
+    try:
+        summary = runner.run(todo) if todo else summarize([], 0.0, workers, 0)
+    except MemoryBudgetTooSmall as e:
+        logger.error(str(e))
+        return 2
+    summary["skipped_from_checkpoint"] = len(paths) - len(todo)
+
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
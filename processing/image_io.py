@@ -0,0 +1,222 @@
+"""
+Image Ingest Module
+Decodes uploaded image buffers with as few full-resolution copies as possible.
+"""
+import logging
+import threading
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("ocr-service.image_io")
+
+# JPEG start-of-frame markers carrying the image dimensions
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_REDUCED_COLOR = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                  4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+_REDUCED_GRAY = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                 4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+
+def jpeg_dimensions(buf) -> Optional[Tuple[int, int]]:
+    """
+    Read (height, width) from a JPEG header without decoding pixels.
+    Returns None if the buffer is not a JPEG or has no frame header.
+    """
+    data = memoryview(buf).cast("B")
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return height, width
+        i += 2 + length
+    return None
+
+
+def image_dimensions(buf) -> Optional[Tuple[int, int]]:
+    """
+    Read (height, width) of a JPEG or PNG from its header without decoding.
+    Returns None for other formats or truncated headers.
+    """
+    data = memoryview(buf).cast("B")
+    if len(data) >= 24 and bytes(data[:8]) == b"\x89PNG\r\n\x1a\n" and bytes(data[12:16]) == b"IHDR":
+        width = int.from_bytes(data[16:20], "big")
+        height = int.from_bytes(data[20:24], "big")
+        return height, width
+    return jpeg_dimensions(data)
+
+
+def reduction_factor(height: int, width: int, target: int) -> int:
+    """
+    Largest JPEG DCT scale (1, 2, 4, 8) that keeps the longest side >= target,
+    so a later INTER_AREA resize still produces the same output size.
+    """
+    longest = max(height, width)
+    factor = 1
+    while factor < 8 and longest // (factor * 2) >= target:
+        factor *= 2
+    return factor
+
+
+def decode_image_buffer(buf, max_dimension: int, grayscale: bool = False) -> Optional[np.ndarray]:
+    """
+    Decode an encoded image straight from a bytes-like buffer (no copy of the
+    input). JPEGs that would be downscaled to max_dimension anyway are decoded
+    at reduced resolution, so the full-size raster is never allocated.
+    Returns None if the buffer can't be decoded.
+    """
+    nparr = np.frombuffer(buf, np.uint8)
+    flags = _REDUCED_GRAY if grayscale else _REDUCED_COLOR
+    factor = 1
+    dims = jpeg_dimensions(nparr)
+    if dims is not None:
+        factor = reduction_factor(dims[0], dims[1], max_dimension)
+    return cv2.imdecode(nparr, flags[factor])
+
+
+def fit_to_dimension(img: np.ndarray, max_dimension: int) -> np.ndarray:
+    """
+    Downscale so the longest side is at most max_dimension.
+    Preserves aspect ratio; smaller images are returned unchanged.
+    """
+    height, width = img.shape[:2]
+    if max(height, width) > max_dimension:
+        scale = max_dimension / max(height, width)
+        new_width = int(width * scale)
+        new_height = int(height * scale)
+        logger.info(f"Downscaling image from {width}x{height} to {new_width}x{new_height}")
+        return cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def pdf_page_zoom(page: fitz.Page, dpi: int, max_dimension: int) -> float:
+    """
+    Points-to-pixels factor for rendering a page at dpi, clamped so the
+    raster fits max_dimension.
+    """
+    zoom = dpi / 72
+    longest = max(page.rect.width, page.rect.height) * zoom
+    if longest > max_dimension:
+        zoom *= max_dimension / longest
+    return zoom
+
+
+class RasterPool:
+    """
+    Reusable page rasters, so rendering a 20-page PDF touches the same few
+    buffers instead of allocating (and page-faulting) a fresh one per page.
+    Holds up to `max_buffers` flat buffers, each big enough for a
+    max_dimension x max_dimension BGR page; acquire() hands out a view of a
+    free one shaped to the page. When all are in use a plain array is
+    allocated and not kept. Thread-safe.
+    """
+
+    def __init__(self, max_buffers: int, max_dimension: int, channels: int = 3):
+        self.max_buffers = max(0, max_buffers)
+        self.capacity = max_dimension * max_dimension * channels
+        self.channels = channels
+        self._free: List[np.ndarray] = []
+        self._owned: Set[int] = set()  # ids of the pooled flat buffers
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def acquire(self, height: int, width: int) -> np.ndarray:
+        """An uninitialised (height, width, channels) uint8 array; release() it after use."""
+        size = height * width * self.channels
+        with self._lock:
+            if size <= self.capacity and (self._free or len(self._owned) < self.max_buffers):
+                self._hits += 1
+                if self._free:
+                    flat = self._free.pop()
+                else:
+                    flat = np.empty(self.capacity, dtype=np.uint8)
+                    self._owned.add(id(flat))
+                return flat[:size].reshape(height, width, self.channels)
+            self._misses += 1
+        return np.empty((height, width, self.channels), dtype=np.uint8)
+
+    def _root(self, img: np.ndarray) -> Optional[np.ndarray]:
+        base = img
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        return base if id(base) in self._owned else None
+
+    def release(self, img: np.ndarray) -> None:
+        """Return a raster from acquire(); nothing may use it afterwards."""
+        with self._lock:
+            flat = self._root(img)
+            if flat is not None and all(flat is not free for free in self._free):
+                self._free.append(flat)
+
+    def discard(self, img: np.ndarray) -> None:
+        """Give up a raster that may still be in use (e.g. by a cancelled task); a new buffer replaces it."""
+        with self._lock:
+            flat = self._root(img)
+            if flat is not None:
+                self._owned.discard(id(flat))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "buffers": len(self._owned),
+                "max_buffers": self.max_buffers,
+                "free": len(self._free),
+                "buffer_mb": round(self.capacity / 1024 / 1024, 1),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+def render_pdf_page(doc: fitz.Document, index: int, dpi: int, max_dimension: int,
+                    pool: Optional[RasterPool] = None) -> np.ndarray:
+    """
+    Render one page straight into a BGR ndarray (no PNG round-trip).
+    The zoom is clamped so the raster already fits max_dimension. With a
+    pool, the raster is a pooled buffer the caller must release().
+
+    MuPDF keeps decoded page images in its process-wide store (256 MB by
+    default) in case they are drawn again; a scan's image is drawn once, so
+    the store is emptied after each render and peak RSS no longer grows
+    with page count. Like every fitz call, it must not run on two threads
+    at once (the service renders on a single shared thread).
+    """
+    page = doc.load_page(index)
+    zoom = pdf_page_zoom(page, dpi, max_dimension)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+    fitz.TOOLS.store_shrink(100)
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)
+    rgb = samples[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+    # cvtColor copies, so the pixmap can be released right away
+    if pool is None:
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=pool.acquire(pix.height, pix.width))
+
+
+def load_image(source: Any, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+    """
+    Accept a file path, an encoded buffer (bytes/bytearray/memoryview) or an
+    already decoded ndarray, so pipeline stages can share one decoded image.
+    Returns None if the input can't be read.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return cv2.imdecode(np.frombuffer(source, np.uint8), flags)
+    return cv2.imread(str(source), flags)
@@ -0,0 +1,237 @@
+"""
+Inference Pool Module
+Runs blocking PaddleOCR work off the event loop on a bounded thread/process pool.
+Each worker owns its own PaddleOCR instance.
+
+paddleocr (and paddle with it) is imported when the first engine is built,
+not when this module is imported: the service can bind its port while
+models load.
+"""
+import asyncio
+import contextvars
+import functools
+import importlib.metadata
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import telemetry
+
+if TYPE_CHECKING:
+    from paddleocr import PaddleOCR
+
+logger = logging.getLogger("ocr-service.pool")
+
+# Keyword arguments used for every per-worker PaddleOCR instance
+ENGINE_KWARGS: Dict[str, Any] = {"use_angle_cls": True, "lang": "en", "show_log": False}
+
+# Per-thread (and therefore per-process) engine slot
+_worker_state = threading.local()
+
+
+def build_engine() -> "PaddleOCR":
+    """A new PaddleOCR instance with ENGINE_KWARGS (imports paddleocr on first call)."""
+    from paddleocr import PaddleOCR
+    return PaddleOCR(**ENGINE_KWARGS)
+
+
+def get_engine() -> "PaddleOCR":
+    """
+    Returns the PaddleOCR instance owned by the calling worker, building it on first use.
+    Never share the returned engine across threads.
+    """
+    engine = getattr(_worker_state, "engine", None)
+    if engine is None:
+        logger.info(f"Initializing PaddleOCR for worker {threading.current_thread().name}")
+        start = time.perf_counter()
+        engine = build_engine()
+        _worker_state.engine = engine
+        _worker_state.load_ms = round((time.perf_counter() - start) * 1000, 1)
+    return engine
+
+
+def engine_version() -> str:
+    """Identifies the OCR engine/model configuration, e.g. for cache keys (without importing paddleocr)."""
+    try:
+        version = importlib.metadata.version("paddleocr")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    kwargs = ",".join(f"{k}={v}" for k, v in sorted(ENGINE_KWARGS.items()))
+    return f"paddleocr-{version}[{kwargs}]"
+
+
+def _init_worker(warmup: Optional[Callable[[], Any]] = None) -> None:
+    """
+    Executor initializer: load models as soon as the worker starts, then run
+    the warm-up so the worker's first real task doesn't pay first-call costs.
+    """
+    get_engine()
+    if warmup is not None:
+        start = time.perf_counter()
+        try:
+            warmup()
+        except Exception as e:  # A failed warm-up only costs the first request its speed
+            logger.warning(f"Warm-up failed on worker {threading.current_thread().name}: {e}")
+        _worker_state.warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+
+
+def worker_report() -> Dict[str, Any]:
+    """Engine load and warm-up time of the calling worker (runs on the worker)."""
+    return {
+        "worker": f"{os.getpid()}/{threading.current_thread().name}",
+        "engine_load_ms": getattr(_worker_state, "load_ms", None),
+        "warmup_ms": getattr(_worker_state, "warmup_ms", None),
+    }
+
+
+def _timed_call(submitted: float, fn: Callable[..., Any], *args: Any) -> Tuple[float, float, Any]:
+    """(seconds queued, seconds running, fn(*args)); wall clock, so it holds across processes."""
+    started = time.time()
+    result = fn(*args)
+    return started - submitted, time.time() - started, result
+
+
+class PoolSaturated(Exception):
+    """Raised when the admission queue is full (or the pool is not accepting work)."""
+
+    def __init__(self, message: str, retry_after: int, status_code: int = 429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class InferencePool:
+    """
+    Bounded pool for OCR inference.
+
+    Requests are admitted with `admit()`; at most `workers` run while up to
+    `max_queue` more wait. Anything beyond that is rejected with PoolSaturated
+    so callers can answer 429 with a Retry-After instead of piling up work.
+
+    Workers start on first use; `start_workers()` starts them all up front.
+    `warmup` (a module-level function in process mode) runs once on every
+    worker right after its models load.
+    """
+
+    def __init__(self, workers: int = 1, max_queue: int = 8, mode: str = "thread", retry_after: int = 5,
+                 warmup: Optional[Callable[[], Any]] = None):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown pool mode: {mode}")
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.mode = mode
+        self.retry_after = retry_after
+        self.warmup = warmup
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._tasks = 0
+        self._rejected = 0
+        self._completed = 0
+
+    def start(self) -> None:
+        """Create the executor. Safe to call more than once."""
+        if self._executor is not None:
+            return
+        if self.mode == "process":
+            # spawn: never fork a process that already runs the event loop threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.warmup,),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="ocr-worker",
+                initializer=_init_worker,
+                initargs=(self.warmup,),
+            )
+        logger.info(f"Inference pool started ({self.mode}, workers={self.workers}, max_queue={self.max_queue})")
+
+    async def start_workers(self) -> List[Dict[str, Any]]:
+        """
+        Start every worker now (models load, warm-up runs) instead of on first
+        use. Report tasks submitted together find no idle worker, so each one
+        starts a new worker; a worker that is up first may answer several of
+        them, so rounds repeat until every worker has answered (a worker whose
+        models fail to load breaks the pool and raises here). Returns one
+        report per worker.
+        """
+        reports: Dict[str, Dict[str, Any]] = {}
+        while True:
+            for report in await asyncio.gather(*(self.run(worker_report) for _ in range(self.workers))):
+                reports[report["worker"]] = report
+            if len(reports) >= self.workers:
+                return list(reports.values())
+            await asyncio.sleep(0.05)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """
+        Reserve a slot for one request, or raise PoolSaturated.
+        Hold the slot for the whole request (all pages of a PDF count once).
+        """
+        with self._lock:
+            if self._executor is None:
+                self._rejected += 1
+                raise PoolSaturated("OCR engine not ready", self.retry_after, status_code=503)
+            if self._admitted >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PoolSaturated("OCR queue is full", self.retry_after, status_code=429)
+            self._admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._admitted -= 1
+                self._completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(*args) on a pool worker without blocking the event loop.
+        Queue wait and run time go to the metrics and the caller's trace;
+        thread workers also run inside the caller's context, so their spans land there too.
+        """
+        if self._executor is None:
+            raise PoolSaturated("OCR engine not ready", self.retry_after, status_code=503)
+        loop = asyncio.get_running_loop()
+        task = fn.__name__
+        if self.mode == "thread":
+            fn = functools.partial(contextvars.copy_context().run, fn)
+        with self._lock:
+            self._tasks += 1
+        try:
+            submitted = time.perf_counter()
+            wait, elapsed, result = await loop.run_in_executor(self._executor, _timed_call, time.time(), fn, *args)
+            telemetry.observe_task(task, submitted, wait, elapsed)
+            return result
+        finally:
+            with self._lock:
+                self._tasks -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and in-flight counts, for health checks and client back-off."""
+        with self._lock:
+            admitted = self._admitted
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": min(admitted, self.workers),
+                "queue_depth": max(0, admitted - self.workers),
+                "pending_tasks": self._tasks,
+                "rejected": self._rejected,
+                "completed": self._completed,
+            }
@@ -0,0 +1,215 @@
+"""
+Job Queue Module
+Asynchronous OCR jobs: submit once, poll for the result.
+
+Jobs are keyed by the caller's job_id. Submitting a job_id that is queued,
+running or finished attaches to that job instead of starting another one
+(the same id with different content is a conflict); only a failed job is
+replaced by a resubmission, so a client retry re-runs it. Finished jobs are
+kept for a TTL, bounded in number, oldest dropped first.
+
+Queued jobs wait in a bounded in-process priority queue: interactive
+uploads are dispatched before bulk backfills, first in first out within a
+priority. Jobs live in this process only; a restart forgets them.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from inference_pool import PoolSaturated
+
+logger = logging.getLogger("ocr-service.jobs")
+
+# Lower rank is dispatched first
+JOB_PRIORITIES = {"interactive": 0, "bulk": 1}
+
+
+class JobConflict(Exception):
+    """Raised when a job_id is resubmitted with different content."""
+
+
+class Job:
+    """
+    One submitted job. `payload` is whatever the handler needs and is dropped
+    once the job finishes; `result` and `status_code` are the handler's answer.
+    status: queued -> running -> done, or failed.
+    """
+
+    __slots__ = ("job_id", "priority", "digest", "payload", "status", "status_code", "result", "error",
+                 "submitted", "started", "finished", "expires", "duplicates", "done")
+
+    def __init__(self, job_id: str, priority: str, digest: str, payload: Any):
+        self.job_id = job_id
+        self.priority = priority
+        self.digest = digest
+        self.payload = payload
+        self.status = "queued"
+        self.status_code: Optional[int] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.expires: Optional[float] = None
+        self.duplicates = 0
+        self.done = asyncio.Event()
+
+    def describe(self) -> Dict[str, Any]:
+        """Status, timings and error of the job, for submit and poll answers."""
+        now = time.monotonic()
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "priority": self.priority,
+            "status_code": self.status_code,
+            "error": self.error,
+            "duplicates": self.duplicates,
+            "queued_ms": round(((self.started or now) - self.submitted) * 1000, 1),
+            "run_ms": round(((self.finished or now) - self.started) * 1000, 1) if self.started else None,
+            "expires_in_s": round(self.expires - now, 1) if self.expires else None,
+        }
+
+
+class JobQueue:
+    """
+    Runs submitted jobs through `handler(job) -> (status_code, result)` on
+    `concurrency` dispatcher tasks. At most `max_queue` jobs wait; beyond that
+    submit() raises PoolSaturated (429) so callers back off as they do for /ocr.
+    Finished jobs are kept `result_ttl` seconds, at most `max_results` of them.
+    """
+
+    def __init__(self, handler: Callable[[Job], Awaitable[Tuple[int, Any]]], concurrency: int = 1,
+                 max_queue: int = 16, result_ttl: float = 900, max_results: int = 256, retry_after: int = 5):
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(1, max_queue)
+        self.result_ttl = result_ttl
+        self.max_results = max(1, max_results)
+        self.retry_after = retry_after
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()  # In finishing order, for expiry
+        self._order = itertools.count()
+        self._running = 0
+        self._submitted = 0
+        self._duplicates = 0
+        self._rejected = 0
+
+    def start(self) -> None:
+        """Start the dispatchers on the running event loop."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queue)
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.concurrency)]
+        logger.info(f"Job queue started (concurrency={self.concurrency}, max_queue={self.max_queue}, "
+                    f"result_ttl={self.result_ttl:g}s)")
+
+    async def stop(self) -> None:
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+
+    def submit(self, job_id: str, payload: Any, digest: str, priority: str = "interactive") -> Tuple[Job, bool]:
+        """
+        Queue a new job, or attach to the existing job with this id.
+        Returns (job, attached). Raises JobConflict when the id is taken by
+        different content and PoolSaturated when the queue is full.
+        """
+        if self._queue is None:
+            raise PoolSaturated("Job queue not started", self.retry_after, status_code=503)
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        self._expire()
+        existing = self._jobs.get(job_id)
+        if existing is not None and existing.status != "failed":
+            if existing.digest != digest:
+                raise JobConflict(f"Job {job_id} was submitted with different content")
+            existing.duplicates += 1
+            self._duplicates += 1
+            return existing, True
+        if self._queue.full():
+            self._rejected += 1
+            raise PoolSaturated("Job queue is full", self.retry_after, status_code=429)
+
+        job = Job(job_id, priority, digest, payload)
+        self._finished.pop(job_id, None)  # A failed job being replaced
+        self._jobs[job_id] = job
+        self._queue.put_nowait((JOB_PRIORITIES[priority], next(self._order), job))
+        self._submitted += 1
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with this id, unless unknown or expired."""
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for the job to finish; True if it has."""
+        if not job.done.is_set() and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job.done.is_set()
+
+    async def _dispatch(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            self._running += 1
+            job.status = "running"
+            job.started = time.monotonic()
+            try:
+                status_code, result = await self.handler(job)
+            except asyncio.CancelledError:
+                self._finish(job, 503, None, "Service shutting down")
+                raise
+            except Exception as e:  # Handlers answer errors themselves; this is the backstop
+                logger.error(f"Job {job.job_id} failed: {e}")
+                self._finish(job, 500, None, str(e))
+            else:
+                self._finish(job, status_code, result, None)
+            finally:
+                self._running -= 1
+
+    def _finish(self, job: Job, status_code: int, result: Any, error: Optional[str]) -> None:
+        job.status = "done" if status_code < 400 else "failed"
+        job.status_code = status_code
+        job.result = result
+        job.error = error or (result.get("message") if isinstance(result, dict) and status_code >= 400 else None)
+        job.payload = None  # The upload is no longer needed
+        job.finished = time.monotonic()
+        job.expires = job.finished + self.result_ttl
+        self._finished[job.job_id] = job
+        job.done.set()
+        self._expire()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._finished:
+            job_id, job = next(iter(self._finished.items()))
+            if job.expires > now and len(self._finished) <= self.max_results:
+                break
+            del self._finished[job_id]
+            if self._jobs.get(job_id) is job:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth by priority and job counts, for health checks."""
+        queued = {name: 0 for name in JOB_PRIORITIES}
+        for job in self._jobs.values():
+            if job.status == "queued":
+                queued[job.priority] += 1
+        return {
+            "max_queue": self.max_queue,
+            "queued": queued,
+            "running": self._running,
+            "finished": len(self._finished),
+            "submitted": self._submitted,
+            "duplicates": self._duplicates,
+            "rejected": self._rejected,
+        }
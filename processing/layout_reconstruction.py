@@ -1,43 +1,112 @@
 """
 Layout Reconstruction Module
 Sorts OCR output, clusters rows, separates header/table/footer.
+Detects column boundaries and returns a cell grid with column indices.
 """
-from typing import List, Dict, Any
+from typing import Dict, Any, Tuple
 import numpy as np
 
-def layout_reconstruction(ocr_output: List[Dict[str, Any]]) -> Dict[str, Any]:
+from tokens import Tokens, as_token_table
+
+# Row break when the vertical gap between token centres exceeds this share of median text height
+ROW_GAP_RATIO = 0.5
+# Minimum empty horizontal run (as a share of median text height) that separates columns
+COLUMN_GAP_RATIO = 0.8
+
+def cluster_rows(bounds: np.ndarray, gap_ratio: float = ROW_GAP_RATIO) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Assign a row id to every token and return (order, row_ids[order]) where
+    `order` sorts tokens top-to-bottom, then left-to-right within a row.
+    Row breaks adapt to the median text height of the page.
+    """
+    heights = bounds[:, 3] - bounds[:, 1]
+    threshold = max(1.0, float(np.median(heights)) * gap_ratio)
+    centers = (bounds[:, 1] + bounds[:, 3]) / 2
+    by_y = np.argsort(centers, kind="stable")
+    breaks = np.r_[False, np.diff(centers[by_y]) > threshold]
+    row_of = np.empty(len(bounds), dtype=np.int64)
+    row_of[by_y] = np.cumsum(breaks)
+    order = np.lexsort((bounds[:, 0], row_of))
+    return order, row_of[order]
+
+def detect_columns(bounds: np.ndarray, min_gap: float) -> np.ndarray:
+    """
+    Column spans [[x0, x1], ...] from the horizontal projection of the given
+    boxes: columns are covered x-ranges separated by empty runs >= min_gap.
+    """
+    if not len(bounds):
+        return np.empty((0, 2), dtype=np.float32)
+    spans = bounds[np.argsort(bounds[:, 0], kind="stable")][:, [0, 2]]
+    # Running max of right edges: a gap exists where the next box starts past it
+    reach = np.maximum.accumulate(spans[:, 1])
+    split = np.flatnonzero(spans[1:, 0] - reach[:-1] >= min_gap) + 1
+    starts = spans[np.r_[0, split], 0]
+    ends = reach[np.r_[split - 1, len(spans) - 1]]
+    return np.stack([starts, ends], axis=1)
+
+def layout_reconstruction(ocr_output: Tokens) -> Dict[str, Any]:
     """
     Reconstructs layout from OCR output.
     Args:
-        ocr_output: List of {text, box, confidence}
+        ocr_output: TokenTable, or a list of {text, box, confidence}
     Returns:
-        dict: {header_text, table_rows, footer_text}
+        dict: {header_text, table_rows, footer_text, rows, columns, table_grid}
+        rows: every row as cells {text, column, box, confidence, token}, left
+            to right; token is the index of the cell in ocr_output
+        columns: [x0, x1] spans detected over the table rows
+        table_grid: table rows as lists with one text slot per column
     """
-    # Sort by Y (top of box)
-    ocr_sorted = sorted(ocr_output, key=lambda x: min([pt[1] for pt in x["box"]]))
-    rows = []
-    current_row = []
-    last_y = None
-    for item in ocr_sorted:
-        y = min([pt[1] for pt in item["box"]])
-        if last_y is None or abs(y - last_y) < 30:
-            current_row.append(item)
-        else:
-            rows.append(current_row)
-            current_row = [item]
-        last_y = y
-    if current_row:
-        rows.append(current_row)
+    table = as_token_table(ocr_output)
+    if not len(table):
+        return {"header_text": "", "table_rows": [], "footer_text": "", "rows": [], "columns": [], "table_grid": []}
+
+    bounds = table.bounds()
+    order, row_ids = cluster_rows(bounds)
+    row_starts = np.flatnonzero(np.r_[True, row_ids[1:] != row_ids[:-1]])
+    row_slices = list(zip(row_starts.tolist(), np.r_[row_starts[1:], len(order)].tolist()))
 
     # Heuristic: header = first 2 rows, footer = last 2 rows, table = middle
-    header_text = " ".join([cell["text"] for row in rows[:2] for cell in row])
-    footer_text = " ".join([cell["text"] for row in rows[-2:] for cell in row])
-    table_rows = [[cell["text"] for cell in row] for row in rows[2:-2]] if len(rows) > 4 else []
+    table_slices = row_slices[2:-2] if len(row_slices) > 4 else []
+    median_height = float(np.median(bounds[:, 3] - bounds[:, 1]))
+    if table_slices:
+        table_idx = order[table_slices[0][0]:table_slices[-1][1]]
+        columns = detect_columns(bounds[table_idx], max(1.0, median_height * COLUMN_GAP_RATIO))
+    else:
+        columns = detect_columns(bounds, max(1.0, median_height * COLUMN_GAP_RATIO))
+
+    centers_x = (bounds[:, 0] + bounds[:, 2]) / 2
+    column_of = np.clip(np.searchsorted(columns[:, 0], centers_x, side="right") - 1, 0, None)
+
+    # Everything below works on plain lists in reading order
+    order_list = order.tolist()
+    texts = [table.texts[i] for i in order_list]
+    columns_sorted = column_of[order].tolist()
+    confidences = np.round(table.confidences[order].astype(np.float64), 4).tolist()
+    cells = [
+        {"text": text, "column": col, "box": box, "confidence": conf, "token": i}
+        for text, col, box, conf, i in zip(texts, columns_sorted, bounds[order].tolist(), confidences, order_list)
+    ]
+    rows = [cells[start:end] for start, end in row_slices]
+
+    header_text = " ".join(texts[s] for start, end in row_slices[:2] for s in range(start, end))
+    footer_text = " ".join(texts[s] for start, end in row_slices[-2:] for s in range(start, end))
+    table_rows = [[texts[s] for s in range(start, end)] for start, end in table_slices]
+
+    table_grid = []
+    for start, end in table_slices:
+        grid_row = [""] * len(columns)
+        for s in range(start, end):
+            col = columns_sorted[s]
+            grid_row[col] = f"{grid_row[col]} {texts[s]}".strip()
+        table_grid.append(grid_row)
 
     return {
         "header_text": header_text,
         "table_rows": table_rows,
-        "footer_text": footer_text
+        "footer_text": footer_text,
+        "rows": rows,
+        "columns": columns.tolist(),
+        "table_grid": table_grid
     }
 
 if __name__ == "__main__":
@@ -1,53 +1,145 @@
 """
 LLM Extractor Module
 Calls local Ollama (llama3) for strict JSON extraction.
+Uses one long-lived HTTP client (connection pool, model kept resident)
+and Ollama's JSON output mode instead of spawning `ollama run` per call.
 """
-import subprocess
+import asyncio
 import json
-from typing import Dict, Any
-import time
+import os
+import threading
+from typing import Any, Dict, Optional
 
-def call_ollama_llm(prompt: str, model: str = "llama3", timeout: int = 20) -> str:
+import httpx
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")       # Keep the model loaded between invoices
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+
+
+class OllamaClient:
     """
-    Calls Ollama LLM with prompt, returns response text.
-    Retries once if timeout or invalid JSON.
+    Pooled client for the Ollama HTTP API, usable from threads and asyncio.
+    At most `max_concurrency` generations are in flight per client.
     """
-    for attempt in range(2):
+
+    def __init__(self, base_url: str = OLLAMA_URL, model: str = OLLAMA_MODEL, timeout: float = 20,
+                 max_concurrency: int = OLLAMA_MAX_CONCURRENCY, keep_alive: str = OLLAMA_KEEP_ALIVE):
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.keep_alive = keep_alive
+        self._limits = httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency)
+        self._client = httpx.Client(base_url=base_url, timeout=timeout, limits=self._limits)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_slots: Optional[asyncio.Semaphore] = None
+
+    def _payload(self, prompt: str, model: Optional[str]) -> Dict[str, Any]:
+        return {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": False,
+            "format": "json",  # Ollama constrains the output to valid JSON
+            "keep_alive": self.keep_alive,
+            "options": {"temperature": 0},
+        }
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> Dict[str, Any]:
+        response.raise_for_status()
+        text = response.json().get("response", "")
         try:
-            proc = subprocess.Popen(
-                ["ollama", "run", model],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            try:
-                out, err = proc.communicate(prompt, timeout=timeout)
-            except subprocess.TimeoutExpired:
-                proc.kill()
-                if attempt == 0:
-                    continue
-                raise TimeoutError("Ollama LLM timeout")
-            if err:
-                raise RuntimeError(f"Ollama error: {err}")
-            # Find first JSON object in output
-            try:
-                start = out.index('{')
-                end = out.rindex('}') + 1
-                json_str = out[start:end]
-                json.loads(json_str)  # Validate
-                return json_str
-            except Exception:
-                if attempt == 0:
-                    continue
-                raise ValueError("Invalid JSON from LLM")
-        except Exception as e:
-            if attempt == 1:
-                raise e
-            time.sleep(1)
-    raise RuntimeError("LLM extraction failed")
-
-def llm_extract(structured_text: str, model: str = "llama3") -> Dict[str, Any]:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON from LLM")
+
+    def generate_json(self, prompt: str, model: Optional[str] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run one generation in JSON mode and return the parsed object.
+        Retries once on connection errors and timeouts.
+        """
+        request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        with self._slots:
+            for attempt in range(2):
+                try:
+                    response = self._client.post("/api/generate", json=self._payload(prompt, model),
+                                                 timeout=request_timeout)
+                    return self._parse(response)
+                except httpx.TimeoutException:
+                    if attempt == 1:
+                        raise TimeoutError("Ollama LLM timeout")
+                except httpx.TransportError:
+                    if attempt == 1:
+                        raise
+        raise RuntimeError("LLM extraction failed")
+
+    async def agenerate_json(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of generate_json, sharing the concurrency limit per event loop."""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self._limits)
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._async_slots:
+            for attempt in range(2):
+                try:
+                    response = await self._async_client.post("/api/generate", json=self._payload(prompt, model))
+                    return self._parse(response)
+                except httpx.TimeoutException:
+                    if attempt == 1:
+                        raise TimeoutError("Ollama LLM timeout")
+                except httpx.TransportError:
+                    if attempt == 1:
+                        raise
+        raise RuntimeError("LLM extraction failed")
+
+    def warm(self, model: Optional[str] = None) -> None:
+        """Load the model into memory ahead of the first invoice (empty prompt)."""
+        self._client.post(
+            "/api/generate", json={"model": model or self.model, "keep_alive": self.keep_alive}
+        ).raise_for_status()
+
+    def close(self) -> None:
+        self._client.close()
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+_default_client: Optional[OllamaClient] = None
+_default_lock = threading.Lock()
+
+
+def get_llm_client() -> OllamaClient:
+    """Process-wide OllamaClient, created on first use."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = OllamaClient()
+        return _default_client
+
+
+def build_prompt(structured_text: str) -> str:
+    return (
+        "Extract all invoice fields as strict JSON. "
+        "Respond ONLY with JSON.\n"
+        f"Text: {structured_text}\n"
+    )
+
+
+def call_ollama_llm(prompt: str, model: str = OLLAMA_MODEL, timeout: int = 20) -> str:
+    """
+    Calls Ollama LLM with prompt, returns the JSON response text.
+    """
+    return json.dumps(get_llm_client().generate_json(prompt, model, timeout=timeout))
+
+
+def llm_extract(structured_text: str, model: str = OLLAMA_MODEL) -> Dict[str, Any]:
     """
     Extracts invoice fields using local LLM, returns dict.
     Args:
@@ -56,13 +148,13 @@ def llm_extract(structured_text: str, model: str = "llama3") -> Dict[str, Any]:
     Returns:
         dict: Structured invoice fields
     """
-    prompt = (
-        "Extract all invoice fields as strict JSON. "
-        "Respond ONLY with JSON.\n"
-        f"Text: {structured_text}\n"
-    )
-    json_str = call_ollama_llm(prompt, model)
-    return json.loads(json_str)
+    return get_llm_client().generate_json(build_prompt(structured_text), model)
+
+
+async def allm_extract(structured_text: str, model: str = OLLAMA_MODEL) -> Dict[str, Any]:
+    """Async variant of llm_extract."""
+    return await get_llm_client().agenerate_json(build_prompt(structured_text), model)
+
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,86 @@
+"""
+Memory Stats Module
+Process RSS and peak RSS readings for request reporting and memory budgets.
+"""
+import resource
+import sys
+from typing import Dict
+
+
+def _status_kb(field: str) -> int:
+    """Read a kB field (VmRSS, VmHWM) from /proc/self/status; 0 if unavailable."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process right now."""
+    kb = _status_kb("VmRSS")
+    return round(kb / 1024, 1)
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS since process start or the last reset_peak_rss()."""
+    kb = _status_kb("VmHWM")
+    if not kb:
+        # ru_maxrss is kB on Linux, bytes on macOS
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            kb //= 1024
+    return round(kb / 1024, 1)
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the kernel's peak RSS counter (Linux >= 4.0) so the next
+    peak_rss_mb() covers only what happens from now on.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def limit_data_growth(headroom_mb: float) -> bool:
+    """
+    Cap this process's data segment (RLIMIT_DATA: heap and private anonymous
+    mappings) at its current size plus headroom_mb, so allocations beyond it
+    fail with MemoryError instead of waiting for the OOM killer.
+    Returns False where the limit cannot be read or set.
+    """
+    kb = _status_kb("VmData")
+    if not kb:
+        return False
+    limit = kb * 1024 + int(max(0.0, headroom_mb) * 1024 * 1024)
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+    except (ValueError, OSError):
+        return False
+    return True
+
+
+def available_memory_mb() -> float:
+    """MemAvailable from /proc/meminfo (what new processes can use); 0 if unavailable."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0.0
+
+
+def snapshot() -> Dict[str, float]:
+    return {"rss_mb": current_rss_mb(), "peak_rss_mb": peak_rss_mb()}
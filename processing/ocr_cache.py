@@ -0,0 +1,220 @@
+"""
+OCR Result Cache Module
+Content-addressed cache for OCR results: an in-process LRU tier with
+size/TTL eviction, backed by an optional shared tier (on-disk or Redis).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from tokens import json_default, json_object_hook
+
+logger = logging.getLogger("ocr-service.cache")
+
+
+def content_key(data: Any, *namespace: str) -> str:
+    """
+    Hash raw bytes (anything exposing the buffer protocol) together with the
+    namespace parts, e.g. engine/model/preprocessing version and result kind.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for part in namespace:
+        h.update(part.encode())
+        h.update(b"\0")
+    h.update(memoryview(data).cast("B"))
+    return h.hexdigest()
+
+
+class MemoryTier:
+    """
+    Thread-safe LRU bounded by entry count and approximate payload size,
+    with a per-entry TTL.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, size, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+class DiskTier:
+    """
+    Shared tier storing one JSON file per key under a directory.
+    Usable by several processes on one host (e.g. process-mode pool, bulk runs).
+    """
+
+    def __init__(self, directory: str, ttl: float = 24 * 3600):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except (FileNotFoundError, OSError):
+            return None
+
+    def set(self, key: str, payload: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+
+class RedisTier:
+    """
+    Shared tier on the Redis instance the stack already runs.
+    """
+
+    def __init__(self, url: str, ttl: float = 24 * 3600, prefix: str = "ocr:cache:"):
+        import redis  # Optional dependency, only needed for this tier
+
+        self.client = redis.Redis.from_url(url, socket_timeout=1)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, payload: str) -> None:
+        self.client.setex(self.prefix + key, self.ttl, payload)
+
+
+def build_shared_tier(target: str, ttl: float) -> Any:
+    """
+    "redis://..." -> RedisTier, any other non-empty value -> DiskTier directory.
+    """
+    if not target:
+        return None
+    if target.startswith(("redis://", "rediss://", "unix://")):
+        return RedisTier(target, ttl=ttl)
+    return DiskTier(target, ttl=ttl)
+
+
+class OCRCache:
+    """
+    Two-tier cache: memory first, then the shared tier (promoting hits).
+    Shared-tier failures are logged and treated as misses; the cache must
+    never fail a request. From async code use aget/aset, which keep shared-tier
+    I/O (Redis round trips, file reads and writes) off the event loop.
+    """
+
+    def __init__(self, memory: MemoryTier, shared: Any = None):
+        self.memory = memory
+        self.shared = shared
+        self._hits = {"memory": 0, "shared": 0}
+        self._misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._hits["memory"] += 1
+            return value
+        return self._get_shared(key)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get() for async callers: memory hits inline, the shared tier on a worker thread."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._hits["memory"] += 1
+            return value
+        if self.shared is None:
+            self._misses += 1
+            return None
+        return await asyncio.to_thread(self._get_shared, key)
+
+    def _get_shared(self, key: str) -> Optional[Any]:
+        if self.shared is not None:
+            try:
+                payload = self.shared.get(key)
+            except Exception as e:
+                logger.warning(f"Shared cache read failed: {e}")
+                payload = None
+            if payload is not None:
+                value = json.loads(payload, object_hook=json_object_hook)
+                self.memory.set(key, value, len(payload))
+                self._hits["shared"] += 1
+                return value
+        self._misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        # Token tables are stored columnar and revived on read
+        payload = json.dumps(value, default=json_default)
+        self.memory.set(key, value, len(payload))
+        if self.shared is not None:
+            try:
+                self.shared.set(key, payload)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed: {e}")
+
+    async def aset(self, key: str, value: Any) -> None:
+        """set() for async callers: serialisation and the shared-tier write run on a worker thread."""
+        if self.shared is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.memory),
+            "bytes": self.memory.size_bytes,
+            "hits_memory": self._hits["memory"],
+            "hits_shared": self._hits["shared"],
+            "misses": self._misses,
+            "shared_tier": type(self.shared).__name__ if self.shared is not None else None,
+        }
@@ -2,60 +2,291 @@
 OCR Engine Module using PaddleOCR
 Supports multi-pass (normal, high contrast, denoised) and merges results.
 """
-from paddleocr import PaddleOCR
 import cv2
 import numpy as np
-from typing import List, Dict, Any
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 
-def run_ocr(image: np.ndarray, ocr: PaddleOCR) -> List[Dict[str, Any]]:
+from image_io import load_image
+from inference_pool import build_engine
+from preprocessing import OCR_DENOISER, DocumentVariants
+from tokens import TokenTable, Tokens, as_token_table
+
+if TYPE_CHECKING:
+    from paddleocr import PaddleOCR
+
+def run_ocr(image: np.ndarray, ocr: "PaddleOCR") -> TokenTable:
+    """
+    Runs OCR and returns the tokens as a TokenTable.
     """
-    Runs OCR and returns list of {text, box, confidence}.
+    return TokenTable.from_paddle(ocr.ocr(image, cls=True))
+
+def mean_confidence(results: Tokens) -> float:
+    """Mean token confidence; 0.0 for an empty result."""
+    table = as_token_table(results)
+    if not len(table):
+        return 0.0
+    return float(table.confidences.mean())
+
+# Pass name -> DocumentVariants variant it reads ("normal" can be overridden per
+# run). All are built from the deskewed image, so every pass returns boxes in
+# the same frame and merge_ocr_results can match them by overlap
+PASSES = {
+    "normal": "deskewed",
+    "high_contrast": "high_contrast",
+    "denoised": "denoised",
+}
+
+# Boxes from different passes with IoU at or above this are the same token
+MERGE_IOU_THRESHOLD = 0.5
+
+def pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Element-wise IoU of two (N, 4) [x0, y0, x1, y1] arrays."""
+    iw = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None)
+    ih = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None)
+    inter = iw * ih
+    union = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+def overlap_candidates(bounds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
-    result = ocr.ocr(image, cls=True)
-    out = []
-    for line in result[0]:
-        text = line[1][0]
-        conf = float(line[1][1])
-        box = line[0]
-        out.append({"text": text, "box": box, "confidence": conf})
-    return out
-
-def merge_ocr_results(*results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    Spatial index: bucket every box into the uniform grid cells it covers and
+    return the (i, j), i < j, pairs sharing at least one cell. Overlapping
+    boxes always share a cell, so no overlapping pair is missed.
+    """
+    heights = bounds[:, 3] - bounds[:, 1]
+    # Cells about two text lines tall: most boxes touch only a handful
+    cell = max(8.0, float(np.median(heights)) * 2)
+    cells = np.floor(bounds / cell).astype(np.int64)
+    cells -= np.tile(cells[:, :2].min(axis=0), 2)
+    nx = cells[:, 2] - cells[:, 0] + 1
+    ny = cells[:, 3] - cells[:, 1] + 1
+    per_box = nx * ny
+
+    # One (cell id, box) entry per covered cell
+    box_idx = np.repeat(np.arange(len(bounds)), per_box)
+    local = np.arange(box_idx.size) - np.repeat(np.cumsum(per_box) - per_box, per_box)
+    cx = cells[box_idx, 0] + local % nx[box_idx]
+    cy = cells[box_idx, 1] + local // nx[box_idx]
+    cell_id = cy * (int(cells[:, 2].max()) + 1) + cx
+
+    # Group entries by cell, then emit every pair inside each group
+    order = np.argsort(cell_id, kind="stable")
+    cell_id, box_idx = cell_id[order], box_idx[order]
+    starts = np.flatnonzero(np.r_[True, cell_id[1:] != cell_id[:-1]])
+    sizes = np.diff(np.r_[starts, cell_id.size])
+    group_size = np.repeat(sizes, sizes)
+    group_start = np.repeat(starts, sizes)
+    left = np.repeat(np.arange(cell_id.size), group_size)
+    right = np.repeat(group_start, group_size) + (
+        np.arange(left.size) - np.repeat(np.cumsum(group_size) - group_size, group_size)
+    )
+    i, j = box_idx[left], box_idx[right]
+    mask = i < j
+    pairs = np.unique(i[mask] * len(bounds) + j[mask])
+    return pairs // len(bounds), pairs % len(bounds)
+
+def merge_ocr_results(*results: Tokens, iou_threshold: float = MERGE_IOU_THRESHOLD) -> TokenTable:
     """
     Merge OCR results by box overlap, keep highest confidence.
+    Candidate pairs come from a grid spatial index and their IoU is computed
+    in one vectorized step. Tokens are then resolved from highest to lowest
+    confidence: a token is dropped if it overlaps a kept token with
+    IoU >= iou_threshold.
     """
-    merged = {}
-    for res in results:
-        for item in res:
-            key = tuple(map(lambda x: int(x), np.array(item["box"]).flatten()))
-            if key not in merged or item["confidence"] > merged[key]["confidence"]:
-                merged[key] = item
-    return list(merged.values())
-
-def ocr_engine(image_path: str) -> List[Dict[str, Any]]:
+    items = TokenTable.concat(results)
+    if not len(items):
+        return items
+    bounds = items.bounds()
+    confidences = items.confidences
+
+    i, j = overlap_candidates(bounds)
+    hit = pairwise_iou(bounds[i], bounds[j]) >= iou_threshold
+    i, j = i[hit], j[hit]
+    if not i.size:
+        return items
+
+    # Rank by confidence; identical boxes keep the first-seen token on ties
+    rank = np.empty(len(items), dtype=np.int64)
+    rank[np.argsort(-confidences, kind="stable")] = np.arange(len(items))
+    winner = np.where(rank[i] < rank[j], i, j)
+    loser = np.where(rank[i] < rank[j], j, i)
+
+    # Greedy resolution over the (few) boxes that have duplicates
+    by_winner = np.argsort(rank[winner], kind="stable")
+    winner, loser = winner[by_winner], loser[by_winner]
+    bounds_of = np.flatnonzero(np.r_[True, winner[1:] != winner[:-1]])
+    ends = np.r_[bounds_of[1:], winner.size]
+    dropped = np.zeros(len(items), dtype=bool)
+    for start, end in zip(bounds_of.tolist(), ends.tolist()):
+        if not dropped[winner[start]]:
+            dropped[loser[start:end]] = True
+
+    return items.take(~dropped)
+
+class MultiPassOCR:
+    """
+    Reusable multi-pass OCR engine: models are loaded once and reused.
+    Passes (normal, high contrast, denoised) run concurrently: each pass
+    builds its variant of the document on its own thread and borrows one of
+    the engines. Variants and their OCR results are cached on the
+    DocumentVariants, so a second run over the same document (recovery
+    mode) only recognizes the variants that changed. The expensive denoise
+    pass is skipped when pass 1's mean confidence already reaches
+    `skip_confidence`.
+    """
+
+    def __init__(self, engines: Optional[List["PaddleOCR"]] = None, concurrency: int = 1,
+                 skip_confidence: float = 0.9, denoiser: str = OCR_DENOISER):
+        if engines is None:
+            engines = [build_engine() for _ in range(max(1, concurrency))]
+        self._engines: "queue.Queue[PaddleOCR]" = queue.Queue()
+        for engine in engines:
+            self._engines.put(engine)
+        # One thread per pass: variant preparation overlaps with OCR
+        self._executor = ThreadPoolExecutor(max_workers=len(PASSES), thread_name_prefix="ocr-pass")
+        self.skip_confidence = skip_confidence
+        self.denoiser = denoiser
+        self._lock = threading.Lock()
+        self._pass_seconds = {name: 0.0 for name in PASSES}
+        self._pass_runs = {name: 0 for name in PASSES}
+        self._passes_skipped = 0
+        self._passes_reused = 0
+        self._documents = 0
+
+    def _run_pass(self, doc: DocumentVariants, variant_name: str) -> Tuple[TokenTable, float]:
+        start = time.perf_counter()
+        variant = doc.get(variant_name)
+        if variant.ndim == 2:
+            variant = cv2.cvtColor(variant, cv2.COLOR_GRAY2BGR)
+        engine = self._engines.get()
+        try:
+            result = run_ocr(variant, engine)
+        finally:
+            self._engines.put(engine)
+        doc.remember(variant_name, result)
+        return result, time.perf_counter() - start
+
+    def run_document(self, doc: DocumentVariants, normal: str = PASSES["normal"]) -> Tuple[TokenTable, Dict[str, Any]]:
+        """
+        Run all passes over a document's variants and merge them.
+        Args:
+            doc: The document's DocumentVariants
+            normal: Variant read by the normal pass (e.g. "binarized", "recovery");
+                must be in the deskewed frame like the other passes
+        Returns:
+            (merged results, {pass_seconds, skipped, reused})
+        """
+        variants = {**PASSES, "normal": normal}
+        results = {}
+        timings = {}
+        reused = []
+        futures = {}
+        for name in ("normal", "high_contrast"):
+            cached = doc.recall(variants[name])
+            if cached is not None:
+                results[name] = cached
+                reused.append(name)
+            else:
+                futures[name] = self._executor.submit(self._run_pass, doc, variants[name])
+
+        if "normal" in futures:
+            results["normal"], timings["normal"] = futures.pop("normal").result()
+        skipped = []
+        cached = doc.recall(variants["denoised"])
+        if cached is not None:
+            results["denoised"] = cached
+            reused.append("denoised")
+        elif mean_confidence(results["normal"]) >= self.skip_confidence:
+            skipped.append("denoised")
+        else:
+            futures["denoised"] = self._executor.submit(self._run_pass, doc, variants["denoised"])
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+
+        with self._lock:
+            self._documents += 1
+            self._passes_skipped += len(skipped)
+            self._passes_reused += len(reused)
+            for name, seconds in timings.items():
+                self._pass_seconds[name] += seconds
+                self._pass_runs[name] += 1
+
+        merged = merge_ocr_results(*(results[name] for name in PASSES if name in results))
+        return merged, {"pass_seconds": timings, "skipped": skipped, "reused": reused}
+
+    def run_with_stats(self, image: np.ndarray) -> Tuple[TokenTable, Dict[str, Any]]:
+        """
+        Run all passes on a decoded image and merge them.
+        Returns (merged results, {pass_seconds, skipped, reused}).
+        """
+        return self.run_document(DocumentVariants(image, denoiser=self.denoiser))
+
+    def recognize(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """
+        Recognition only (no detection, no angle classifier) over line crops,
+        batched in one call. Returns (text, confidence) per crop, in order.
+        """
+        if not crops:
+            return []
+        crops = [cv2.cvtColor(c, cv2.COLOR_GRAY2BGR) if c.ndim == 2 else c for c in crops]
+        engine = self._engines.get()
+        try:
+            rec_res, _ = engine.text_recognizer(crops)
+        finally:
+            self._engines.put(engine)
+        return [(text, float(score)) for text, score in rec_res]
+
+    def run(self, image: np.ndarray) -> TokenTable:
+        return self.run_with_stats(image)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Cumulative per-pass timing and the passes-skipped counter."""
+        with self._lock:
+            return {
+                "documents": self._documents,
+                "passes_skipped": self._passes_skipped,
+                "passes_reused": self._passes_reused,
+                "pass_runs": dict(self._pass_runs),
+                "pass_seconds_total": {k: round(v, 4) for k, v in self._pass_seconds.items()},
+                "pass_seconds_mean": {
+                    k: round(self._pass_seconds[k] / self._pass_runs[k], 4) if self._pass_runs[k] else 0.0
+                    for k in PASSES
+                },
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_default_engine: Optional[MultiPassOCR] = None
+_default_lock = threading.Lock()
+
+
+def get_multipass_engine() -> MultiPassOCR:
+    """Process-wide MultiPassOCR, built on first use."""
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = MultiPassOCR()
+        return _default_engine
+
+
+def ocr_engine(image: Any) -> TokenTable:
     """
     Runs PaddleOCR on image with multi-pass and merges results.
     Args:
-        image_path: Path to image file.
+        image: Path to image file, encoded bytes, or a decoded BGR ndarray.
     Returns:
-        List of {text, box, confidence}
+        TokenTable of the merged tokens (iterates as {text, box, confidence})
     """
-    ocr = PaddleOCR(use_angle_cls=True, lang='en')
-    img = cv2.imread(image_path)
+    img = load_image(image)
     if img is None:
         raise ValueError("File not readable")
-
-    # Pass 1: normal
-    res1 = run_ocr(img, ocr)
-    # Pass 2: high contrast
-    high_contrast = cv2.convertScaleAbs(img, alpha=1.5, beta=0)
-    res2 = run_ocr(high_contrast, ocr)
-    # Pass 3: denoised
-    denoised = cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21)
-    res3 = run_ocr(denoised, ocr)
-
-    merged = merge_ocr_results(res1, res2, res3)
-    return merged
+    return get_multipass_engine().run(img)
 
 if __name__ == "__main__":
     # Example usage
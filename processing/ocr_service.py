@@ -3,121 +3,436 @@ OCR Microservice for AutoGST Billing
 Exposes a POST endpoint to process images and PDFs using PaddleOCR.
 """
 import uvicorn
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
-from fastapi.responses import JSONResponse
+import asyncio
+import contextvars
+import json
+import time
+import uuid
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Depends, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import logging
-from paddleocr import PaddleOCR
-import cv2
+import os
 import numpy as np
 import fitz  # PyMuPDF
 from io import BytesIO
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 import gc
 
+import memstats
+from batching import MicroBatcher
+from image_io import RasterPool, decode_image_buffer, fit_to_dimension, render_pdf_page
+from inference_pool import InferencePool, PoolSaturated, engine_version, get_engine
+from job_queue import JOB_PRIORITIES, Job, JobConflict, JobQueue
+from ocr_cache import MemoryTier, OCRCache, build_shared_tier, content_key
+from pipeline import OCR_RECOVERY, StageTimer, allm_fallback, get_worker_pipeline, needs_llm_fallback
+from preprocessing import OCR_DENOISER
+import response_format
+from quality_gate import check_image_quality
+from startup import StartupState, process_age_seconds, warmup_image
+import telemetry
+from text_layer import PDF_TEXT_LAYER, pdf_text_tokens
+from tokens import TokenTable
+from uploads import Upload, UploadTooLarge, read_upload as read_upload_file
+
 # 1️⃣ LOGGING CONFIG
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ocr-service")
 
 # 2️⃣ LIMITS & CONSTANTS
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-MAX_PDF_PAGES = 5                 # Prevents long-running blocking jobs
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE_MB", "10")) * 1024 * 1024
+# Larger uploads are memory-mapped from the multipart temp file instead of read into RAM
+UPLOAD_MAP_THRESHOLD = int(os.getenv("UPLOAD_MAP_THRESHOLD_KB", "1024")) * 1024
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "20"))  # Prevents long-running blocking jobs
 MAX_IMAGE_DIMENSION = 2000        # Downscale if larger (Memory safety)
+PDF_RENDER_DPI = 300              # Upper bound; clamped so pages never exceed MAX_IMAGE_DIMENSION
+
+# 3️⃣ INFERENCE POOL (Each worker owns its own PaddleOCR instance)
+# thread: cheap, shares memory | process: isolates the GIL, one model copy per worker
+OCR_POOL_MODE = os.getenv("OCR_POOL_MODE", "thread")
+OCR_POOL_WORKERS = int(os.getenv("OCR_POOL_WORKERS", "1"))
+OCR_POOL_MAX_QUEUE = int(os.getenv("OCR_POOL_MAX_QUEUE", "8"))  # Waiting requests before 429
+OCR_RETRY_AFTER_SECONDS = int(os.getenv("OCR_RETRY_AFTER_SECONDS", "5"))
+
+# Pages of one PDF OCR'd at the same time (one more page is rendered ahead)
+PDF_PAGE_CONCURRENCY = int(os.getenv("PDF_PAGE_CONCURRENCY", str(OCR_POOL_WORKERS)))
+
+# Page rasters are rendered into reused buffers (MAX_IMAGE_DIMENSION² BGR, ~11MB each); 0 = allocate per page
+OCR_RASTER_BUFFERS = int(os.getenv("OCR_RASTER_BUFFERS", str(2 * (PDF_PAGE_CONCURRENCY + 1))))
+raster_pool = RasterPool(OCR_RASTER_BUFFERS, MAX_IMAGE_DIMENSION)
+
+# MuPDF's context and store are process-wide and not thread-safe: every fitz call of every
+# request (open, text layer, render, close) runs on this one thread, pages of concurrent PDFs interleaved
+pdf_renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-render")
+
+# background: bind at once, load + warm every worker behind /health/ready | eager: before binding | lazy: on first request
+OCR_MODEL_LOAD = os.getenv("OCR_MODEL_LOAD", "background")
+OCR_WARMUP = os.getenv("OCR_WARMUP", "1") == "1"  # One inference on a built-in tiny image per worker
+
+def warm_up_worker() -> None:
+    """
+    Runs once on every pool worker after its models load: the built-in tiny
+    image through the same OCR path real requests take, so the first of them
+    doesn't pay first-call allocation and kernel setup.
+    """
+    img = warmup_image()
+    if OCR_PIPELINE:
+        get_worker_pipeline(use_llm=False).ocr.run(img)
+    else:
+        ocr_array(img)
+
+inference_pool = InferencePool(
+    workers=OCR_POOL_WORKERS,
+    max_queue=OCR_POOL_MAX_QUEUE,
+    mode=OCR_POOL_MODE,
+    retry_after=OCR_RETRY_AFTER_SECONDS,
+    warmup=warm_up_worker if OCR_WARMUP else None,
+)
+startup = StartupState(OCR_MODEL_LOAD)
+
+# 4️⃣ MICRO-BATCHING (Recognition over crops of several images at once)
+# A max batch size of 1 disables batching: each image is one ocr() call
+OCR_BATCH_MAX_SIZE = int(os.getenv("OCR_BATCH_MAX_SIZE", "1"))
+OCR_BATCH_MAX_WAIT_MS = float(os.getenv("OCR_BATCH_MAX_WAIT_MS", "20"))
 
-# 3️⃣ SINGLETON OCR INSTANCE (Global Scope)
-try:
-    logger.info("Initializing PaddleOCR (Heavy Model Loading)...")
-    # Initialize once at startup to avoid reloading per request
-    ocr_engine = PaddleOCR(use_angle_cls=True, lang='en', show_log=False)
-    logger.info("PaddleOCR Initialized Successfully")
-except Exception as e:
-    logger.critical(f"Failed to initialize PaddleOCR: {e}")
-    raise RuntimeError("OCR Engine could not start")
+micro_batcher = (
+    MicroBatcher(inference_pool, max_batch_size=OCR_BATCH_MAX_SIZE, max_wait_ms=OCR_BATCH_MAX_WAIT_MS)
+    if OCR_BATCH_MAX_SIZE > 1 else None
+)
+
+# 5️⃣ EXTRACTION PIPELINE (quality -> normalize -> OCR -> layout -> rules -> validate -> LLM)
+OCR_PIPELINE = os.getenv("OCR_PIPELINE", "1") == "1"          # 0 = plain single-pass OCR only
+# LLM fallback when rules aren't enough; needs an Ollama server (OLLAMA_URL). Awaited on the
+# event loop, never in a pool worker, so a slow generation doesn't stall OCR
+OCR_PIPELINE_LLM = os.getenv("OCR_PIPELINE_LLM", "0") == "1"
+OCR_QUALITY_GATE = os.getenv("OCR_QUALITY_GATE", "1") == "1"  # Reject unusable images before any inference
+
+# 6️⃣ RESULT CACHE (Content-addressed: same bytes + same engine = same result)
+# Bump PREPROCESSING_VERSION whenever decoding/rendering changes OCR input
+PREPROCESSING_VERSION = f"v2;dpi={PDF_RENDER_DPI};max_dim={MAX_IMAGE_DIMENSION}"
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "512"))  # 0 disables the cache
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", "64"))
+OCR_CACHE_TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL_SECONDS", "3600"))
+OCR_CACHE_SHARED = os.getenv("OCR_CACHE_SHARED", "")  # "redis://..." or a directory; empty = memory only
+OCR_CACHE_SHARED_TTL_SECONDS = int(os.getenv("OCR_CACHE_SHARED_TTL_SECONDS", str(7 * 24 * 3600)))
+
+CACHE_NAMESPACE = (engine_version(), PREPROCESSING_VERSION)
+
+ocr_cache = (
+    OCRCache(
+        MemoryTier(OCR_CACHE_MAX_ENTRIES, OCR_CACHE_MAX_MB * 1024 * 1024, OCR_CACHE_TTL_SECONDS),
+        build_shared_tier(OCR_CACHE_SHARED, OCR_CACHE_SHARED_TTL_SECONDS),
+    )
+    if OCR_CACHE_MAX_ENTRIES > 0 else None
+)
+
+# 7️⃣ TELEMETRY (Prometheus /metrics + per-request trace spans, see telemetry.py)
+# Trace ids: X-Request-ID / traceparent headers, plus the job_id form field
+telemetry.gauge("ocr_pool_in_flight", "Requests running on the inference pool",
+                lambda: inference_pool.stats()["in_flight"])
+telemetry.gauge("ocr_pool_queue_depth", "Admitted requests waiting for a pool worker",
+                lambda: inference_pool.stats()["queue_depth"])
+if ocr_cache:
+    telemetry.gauge("ocr_cache_bytes", "Size of the in-memory result cache", lambda: ocr_cache.stats()["bytes"])
+telemetry.gauge("ocr_ready", "1 once models are loaded and warm (see /health/ready)", lambda: float(startup.ready))
+
+# 8️⃣ ASYNC JOBS (POST /jobs, then poll GET /jobs/{job_id}; see job_queue.py)
+# Queued jobs hold their upload: in memory up to UPLOAD_MAP_THRESHOLD, mapped from its temp file beyond
+OCR_JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", str(OCR_POOL_WORKERS)))  # Jobs running at once
+OCR_JOB_MAX_QUEUE = int(os.getenv("OCR_JOB_MAX_QUEUE", "16"))  # Waiting jobs before 429
+OCR_JOB_RESULT_TTL_SECONDS = int(os.getenv("OCR_JOB_RESULT_TTL_SECONDS", "900"))
+OCR_JOB_MAX_RESULTS = int(os.getenv("OCR_JOB_MAX_RESULTS", "256"))
+OCR_JOB_MAX_WAIT_SECONDS = 30     # Longest long-poll (GET /jobs/{job_id}?wait=)
+JOB_POLL_AFTER_SECONDS = 1        # Retry-After on "still running" answers
+JOB_ADMIT_BACKOFF_SECONDS = 0.25  # Jobs wait for a pool slot instead of taking a 429
 
 app = FastAPI(title="AutoGST OCR Service")
 
+@app.on_event("startup")
+async def start_inference_pool():
+    startup.milestone("app_start")  # Interpreter start + imports
+    try:
+        logger.info(f"Starting inference pool (model load: {OCR_MODEL_LOAD})...")
+        with startup.phase("pool_start"):
+            inference_pool.start()
+            if micro_batcher:
+                micro_batcher.start()
+            job_queue.start()
+    except Exception as e:
+        startup.mark_failed(e)
+        logger.critical(f"Failed to start inference pool: {e}")
+        raise RuntimeError("OCR Engine could not start")
+
+    if OCR_MODEL_LOAD == "eager":
+        await load_models()
+        if not startup.ready:
+            raise RuntimeError("OCR Engine could not start")
+    elif OCR_MODEL_LOAD == "background":
+        # Requests arriving meanwhile queue behind the load instead of failing
+        app.state.model_loader = asyncio.create_task(load_models())
+    else:
+        startup.mark_ready()
+    startup.milestone("serving")
+
+async def load_models() -> None:
+    """
+    Start and warm up every pool worker (Heavy Model Loading); the service is
+    ready when all of them are.
+    """
+    startup.loading()
+    try:
+        with startup.phase("model_load"):
+            workers = await inference_pool.start_workers()
+    except Exception as e:
+        startup.mark_failed(e)
+        logger.critical(f"Failed to load OCR models: {e}")
+        # A stopped pool answers every request with 503 instead of a broken executor's 500
+        await asyncio.to_thread(inference_pool.shutdown)
+        return
+    startup.mark_ready(workers)
+    logger.info(f"OCR engine ready | Startup: {startup.report()}")
+
+@app.on_event("shutdown")
+async def stop_inference_pool():
+    loader = getattr(app.state, "model_loader", None)
+    if loader is not None:
+        loader.cancel()
+        await asyncio.gather(loader, return_exceptions=True)
+    await job_queue.stop()
+    if micro_batcher:
+        await micro_batcher.stop()
+    inference_pool.shutdown()
+
 def resize_image_if_large(img: np.ndarray) -> np.ndarray:
     """
     Downscale image if dimensions exceed MAX_IMAGE_DIMENSION.
     Preserves aspect ratio. Reduces OCR memory usage.
     """
-    height, width = img.shape[:2]
-    if max(height, width) > MAX_IMAGE_DIMENSION:
-        scale = MAX_IMAGE_DIMENSION / max(height, width)
-        new_width = int(width * scale)
-        new_height = int(height * scale)
-        logger.info(f"Downscaling image from {width}x{height} to {new_width}x{new_height}")
-        return cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
-    return img
+    return fit_to_dimension(img, MAX_IMAGE_DIMENSION)
 
-def process_image(image_bytes: bytes) -> List[Dict[str, Any]]:
+def ocr_array(img: np.ndarray) -> TokenTable:
     """
-    Process a single image byte stream through PaddleOCR.
+    Run PaddleOCR on a decoded BGR image.
+    """
+    # Run OCR (engine owned by the current pool worker)
+    return TokenTable.from_paddle(get_engine().ocr(img, cls=True))
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """
+    Decode an image byte stream to BGR, downscaled to MAX_IMAGE_DIMENSION.
+    Decodes straight from the upload buffer; large JPEGs use reduced decode.
+    """
+    img = decode_image_buffer(image_bytes, MAX_IMAGE_DIMENSION)
+
+    if img is None:
+        raise ValueError("Could not decode image")
+
+    # 🛡️ Memory Protection: Resize huge images
+    return resize_image_if_large(img)
+
+def process_image(upload: Upload) -> TokenTable:
+    """
+    Process a single uploaded image through PaddleOCR.
     """
     try:
-        # Decode image from bytes
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            raise ValueError("Could not decode image")
-
-        # 🛡️ Memory Protection: Resize huge images
-        img = resize_image_if_large(img)
-
-        # Run OCR
-        result = ocr_engine.ocr(img, cls=True)
-        
-        output = []
-        if result and result[0]:
-            for line in result[0]:
-                text = line[1][0]
-                confidence = float(line[1][1])
-                box = line[0] # [[x1,y1], [x2,y2], ...]
-                output.append({
-                    "text": text,
-                    "confidence": round(confidence, 4),
-                    "box": box
-                })
-        return output
+        with telemetry.span("decode", telemetry.DECODE_SECONDS, file_type="image"):
+            img = decode_image(upload.data)
+        return ocr_array(img)
     except Exception as e:
         logger.error(f"Image processing error: {e}")
         raise e
 
+async def recognize(img: np.ndarray) -> TokenTable:
+    """
+    OCR a decoded image, through the micro-batcher when batching is enabled.
+    """
+    if micro_batcher:
+        with telemetry.span("batched_ocr"):
+            return await micro_batcher.submit(img)
+    return await inference_pool.run(ocr_array, img)
+
+async def ocr_image_bytes(upload: Upload) -> TokenTable:
+    """
+    OCR an uploaded image without blocking the event loop.
+    Repeat uploads of the same bytes are served from the result cache.
+    """
+    key = None
+    if ocr_cache:
+        key = await asyncio.to_thread(content_key, upload.data, *CACHE_NAMESPACE, "image")
+        cached = await ocr_cache.aget(key)
+        if cached is not None:
+            logger.info("Image served from OCR cache")
+            return cached
+
+    if not micro_batcher:
+        result = await inference_pool.run(process_image, upload)
+    else:
+        try:
+            with telemetry.span("decode", telemetry.DECODE_SECONDS, file_type="image"):
+                img = await asyncio.to_thread(decode_image, upload.data)
+        except Exception as e:
+            logger.error(f"Image processing error: {e}")
+            raise e
+        result = await recognize(img)
+
+    if key:
+        await ocr_cache.aset(key, result)
+    return result
+
+def open_pdf(pdf_bytes: Any) -> fitz.Document:
+    """
+    Open a PDF from a bytes-like buffer (a mapped upload is read in place)
+    and enforce the page limit.
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    total_pages = len(doc)
+    logger.info(f"Processing PDF with {total_pages} pages")
+    if total_pages > MAX_PDF_PAGES:
+        doc.close()
+        raise ValueError(f"PDF exceeds max allowed pages ({MAX_PDF_PAGES})")
+    return doc
+
+def render_page(doc: fitz.Document, index: int, pool: Optional[RasterPool] = None) -> np.ndarray:
+    """
+    Render one page into a BGR ndarray that already fits MAX_IMAGE_DIMENSION
+    (a buffer from `pool`, to be released, when given).
+    """
+    return render_pdf_page(doc, index, PDF_RENDER_DPI, MAX_IMAGE_DIMENSION, pool)
+
+def page_text_tokens(doc: fitz.Document, index: int) -> Optional[TokenTable]:
+    """
+    Tokens from the page's text layer, in the pixel space render_page would
+    produce; None when the page is scanned (or the fast path is disabled).
+    """
+    return pdf_text_tokens(doc, index, PDF_RENDER_DPI, MAX_IMAGE_DIMENSION) if PDF_TEXT_LAYER else None
+
+def run_image_pipeline(upload: Upload, quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Full extraction pipeline on an uploaded image (runs on a pool worker).
+    Decoding is timed as the pipeline's "decode" stage. The quality gate
+    ran on the raw upload already (quality), or is off; it is never rerun
+    on the decoded image, which is fitted to MAX_IMAGE_DIMENSION.
+    """
+    timer = StageTimer()
+    with timer.stage("decode"):
+        img = decode_image(upload.data)
+    return get_worker_pipeline(use_llm=False).run(img, timer=timer, quality=quality, gate=OCR_QUALITY_GATE)
+
+def run_page_pipeline(img: np.ndarray, whole_document: bool) -> Dict[str, Any]:
+    """
+    Extraction pipeline on a scanned PDF page (runs on a pool worker). The
+    only page of a document goes through the full pipeline like an uploaded
+    image, recovery included. Pages of a longer document get the same
+    normalization and multi-pass OCR; their text stages run over all pages
+    together (run_pdf_extraction). Both return tokens, status and timings.
+    """
+    pipeline = get_worker_pipeline(use_llm=False)
+    if whole_document:
+        return pipeline.run(img, gate=False)
+    timer = StageTimer()
+    return {"status": "ok", "tokens": pipeline.ocr_page(img, timer), "timings": timer.timings}
+
+def run_pdf_extraction(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Text stages of the pipeline over all OCR'd pages of a PDF.
+    """
+    return get_worker_pipeline(use_llm=False).run_pages(pages)
+
+async def finish_extraction(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A pipeline result from a pool worker, completed with the LLM fallback
+    (when enabled) on the event loop.
+    """
+    if not (OCR_PIPELINE_LLM and needs_llm_fallback(result)):
+        return result
+    with telemetry.span("llm"):
+        return await allm_fallback(result)
+
+def extraction_summary(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pipeline result for the response; tokens are already returned as content.
+    """
+    layout = result.get("layout") or {}
+    return {
+        "status": result["status"],
+        "exit_reason": result["exit_reason"],
+        "invoice": result["invoice"],
+        "validation": result["validation"],
+        "source": result["source"],
+        "llm_error": result["llm_error"],
+        "recovery_used": result["recovery_used"],
+        "recovery": result["recovery"],
+        "quality": result["quality"],
+        "table_grid": layout.get("table_grid", []),
+        "timings": result["timings"],
+    }
+
+async def check_upload_quality(image_bytes: bytes) -> Dict[str, Any]:
+    """
+    Quality gate on the raw upload, off the event loop and outside the
+    inference pool: unusable images are answered with 422 in milliseconds.
+    """
+    with telemetry.span("quality_gate"):
+        quality = await asyncio.to_thread(check_image_quality, image_bytes)
+    if quality["status"] != "passed":
+        logger.info(f"Upload rejected by quality gate: {quality['reason']} | {quality['metrics']}")
+        raise HTTPException(status_code=422, detail=quality["reason"])
+    return quality
+
+async def extract_image_bytes(upload: Upload, quality: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Run the extraction pipeline on an uploaded image, through the result cache.
+    """
+    key = None
+    if ocr_cache:
+        key = await asyncio.to_thread(
+            content_key, upload.data, *CACHE_NAMESPACE, f"pipeline;llm={OCR_PIPELINE_LLM};denoiser={OCR_DENOISER}"
+        )
+        cached = await ocr_cache.aget(key)
+        if cached is not None:
+            logger.info("Image served from OCR cache")
+            return cached
+    result = await finish_extraction(await inference_pool.run(run_image_pipeline, upload, quality))
+    telemetry.record_stages(result["timings"])
+    if key and result["status"] == "ok":
+        await ocr_cache.aset(key, result)
+    return result
+
+def load_page_keyed(
+    doc: fitz.Document, index: int, kind: str = "page"
+) -> Tuple[Optional[np.ndarray], Optional[TokenTable], Optional[str]]:
+    """
+    Read a page as (raster, None, key) or, when it has a text layer,
+    (None, tokens, key). Raster keys hash the pixels (and `kind`, the way
+    they are OCR'd), so identical pages are shared across documents; text
+    pages are keyed by their tokens so the whole document can still be
+    cached. Rasters come from raster_pool.
+    """
+    with telemetry.span("text_layer"):
+        tokens = page_text_tokens(doc, index)
+    if tokens is not None:
+        payload = json.dumps(tokens.texts).encode() + tokens.boxes.tobytes()
+        key = content_key(payload, *CACHE_NAMESPACE, "text-page") if ocr_cache else None
+        return None, tokens, key
+    with telemetry.span("render", telemetry.DECODE_SECONDS, file_type="pdf"):
+        img = render_page(doc, index, raster_pool)
+    key = content_key(img, *CACHE_NAMESPACE, kind) if ocr_cache else None
+    return img, None, key
+
 def process_pdf(pdf_bytes: bytes) -> List[Dict[str, Any]]:
     """
-    Process a PDF byte stream by converting pages to images using PyMuPDF.
+    Process a PDF byte stream page by page in the calling thread.
+    Used where no event loop is available; the service uses iter_pdf_pages.
     """
-    pdf_results = []
     doc = None
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        total_pages = len(doc)
-        logger.info(f"Processing PDF with {total_pages} pages")
-
-        if total_pages > MAX_PDF_PAGES:
-            raise ValueError(f"PDF exceeds max allowed pages ({MAX_PDF_PAGES})")
-
-        for i in range(total_pages):
-            page = doc.load_page(i)
-            # Render page to image (pixmap)
-            # Use lower DPI if you hit memory issues (e.g. 150-200)
-            pix = page.get_pixmap(dpi=300) 
-            img_bytes = pix.tobytes("png")
-            
-            # Process the image
-            page_data = process_image(img_bytes)
-            
-            pdf_results.append({
-                "page": i + 1,
-                "content": page_data
-            })
-            
-            # Explicit cleanup per page
-            del pix
-            del img_bytes
-            gc.collect()
-
-        return pdf_results
+        doc = open_pdf(pdf_bytes)
+        pages = []
+        for i in range(len(doc)):
+            tokens = page_text_tokens(doc, i)
+            pages.append({"page": i + 1, "content": tokens if tokens is not None else ocr_array(render_page(doc, i))})
+        return pages
     except Exception as e:
         logger.error(f"PDF processing error: {e}")
         raise e
@@ -125,73 +440,561 @@ def process_pdf(pdf_bytes: bytes) -> List[Dict[str, Any]]:
         if doc:
             doc.close()
 
+async def _cached_document(doc_key: str) -> Optional[List[TokenTable]]:
+    """
+    Resolve a cached document (a list of page keys) to its page results.
+    Returns None unless every page is still cached.
+    """
+    page_keys = await ocr_cache.aget(doc_key)
+    if page_keys is None:
+        return None
+    pages = []
+    for key in page_keys:
+        content = await ocr_cache.aget(key)
+        if content is None:
+            return None
+        pages.append(content)
+    return pages
+
+async def iter_pdf_pages(
+    pdf_bytes: bytes, concurrency: int = PDF_PAGE_CONCURRENCY, extractions: Optional[Dict[int, Dict[str, Any]]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Pipelined PDF processing: pages render on the shared render thread while earlier
+    pages are OCR'd on the inference pool. At most `concurrency` pages are in
+    OCR and one more is rendered ahead. Yields {page, content} in completion order.
+    Pages with a text layer never reach the pool: their tokens come straight
+    from the PDF. Pages (and whole documents) already in the result cache skip OCR.
+    With `extractions`, scanned pages are OCR'd the way the extraction pipeline
+    OCRs images (run_page_pipeline) instead of in a single pass, and the full
+    pipeline result of a single-page scan is stored there under its page number.
+    """
+    ocr_mode = "single-pass"
+    if extractions is not None:
+        ocr_mode = f"pipeline;denoiser={OCR_DENOISER};recovery={OCR_RECOVERY};llm={OCR_PIPELINE_LLM}"
+    doc_key = None
+    if ocr_cache:
+        doc_key = await asyncio.to_thread(
+            content_key, pdf_bytes, *CACHE_NAMESPACE, f"pdf;text_layer={PDF_TEXT_LAYER};ocr={ocr_mode}"
+        )
+        cached_pages = await _cached_document(doc_key)
+        if cached_pages is not None and extractions is not None and len(cached_pages) == 1:
+            extraction = await ocr_cache.aget(f"{doc_key}:extraction")
+            if extraction is None:
+                cached_pages = None  # Its pipeline result expired: run the page again
+            else:
+                extractions[1] = extraction
+        if cached_pages is not None:
+            logger.info("PDF served from OCR cache")
+            for number, content in enumerate(cached_pages, start=1):
+                yield {"page": number, "content": content}
+            return
+
+    context = contextvars.copy_context()  # Render spans belong to this request's trace
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max(1, concurrency) + 1)
+    finished: asyncio.Queue = asyncio.Queue()
+    tasks: List[asyncio.Task] = []
+    page_keys: List[Optional[str]] = []
+    text_pages = 0
+    doc = None
+
+    async def ocr_page(index: int, img: np.ndarray, key: Optional[str], whole_document: bool) -> None:
+        try:
+            try:
+                if extractions is None:
+                    content = await recognize(img)
+                else:
+                    result = await inference_pool.run(run_page_pipeline, img, whole_document)
+                    content = result["tokens"]
+                    if whole_document:
+                        extractions[index + 1] = await finish_extraction(result)
+            except asyncio.CancelledError:
+                raster_pool.discard(img)  # A pool worker may still be reading it
+                raise
+            except Exception as e:
+                raster_pool.release(img)
+                await finished.put((index, None, e))
+                return
+            raster_pool.release(img)
+            if key:
+                await ocr_cache.aset(key, content)
+            await finished.put((index, content, None))
+        finally:
+            slots.release()
+
+    async def produce(total: int) -> None:
+        nonlocal text_pages
+        kind = "page" if extractions is None else f"page;ocr={ocr_mode};whole_document={total == 1}"
+        try:
+            for i in range(total):
+                await slots.acquire()
+                img, tokens, key = await loop.run_in_executor(
+                    pdf_renderer, context.run, load_page_keyed, doc, i, kind
+                )
+                page_keys[i] = key
+                if tokens is not None:
+                    text_pages += 1
+                    slots.release()
+                    if key:
+                        await ocr_cache.aset(key, tokens)
+                    await finished.put((i, tokens, None))
+                    continue
+                cached = await ocr_cache.aget(key) if key else None
+                if cached is not None:
+                    raster_pool.release(img)
+                    slots.release()
+                    await finished.put((i, cached, None))
+                else:
+                    tasks.append(asyncio.create_task(ocr_page(i, img, key, total == 1)))
+                del img
+        except Exception as e:
+            await finished.put((None, None, e))
+
+    try:
+        doc = await loop.run_in_executor(pdf_renderer, open_pdf, pdf_bytes)
+        total_pages = len(doc)
+        page_keys = [None] * total_pages
+        producer = asyncio.create_task(produce(total_pages))
+        tasks.append(producer)
+        for _ in range(total_pages):
+            index, content, error = await finished.get()
+            if error is not None:
+                logger.error(f"PDF processing error: {error}")
+                raise error
+            yield {"page": index + 1, "content": content}
+        if text_pages:
+            logger.info(f"PDF text layer: {text_pages} of {total_pages} pages without OCR")
+        if doc_key and all(page_keys):
+            # The document entry only lists page keys; page results are stored once
+            await ocr_cache.aset(doc_key, page_keys)
+            if extractions:
+                # A single-page scan's full pipeline result, as extract_image_bytes caches an image's
+                await ocr_cache.aset(f"{doc_key}:extraction", extractions[1])
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if doc is not None:
+            await loop.run_in_executor(pdf_renderer, doc.close)
+
 @app.post("/ocr")
 async def extract_text(
     file: UploadFile = File(...),
-    business_id: str = None, # Optional metadata
-    job_id: str = None       # Optional metadata
+    business_id: Optional[str] = Form(None), # Optional metadata
+    job_id: Optional[str] = Form(None),      # Optional metadata
+    accept: str = Header(None),
+    x_request_id: Optional[str] = Header(None),
+    traceparent: Optional[str] = Header(None)
 ):
     """
     Extract text from uploaded image or PDF.
+    Tokens are record dicts in plain JSON by default; send
+    Accept: application/vnd.autogst.columnar+json or application/msgpack
+    for the compact columnar layouts (see tokens.py).
+    Where the time went is in the Server-Timing header and metrics.trace.
     """
     if not file:
         raise HTTPException(status_code=400, detail="No file uploaded")
     
     logger.info(f"Processing Job: {job_id} | Business: {business_id} | File: {file.filename}")
+    trace = telemetry.begin_trace("/ocr", job_id, x_request_id, traceparent)
+    status_code, response = 500, None
 
+    # 🚦 ADMISSION CONTROL: Reject early instead of queueing unbounded work
     try:
-        # 🛡️ 1. STREAMING SIZE CHECK
-        # Read in chunks to avoid blowing RAM on huge bombs
-        content = bytearray()
-        CHUNK_SIZE = 1024 * 1024 # 1MB
-        
-        while True:
-            chunk = await file.read(CHUNK_SIZE)
-            if not chunk:
-                break
-            content.extend(chunk)
-            if len(content) > MAX_FILE_SIZE:
-                 raise HTTPException(status_code=413, detail=f"File exceeds size limit of {MAX_FILE_SIZE/1024/1024}MB")
-
-        content = bytes(content)
-        file_type = file.content_type
-        
-        response_data = {}
-
-        if file_type == "application/pdf" or file.filename.lower().endswith(".pdf"):
-            logger.info("Detected PDF format")
-            extracted = process_pdf(content)
-            response_data = {"type": "pdf", "pages": extracted}
-        elif file_type.startswith("image/") or file.filename.lower().endswith((".jpg", ".jpeg", ".png")):
-            logger.info("Detected Image format")
-            extracted = process_image(content)
-            response_data = {"type": "image", "content": extracted}
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Use PDF or Image.")
+        with inference_pool.admit():
+            response = await _extract(file, business_id, job_id, response_format.negotiate(accept))
+        status_code = response.status_code
+        return response
+    except PoolSaturated as e:
+        status_code = e.status_code
+        raise busy_error(e, job_id)
+    except HTTPException as e:
+        status_code = e.status_code
+        raise
+    finally:
+        telemetry.finish_trace(trace, status_code, response.headers if response is not None else None)
 
-        return JSONResponse(content={
-            "status": "success",
-            "job_id": job_id,
-            "business_id": business_id,
-            "data": response_data
-        })
+def busy_error(e: PoolSaturated, job_id: str) -> HTTPException:
+    """
+    Build the 429/503 answer for a rejected request, with back-off hints.
+    """
+    stats = inference_pool.stats()
+    logger.warning(f"Rejecting Job: {job_id} | {e} | Queue depth: {stats['queue_depth']}")
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={
+            "Retry-After": str(e.retry_after),
+            "X-Queue-Depth": str(stats["queue_depth"]),
+            "X-In-Flight": str(stats["in_flight"]),
+        },
+    )
+
+async def read_upload(file: UploadFile) -> Upload:
+    """
+    The upload's bytes, enforcing MAX_FILE_SIZE: read into memory, or above
+    UPLOAD_MAP_THRESHOLD mapped from the parser's temp file (see uploads.py).
+    Decoders read the buffer without another copy; close() it when done.
+    """
+    # 🛡️ SIZE CHECK before anything is read
+    try:
+        return await read_upload_file(file, MAX_FILE_SIZE, UPLOAD_MAP_THRESHOLD)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    except HTTPException as he:
-        # Pass through HTTP Exceptions (like 413)
+def detect_file_kind(file: UploadFile) -> str:
+    """
+    Returns "pdf" or "image" from the content type / extension.
+    """
+    file_type = file.content_type or ""
+    filename = (file.filename or "").lower()
+    if file_type == "application/pdf" or filename.endswith(".pdf"):
+        logger.info("Detected PDF format")
+        return "pdf"
+    if file_type.startswith("image/") or filename.endswith((".jpg", ".jpeg", ".png")):
+        logger.info("Detected Image format")
+        return "image"
+    raise HTTPException(status_code=400, detail="Unsupported file type. Use PDF or Image.")
+
+async def _extract(file: UploadFile, business_id: str, job_id: str, media_type: str) -> Response:
+    """
+    Read the upload and run OCR on the inference pool.
+    """
+    exclusive = reset_request_peak()
+    upload = None
+    try:
+        with telemetry.span("read_upload"):
+            upload = await read_upload(file)
+        kind = detect_file_kind(file)
+        body = await _process(upload, kind, business_id, job_id, exclusive)
+        with telemetry.span("encode"):
+            return response_format.render(body, media_type)
+
+    except (HTTPException, PoolSaturated) as he:
+        # Pass through HTTP Exceptions (like 413) and admission rejections
         raise he
     except Exception as e:
         logger.error(f"OCR Extraction Failed: {e}")
+        telemetry.record_error(e)
         return JSONResponse(
             status_code=500,
             content={"status": "error", "message": str(e)}
         )
     finally:
+        if upload is not None:
+            upload.close()
         # Force garbage collection after heavy request
         gc.collect()
 
+def reset_request_peak() -> bool:
+    """
+    Reset the peak RSS mark when this is the only admitted request; True if
+    the peak then measures this request alone.
+    """
+    # Peak RSS is per request only while no other request shares the process
+    exclusive = sum(inference_pool.stats()[k] for k in ("in_flight", "queue_depth")) == 1
+    return memstats.reset_peak_rss() if exclusive else False
+
+async def _process(upload: Upload, kind: str, business_id: str, job_id: str, exclusive: bool) -> Dict[str, Any]:
+    """
+    OCR (and extract) an upload already read (or mapped); returns the response body.
+    Shared by /ocr and the job dispatcher.
+    """
+    telemetry.observe_upload(kind, upload.size)
+
+    if kind == "pdf":
+        extractions: Dict[int, Dict[str, Any]] = {}
+        extracted = [page async for page in iter_pdf_pages(upload.data, extractions=extractions if OCR_PIPELINE else None)]
+        extracted.sort(key=lambda p: p["page"])
+        telemetry.observe_pages(len(extracted))
+        response_data = {"type": "pdf", "pages": extracted}
+        if OCR_PIPELINE:
+            if len(extracted) == 1 and 1 in extractions:
+                # A single scanned page was extracted like an image, recovery included
+                result = extractions[1]
+            else:
+                result = await finish_extraction(await inference_pool.run(run_pdf_extraction, extracted))
+            telemetry.record_stages(result["timings"])
+            response_data["extraction"] = extraction_summary(result)
+    elif OCR_PIPELINE:
+        quality = await check_upload_quality(upload.data) if OCR_QUALITY_GATE else None
+        result = await extract_image_bytes(upload, quality)
+        if result["status"] == "rejected":
+            raise HTTPException(status_code=422, detail=result["quality"]["reason"])
+        response_data = {"type": "image", "content": result["tokens"], "extraction": extraction_summary(result)}
+    else:
+        if OCR_QUALITY_GATE:
+            await check_upload_quality(upload.data)
+        extracted = await ocr_image_bytes(upload)
+        response_data = {"type": "image", "content": extracted}
+
+    memory = memstats.snapshot()
+    memory["peak_scope"] = "request" if exclusive else "process"
+    logger.info(f"Job: {job_id} | RSS: {memory['rss_mb']}MB | Peak RSS ({memory['peak_scope']}): {memory['peak_rss_mb']}MB")
+
+    trace = telemetry.current_trace()
+    return {
+        "status": "success",
+        "job_id": job_id,
+        "business_id": business_id,
+        "data": response_data,
+        "metrics": {"memory": memory, "trace": trace.summary() if trace else None}
+    }
+
+@app.post("/ocr/stream")
+async def extract_text_stream(
+    file: UploadFile = File(...),
+    business_id: Optional[str] = Form(None), # Optional metadata
+    job_id: Optional[str] = Form(None),      # Optional metadata
+    accept: str = Header(None),
+    x_request_id: Optional[str] = Header(None),
+    traceparent: Optional[str] = Header(None)
+):
+    """
+    Streaming variant of /ocr: one record per page as soon as it is recognized,
+    then a summary record. NDJSON by default, SSE with Accept: text/event-stream.
+    """
+    if not file:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    logger.info(f"Streaming Job: {job_id} | Business: {business_id} | File: {file.filename}")
+    trace = telemetry.begin_trace("/ocr/stream", job_id, x_request_id, traceparent)
+
+    # The admission slot is held until the last record has been sent
+    slot = ExitStack()
+    try:
+        slot.enter_context(inference_pool.admit())
+    except PoolSaturated as e:
+        telemetry.finish_trace(trace, e.status_code)
+        raise busy_error(e, job_id)
+
+    upload = None
+    try:
+        with telemetry.span("read_upload"):
+            upload = await read_upload(file)
+        kind = detect_file_kind(file)
+        telemetry.observe_upload(kind, upload.size)
+        if kind == "image" and OCR_QUALITY_GATE:
+            await check_upload_quality(upload.data)  # Still before the first byte: a real 422
+    except Exception as e:
+        if upload is not None:
+            upload.close()
+        slot.close()
+        telemetry.finish_trace(trace, getattr(e, "status_code", 500))
+        raise
+
+    sse = "text/event-stream" in (accept or "")
+    return StreamingResponse(
+        _stream_records(upload, kind, business_id, job_id, slot, sse, trace),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"X-Trace-Id": trace.trace_id},
+    )
+
+def _frame(record: Dict[str, Any], sse: bool) -> str:
+    payload = response_format.dumps(record).decode()
+    return f"event: {record['type']}\ndata: {payload}\n\n" if sse else payload + "\n"
+
+async def _stream_records(
+    upload: Upload, kind: str, business_id: str, job_id: str, slot: ExitStack, sse: bool,
+    trace: telemetry.Trace
+) -> AsyncIterator[str]:
+    """
+    Yield page records as they complete, ending with a summary record.
+    Errors after the first byte can't change the status code, so they are
+    reported in the summary instead.
+    """
+    telemetry.activate(trace)  # The body is iterated outside the endpoint's context
+    started = time.perf_counter()
+    pages = 0
+    try:
+        if kind == "pdf":
+            async for page in iter_pdf_pages(upload.data):
+                pages += 1
+                yield _frame({"type": "page", **page}, sse)
+            telemetry.observe_pages(pages)
+        else:
+            extracted = await ocr_image_bytes(upload)
+            yield _frame({"type": "image", "content": extracted}, sse)
+        summary = {"status": "success"}
+    except Exception as e:
+        logger.error(f"OCR Streaming Failed: {e}")
+        telemetry.record_error(e)
+        summary = {"status": "error", "message": str(e)}
+    finally:
+        upload.close()
+        slot.close()
+        gc.collect()
+
+    yield _frame({
+        "type": "summary",
+        **summary,
+        "job_id": job_id,
+        "business_id": business_id,
+        "file_type": kind,
+        "pages": pages,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "trace": trace.summary(),
+    }, sse)
+    telemetry.finish_trace(trace, 200)
+
+async def run_job(job: Job) -> Tuple[int, Dict[str, Any]]:
+    """
+    Job dispatcher handler: the /ocr work for one queued job, as
+    (status code, response body). Jobs wait for an inference pool slot
+    instead of being turned away, and answer errors the way /ocr would.
+    """
+    upload, kind, business_id, request_id, traceparent = job.payload
+    logger.info(f"Running Job: {job.job_id} | Priority: {job.priority} | Business: {business_id}")
+    trace = telemetry.begin_trace("/jobs", job.job_id, request_id, traceparent)
+    status_code, body = 500, {"status": "error", "message": "Job did not run"}
+    slot = ExitStack()
+    try:
+        while True:
+            try:
+                slot.enter_context(inference_pool.admit())
+                break
+            except PoolSaturated as e:
+                if e.status_code != 429:
+                    raise
+                await asyncio.sleep(JOB_ADMIT_BACKOFF_SECONDS)
+        with slot:
+            body = await _process(upload, kind, business_id, job.job_id, reset_request_peak())
+        status_code = 200
+    except (HTTPException, PoolSaturated) as e:
+        status_code = e.status_code
+        body = {"status": "error", "message": getattr(e, "detail", None) or str(e)}
+    except Exception as e:
+        logger.error(f"OCR Job Failed: {e}")
+        telemetry.record_error(e)
+        body = {"status": "error", "message": str(e)}
+    finally:
+        upload.close()
+        gc.collect()
+        telemetry.finish_trace(trace, status_code)
+    return status_code, body
+
+job_queue = JobQueue(
+    run_job,
+    concurrency=OCR_JOB_WORKERS,
+    max_queue=OCR_JOB_MAX_QUEUE,
+    result_ttl=OCR_JOB_RESULT_TTL_SECONDS,
+    max_results=OCR_JOB_MAX_RESULTS,
+    retry_after=OCR_RETRY_AFTER_SECONDS,
+)
+telemetry.gauge("ocr_jobs_queued", "Async jobs waiting for dispatch",
+                lambda: sum(job_queue.stats()["queued"].values()))
+
+def job_status(job: Job, attached: Optional[bool] = None) -> JSONResponse:
+    """
+    Status answer for a job: 202 with a poll hint while it is queued or
+    running, 200 once it has finished.
+    """
+    content = job.describe()
+    headers = {"Location": f"/jobs/{job.job_id}"}
+    if attached is not None:
+        content["attached"] = attached
+    if not job.done.is_set():
+        headers["Retry-After"] = str(JOB_POLL_AFTER_SECONDS)
+    return JSONResponse(status_code=200 if job.done.is_set() else 202, content=content, headers=headers)
+
+@app.post("/jobs")
+async def submit_job(
+    file: UploadFile = File(...),
+    business_id: Optional[str] = Form(None), # Optional metadata
+    job_id: Optional[str] = Form(None),      # Idempotency key; generated when missing
+    priority: str = Form("interactive"),     # interactive | bulk (dispatched after interactive)
+    x_request_id: Optional[str] = Header(None),
+    traceparent: Optional[str] = Header(None)
+):
+    """
+    Queue an OCR job and answer at once; poll GET /jobs/{job_id} for the result.
+    Submitting a job_id that is queued, running or finished attaches to that
+    job (409 if the file differs); a failed job is run again.
+    """
+    if priority not in JOB_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown priority. Use one of: {', '.join(JOB_PRIORITIES)}")
+    job_id = job_id or uuid.uuid4().hex
+
+    # A queued job keeps its upload; large ones stay mapped from disk until the job runs
+    upload = await read_upload(file)
+    try:
+        kind = detect_file_kind(file)
+        digest = await asyncio.to_thread(content_key, upload.data, "job")
+        job, attached = job_queue.submit(
+            job_id, (upload, kind, business_id, x_request_id, traceparent), digest, priority
+        )
+    except JobConflict as e:
+        upload.close()
+        raise HTTPException(status_code=409, detail=str(e))
+    except PoolSaturated as e:
+        upload.close()
+        logger.warning(f"Rejecting Job: {job_id} | {e} | Jobs: {job_queue.stats()['queued']}")
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception:
+        upload.close()
+        raise
+    if attached:
+        upload.close()  # The running job has its own copy
+
+    logger.info(f"{'Attached to' if attached else 'Queued'} Job: {job_id} | Priority: {priority} | Business: {business_id} | File: {file.filename}")
+    return job_status(job, attached)
+
+@app.get("/jobs/{job_id}")
+async def poll_job(job_id: str, wait: float = 0, accept: str = Header(None)):
+    """
+    Poll a job. While it is queued or running: 202 with its status (wait=N
+    long-polls up to OCR_JOB_MAX_WAIT_SECONDS first). Once done: the /ocr
+    response body plus "job", in the negotiated format. Once failed: the
+    status code /ocr would have answered. Unknown or expired: 404.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    if not await job_queue.wait(job, min(max(wait, 0), OCR_JOB_MAX_WAIT_SECONDS)):
+        return job_status(job)
+    if job.status == "failed":
+        return JSONResponse(status_code=job.status_code,
+                            content={"status": "error", "message": job.error, "job": job.describe()})
+    return response_format.render({**job.result, "job": job.describe()}, response_format.negotiate(accept))
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus scrape endpoint
+    if not telemetry.enabled():
+        raise HTTPException(status_code=503, detail="Metrics disabled (prometheus_client not installed or OCR_METRICS=0)")
+    body, content_type = telemetry.render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "service": "ocr-engine"}
+    # Pool stats let the Node worker back off before hitting 429s
+    return {
+        "status": "ok" if startup.ready else startup.status,
+        "service": "ocr-engine",
+        "ready": startup.ready,
+        "startup": startup.report(),
+        "pool": inference_pool.stats(),
+        "batching": micro_batcher.stats() if micro_batcher else None,
+        "cache": ocr_cache.stats() if ocr_cache else None,
+        "rasters": raster_pool.stats(),
+        "jobs": job_queue.stats(),
+    }
+
+@app.get("/health/live")
+def liveness_check():
+    # The process is up and the event loop answers; a failed model load is only fixed by a restart
+    if startup.status == "failed":
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup.error})
+    return {"status": "alive", "uptime_s": process_age_seconds()}
+
+@app.get("/health/ready")
+def readiness_check():
+    # 200 once every pool worker has loaded and warmed its models (at once in lazy mode)
+    if not startup.ready:
+        return JSONResponse(status_code=503, content={"status": startup.status, "startup": startup.report()})
+    return {"status": "ready", "startup": startup.report()}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,105 @@
+"""
+Ollama Stub Server
+Minimal stand-in for the Ollama HTTP API (/api/generate, /api/tags, /api/version)
+so the LLM client and the extraction pipeline can run without a model.
+
+Usage: python ollama_stub.py [--port 11434] [--delay-ms 0]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+_GSTIN = re.compile(r"[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]")
+_INVOICE_NO = re.compile(r"(?:Invoice\s*No\.?|Inv\.?\s*No\.?|Bill\s*No\.?)[^\dA-Z]*([A-Z0-9\-/]+)", re.IGNORECASE)
+_TOTAL = re.compile(r"Total[^\d]*([\d,]+(?:\.\d+)?)", re.IGNORECASE)
+
+
+def default_responder(prompt: str) -> Dict[str, Any]:
+    """Deterministic 'extraction': pick a few fields out of the prompt with regexes."""
+    out: Dict[str, Any] = {}
+    if m := _GSTIN.search(prompt):
+        out["gstin"] = m.group(0)
+    if m := _INVOICE_NO.search(prompt):
+        out["invoice_number"] = m.group(1)
+    if m := _TOTAL.search(prompt):
+        out["grand_total"] = m.group(1).replace(",", "")
+    return out
+
+
+# A responder maps the prompt to the model's output: a dict (sent as JSON) or raw text
+Responder = Callable[[str], Union[Dict[str, Any], str]]
+
+
+def _handler(responder: Responder, delay: float, calls: Dict[str, int]):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+        def _send(self, status: int, body: Dict[str, Any]) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:
+            if self.path == "/api/tags":
+                self._send(200, {"models": [{"name": "llama3:latest"}]})
+            elif self.path == "/api/version":
+                self._send(200, {"version": "stub"})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if self.path != "/api/generate":
+                self._send(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            calls["generate"] = calls.get("generate", 0) + 1
+            prompt = body.get("prompt")
+            if not prompt:
+                # Empty prompt = load the model and return
+                self._send(200, {"model": body.get("model"), "response": "", "done": True})
+                return
+            if delay:
+                time.sleep(delay)
+            response = responder(prompt)
+            if not isinstance(response, str):
+                response = json.dumps(response) if body.get("format") == "json" else str(response)
+            self._send(200, {
+                "model": body.get("model"),
+                "response": response,
+                "done": True,
+            })
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def start_stub_server(port: int = 0, responder: Optional[Responder] = None,
+                      delay_ms: float = 0) -> Tuple[ThreadingHTTPServer, str, Dict[str, int]]:
+    """
+    Start the stub on a background thread (port 0 = any free port).
+    Returns (server, base_url, call counters); stop with server.shutdown().
+    """
+    calls: Dict[str, int] = {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(responder or default_responder, delay_ms / 1000, calls))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", calls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ollama API stub")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay-ms", type=float, default=0, help="Simulated generation latency")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), _handler(default_responder, args.delay_ms / 1000, {}))
+    print(f"Ollama stub listening on :{args.port}")
+    server.serve_forever()
@@ -0,0 +1,356 @@
+"""
+Extraction Pipeline Module
+Runs the processing stages in-process on one decoded image:
+quality gate -> normalization -> multi-pass OCR -> layout -> rules ->
+validation -> (LLM) -> (recovery attempt) with per-stage timing.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from image_io import load_image
+from inference_pool import get_engine
+from layout_reconstruction import layout_reconstruction
+from llm_extractor import allm_extract, llm_extract
+from ocr_engine import MultiPassOCR
+from preprocessing import DocumentVariants
+from quality_gate import check_image_quality
+from recovery_merge import recovery_merge
+from roi_recovery import plan_roi_recovery, reread_tokens
+from tokens import TokenTable, Tokens, as_token_table
+from rule_extractor import rule_based_extract
+from validation_engine import validate_invoice
+
+logger = logging.getLogger("ocr-service.pipeline")
+
+# A rules-only invoice must carry these before the LLM can be skipped
+REQUIRED_FIELDS = ("gstin", "invoice_number", "date")
+
+# roi: re-read only suspect tokens | page: OCR the whole page again in recovery mode
+OCR_RECOVERY = os.getenv("OCR_RECOVERY", "roi")
+
+
+class StageTimer:
+    """Collects wall time per stage, in milliseconds."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name] = round(self.timings.get(name, 0.0) + elapsed, 2)
+
+
+def layout_text(layout: Dict[str, Any]) -> str:
+    """One line per reconstructed row, cells left to right."""
+    return "\n".join(" ".join(cell["text"] for cell in row) for row in layout["rows"])
+
+
+def stack_pages(pages: List[Dict[str, Any]], gap: float = 100) -> TokenTable:
+    """
+    Concatenate per-page tokens ({page, content}) into one tall virtual page,
+    so layout keeps pages apart and in order.
+    """
+    tables = [as_token_table(page["content"]) for page in sorted(pages, key=lambda p: p["page"])]
+    offsets = []
+    offset = 0.0
+    for table in tables:
+        offsets.append(offset)
+        bottom = offset + float(table.boxes[:, :, 1].max()) if len(table) else offset
+        offset = bottom + gap
+    return TokenTable.concat(tables, offsets)
+
+
+def with_validation_fields(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The rule extraction with its labelled amounts also under the top-level
+    keys validate_invoice checks (taxable, tax, grand_total, cgst, sgst,
+    igst). Totals are only set when both the taxable value and the grand
+    total were found, since a missing one would read as 0; tax is the
+    labelled total tax, else the sum of the tax heads.
+    """
+    amounts = invoice.get("amounts") or {}
+    fields: Dict[str, Any] = {head: amounts[head] for head in ("cgst", "sgst", "igst") if head in amounts}
+    if "taxable_value" in amounts and "grand_total" in amounts:
+        fields["taxable"] = amounts["taxable_value"]
+        fields["grand_total"] = amounts["grand_total"]
+        tax = amounts.get("total_tax")
+        if tax is None:
+            try:
+                tax = str(sum(Decimal(amounts[head]) for head in ("cgst", "sgst", "igst", "cess") if head in amounts))
+            except InvalidOperation:
+                tax = None
+        if tax is not None:
+            fields["tax"] = tax
+    return {**invoice, **fields}
+
+
+def is_complete(invoice: Dict[str, Any]) -> bool:
+    return all(invoice.get(field) for field in REQUIRED_FIELDS)
+
+
+def merge_llm_fields(invoice: Dict[str, Any], llm_fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Regex hits are exact; the LLM only fills what the rules missed."""
+    return {**llm_fields, **invoice}
+
+
+def needs_llm_fallback(result: Dict[str, Any]) -> bool:
+    """Whether a pipeline result computed without the LLM is one it would have run on."""
+    invoice = result.get("invoice")
+    validation = result.get("validation") or {}
+    return (result.get("status") == "ok" and invoice is not None and result.get("source") == "rules"
+            and not (validation.get("is_valid") and is_complete(invoice)))
+
+
+async def allm_fallback(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The LLM fallback for a pipeline result (run, run_tokens, run_pages)
+    computed without it, awaited on the event loop with allm_extract so a
+    slow generation never holds an inference-pool worker. Results the
+    rules already settled, and rejected ones, are returned as they are.
+    """
+    if not needs_llm_fallback(result):
+        return result
+    invoice = result["invoice"]
+    timer = StageTimer()
+    timer.timings = result["timings"]
+    try:
+        with timer.stage("llm"):
+            llm_fields = await allm_extract(layout_text(result["layout"]))
+    except Exception as e:
+        logger.warning(f"LLM stage failed, keeping rule extraction: {e}")
+        return {**result, "llm_error": str(e)}
+    invoice = merge_llm_fields(invoice, llm_fields)
+    with timer.stage("llm_validation"):
+        validation = validate_invoice(invoice)
+    return {
+        **result,
+        "exit_reason": "llm_valid" if validation["is_valid"] else "llm_invalid",
+        "invoice": invoice,
+        "validation": validation,
+        "source": "rules+llm",
+    }
+
+
+class InvoicePipeline:
+    """
+    Orchestrates the extraction stages on an in-memory image.
+
+    The image is decoded once and passed through every stage. The LLM is
+    skipped when rules + validation already give a valid, complete invoice,
+    and the recovery-mode second attempt only runs when validation fails.
+    With use_llm=False (the service's pool workers) the LLM is left to
+    allm_fallback, awaited by the caller on its event loop.
+    Every result reports per-stage wall time and the exit reason.
+    """
+
+    def __init__(self, ocr: Optional[MultiPassOCR] = None, use_llm: bool = True, recovery: str = OCR_RECOVERY):
+        self._ocr = ocr
+        self.use_llm = use_llm
+        self.recovery = recovery
+
+    @property
+    def ocr(self) -> MultiPassOCR:
+        if self._ocr is None:
+            self._ocr = MultiPassOCR()
+        return self._ocr
+
+    def run(self, source: Any, timer: Optional[StageTimer] = None,
+            quality: Optional[Dict[str, Any]] = None, gate: bool = True) -> Dict[str, Any]:
+        """
+        Process one image (path, encoded bytes or BGR ndarray).
+        A passed quality verdict from an earlier check_image_quality skips the
+        gate; gate=False skips it too (rendered PDF pages, where resampling
+        skews the blur measure).
+        Returns {status, exit_reason, invoice, validation, tokens, layout,
+        recovery_used, recovery, timings}.
+        """
+        timer = timer or StageTimer()
+        with timer.stage("decode"):
+            img = load_image(source)
+        if img is None:
+            return self._result("rejected", "decode_failed", timer, quality={"status": "rejected", "reason": "File not readable"})
+
+        if quality is None and gate:
+            with timer.stage("quality_gate"):
+                quality = check_image_quality(img)
+        if quality is not None and quality["status"] != "passed":
+            return self._result("rejected", "quality_rejected", timer, quality=quality)
+
+        # Variants (and their OCR results) are shared by both attempts
+        doc = DocumentVariants(img, denoiser=self.ocr.denoiser)
+        attempt = self._ocr_attempt(doc, timer, recovery_mode=False)
+        if attempt["is_valid"]:
+            return self._result("ok", attempt["exit_reason"], timer, attempt=attempt, quality=quality)
+
+        recovery, details = self._recovery_attempt(doc, attempt, timer)
+        with timer.stage("recovery_merge"):
+            best, recovery_used = recovery_merge(attempt, recovery) if recovery is not attempt else (attempt, False)
+        reason = "recovered" if best["is_valid"] else "invalid_after_recovery"
+        return self._result("ok", reason, timer, attempt=best, quality=quality, recovery_used=recovery_used,
+                            recovery=details)
+
+    def ocr_page(self, source: Any, timer: Optional[StageTimer] = None) -> TokenTable:
+        """
+        Normalization and multi-pass OCR of one page image (path, encoded
+        bytes or BGR ndarray, read only), as in run()'s first attempt, without
+        the text stages: for the scanned pages of a multi-page document,
+        which are extracted together by run_pages().
+        """
+        timer = timer or StageTimer()
+        doc = DocumentVariants(source, denoiser=self.ocr.denoiser)
+        return self._ocr_tokens(doc, timer, recovery_mode=False)
+
+    def run_tokens(self, tokens: Tokens, timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """
+        Text stages on already OCR'd tokens, in the same result shape as run().
+        """
+        timer = timer or StageTimer()
+        attempt = self.extract_from_tokens(tokens, timer)
+        return self._result("ok", attempt["exit_reason"], timer, attempt=attempt)
+
+    def run_pages(self, pages: List[Dict[str, Any]], timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+        """
+        Text stages over the OCR'd pages of a multi-page document.
+        """
+        return self.run_tokens(stack_pages(pages), timer)
+
+    def extract_from_tokens(self, tokens: Tokens, timer: Optional[StageTimer] = None,
+                            prefix: str = "") -> Dict[str, Any]:
+        """
+        Text stages only (layout -> rules -> validation -> LLM), for inputs
+        that are already OCR'd such as PDF pages.
+        """
+        timer = timer or StageTimer()
+        tokens = as_token_table(tokens)
+        with timer.stage(prefix + "layout"):
+            layout = layout_reconstruction(tokens)
+        text = layout_text(layout)
+
+        with timer.stage(prefix + "rules"):
+            invoice = with_validation_fields(rule_based_extract(text))
+        with timer.stage(prefix + "validation"):
+            validation = validate_invoice(invoice)
+        source = "rules"
+        exit_reason = "rules_valid"
+        llm_error = None
+
+        complete = is_complete(invoice)
+        if not (validation["is_valid"] and complete) and self.use_llm:
+            try:
+                with timer.stage(prefix + "llm"):
+                    llm_fields = llm_extract(text)
+                invoice = merge_llm_fields(invoice, llm_fields)
+                source = "rules+llm"
+                with timer.stage(prefix + "llm_validation"):
+                    validation = validate_invoice(invoice)
+                exit_reason = "llm_valid" if validation["is_valid"] else "llm_invalid"
+            except Exception as e:
+                logger.warning(f"LLM stage failed, keeping rule extraction: {e}")
+                llm_error = str(e)
+                exit_reason = "rules_valid_incomplete" if validation["is_valid"] else "rules_invalid"
+        elif not validation["is_valid"]:
+            exit_reason = "rules_invalid"
+        elif not complete:
+            exit_reason = "rules_valid_incomplete"
+
+        return {
+            **validation,
+            "invoice": invoice,
+            "source": source,
+            "exit_reason": exit_reason,
+            "llm_error": llm_error,
+            "tokens": tokens,
+            "layout": layout,
+        }
+
+    def _ocr_tokens(self, doc: DocumentVariants, timer: StageTimer, recovery_mode: bool) -> TokenTable:
+        prefix = "recovery." if recovery_mode else ""
+        # normalize_image without auto-rotate: the OCR angle classifier handles
+        # flipped text; h > w just means portrait
+        base = "recovery" if recovery_mode else "binarized"
+        with timer.stage(prefix + "normalize"):
+            doc.get(base)
+        with timer.stage(prefix + "ocr"):
+            tokens, _ = self.ocr.run_document(doc, normal=base)
+        return tokens
+
+    def _ocr_attempt(self, doc: DocumentVariants, timer: StageTimer, recovery_mode: bool) -> Dict[str, Any]:
+        tokens = self._ocr_tokens(doc, timer, recovery_mode)
+        return self.extract_from_tokens(tokens, timer, "recovery." if recovery_mode else "")
+
+    def _recovery_attempt(self, doc: DocumentVariants, attempt: Dict[str, Any],
+                          timer: StageTimer) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Second attempt for a document that failed validation. In roi mode only
+        the suspect tokens are cropped and re-read; the whole page is OCR'd
+        again when there is nothing specific to re-read, or too much.
+        Returns (attempt, {mode, regions, replaced}); the attempt itself when
+        no token could be read better.
+        """
+        indices = None
+        if self.recovery == "roi":
+            with timer.stage("recovery.roi_select"):
+                indices = plan_roi_recovery(attempt)
+        if indices is None:
+            return self._ocr_attempt(doc, timer, recovery_mode=True), {"mode": "page"}
+        with timer.stage("recovery.roi_ocr"):
+            tokens, replaced = reread_tokens(attempt["tokens"], indices, doc.get("deskewed"), self.ocr.recognize)
+        if not replaced:
+            return attempt, {"mode": "roi", "regions": len(indices), "replaced": 0}
+        recovery = self.extract_from_tokens(tokens, timer, "recovery.")
+        return recovery, {"mode": "roi", "regions": len(indices), "replaced": replaced}
+
+    @staticmethod
+    def _result(status: str, exit_reason: str, timer: StageTimer, attempt: Optional[Dict[str, Any]] = None,
+                quality: Optional[Dict[str, Any]] = None, recovery_used: bool = False,
+                recovery: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        attempt = attempt or {}
+        return {
+            "status": status,
+            "exit_reason": exit_reason,
+            "quality": quality,
+            "invoice": attempt.get("invoice"),
+            "validation": {
+                key: attempt[key] for key in ("is_valid", "field_errors", "row_errors", "confidence_score")
+                if key in attempt
+            },
+            "source": attempt.get("source"),
+            "llm_error": attempt.get("llm_error"),
+            "tokens": attempt.get("tokens", TokenTable.empty()),
+            "layout": attempt.get("layout"),
+            "recovery_used": recovery_used,
+            "recovery": recovery,
+            "timings": timer.timings,
+        }
+
+
+_worker_state = threading.local()
+
+
+def get_worker_pipeline(use_llm: bool = True) -> InvoicePipeline:
+    """
+    Pipeline for the calling inference-pool worker, reusing the worker's own
+    PaddleOCR instance for every pass.
+    """
+    pipeline = getattr(_worker_state, "pipeline", None)
+    if pipeline is None:
+        pipeline = InvoicePipeline(ocr=MultiPassOCR(engines=[get_engine()]), use_llm=use_llm)
+        _worker_state.pipeline = pipeline
+    pipeline.use_llm = use_llm
+    return pipeline
+
+
+if __name__ == "__main__":
+    # Example usage
+    out = InvoicePipeline().run("./sample_invoice.jpg")
+    print(out["exit_reason"], out["invoice"], out["timings"])
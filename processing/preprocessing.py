@@ -0,0 +1,109 @@
+"""
+Preprocessing Module
+Builds the OCR input variants of one document from a shared intermediate.
+The image is converted to gray, fitted and deskewed once; every variant
+(binarized, recovery, high contrast, denoised) is derived from that on
+first use and kept for the rest of the document, so a recovery attempt
+reuses what the first attempt computed and skipped passes cost nothing.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from image_io import fit_to_dimension, load_image
+from normalization import binarize, deskew, recovery_filters, to_gray
+from tokens import TokenTable
+
+# Gray-image denoisers for the "denoised" variant, slowest/best first.
+# nlmeans uses the previous parameters on one channel instead of three.
+DENOISERS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "nlmeans": lambda gray: cv2.fastNlMeansDenoising(gray, None, 10, 7, 21),
+    "nlmeans_fast": lambda gray: cv2.fastNlMeansDenoising(gray, None, 10, 5, 11),
+    "bilateral": lambda gray: cv2.bilateralFilter(gray, 5, 40, 40),
+    "median": lambda gray: cv2.medianBlur(gray, 3),  # Throughput mode
+}
+OCR_DENOISER = os.getenv("OCR_DENOISER", "nlmeans")
+
+
+class DocumentVariants:
+    """
+    Lazily computed, cached preprocessing variants of one decoded document.
+
+    Variants:
+        original       the image as given
+        gray           gray, fitted to max_dimension
+        deskewed       gray with the text lines levelled (the shared base)
+        binarized      threshold + median + CLAHE (normalize_image output)
+        recovery       binarized + dilation + sharpening
+        high_contrast  deskewed * 1.5
+        denoised       deskewed through the chosen denoiser
+
+    Safe to share between the threads of one multi-pass run: each variant
+    is computed once even when requested concurrently. OCR results can be
+    remembered per variant too (see remember / recall), so a pass over an
+    unchanged variant is never recognized twice.
+    """
+
+    def __init__(self, image: Any, denoiser: str = OCR_DENOISER, max_dimension: Optional[int] = None):
+        img = load_image(image)
+        if img is None:
+            raise ValueError("File not readable")
+        if denoiser not in DENOISERS:
+            raise ValueError(f"Unknown denoiser {denoiser!r}; choose from {', '.join(DENOISERS)}")
+        self.denoiser = denoiser
+        self.max_dimension = max_dimension
+        self.skew_angle: Optional[float] = None
+        self.build_seconds: Dict[str, float] = {}
+        self._variants: Dict[str, np.ndarray] = {"original": img}
+        self._results: Dict[str, TokenTable] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, name: str) -> np.ndarray:
+        if name == "gray":
+            gray = to_gray(self.get("original"))
+            return fit_to_dimension(gray, self.max_dimension) if self.max_dimension else gray
+        if name == "deskewed":
+            deskewed, self.skew_angle = deskew(self.get("gray"))
+            return deskewed
+        if name == "binarized":
+            return binarize(self.get("deskewed"))
+        if name == "recovery":
+            return recovery_filters(self.get("binarized"))
+        if name == "high_contrast":
+            return cv2.convertScaleAbs(self.get("deskewed"), alpha=1.5, beta=0)
+        if name == "denoised":
+            return DENOISERS[self.denoiser](self.get("deskewed"))
+        raise KeyError(f"Unknown variant {name!r}")
+
+    def get(self, name: str) -> np.ndarray:
+        """The named variant, built (with what it depends on) on first use."""
+        variant = self._variants.get(name)
+        if variant is not None:
+            return variant
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            variant = self._variants.get(name)
+            if variant is None:
+                start = time.perf_counter()
+                variant = self._build(name)
+                # Includes any dependency built on the way
+                self.build_seconds[name] = round(time.perf_counter() - start, 4)
+                self._variants[name] = variant
+        return variant
+
+    def built(self) -> List[str]:
+        """Names of the variants computed so far."""
+        return list(self._variants)
+
+    def recall(self, name: str) -> Optional[TokenTable]:
+        """OCR results remembered for a variant, if any."""
+        return self._results.get(name)
+
+    def remember(self, name: str, results: TokenTable) -> None:
+        self._results[name] = results
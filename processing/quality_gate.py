@@ -1,40 +1,122 @@
 """
 Image Quality Gate Module
 Checks image sharpness, brightness, and size using OpenCV.
+
+Nothing is filtered at full resolution: brightness is the mean of a small
+preview, and sharpness is the Laplacian variance of a stratified sample of
+rows of the image fitted to REFERENCE_DIMENSION. benchmarks/bench_quality.py
+measures how often the verdicts agree with the previous full-resolution gate.
 """
 import cv2
 import numpy as np
-from typing import Dict
+from typing import Any, Dict, Optional, Tuple
+
+from image_io import decode_image_buffer, fit_to_dimension, image_dimensions
+
+MIN_DIMENSION = 1000   # Both sides, px
+MIN_SHARPNESS = 100    # Variance of the Laplacian
+MIN_BRIGHTNESS = 80    # Mean gray level
+MAX_BRIGHTNESS = 200
 
+# Encoded images are measured as OCR sees them: fitted to this size (MAX_IMAGE_DIMENSION)
+REFERENCE_DIMENSION = 2000
+PREVIEW_DIMENSION = 512       # Longest side of the brightness preview (point-sampled grid)
+SHARPNESS_SAMPLE_ROWS = 160   # Rows whose Laplacian stands in for the whole image
 
-def check_image_quality(image_path: str) -> Dict[str, str]:
+_LAPLACIAN_NEIGHBOURS = np.array([-1, 0, 1])
+
+
+def _reference_image(image: Any) -> Tuple[Optional[np.ndarray], Optional[Tuple[int, int]]]:
     """
-    Checks image for sharpness, brightness, and minimum size.
+    (image to measure, (height, width) of the source). Arrays are measured as
+    given; paths and encoded buffers are decoded to grayscale at reduced
+    JPEG scale and fitted to REFERENCE_DIMENSION.
+    """
+    if isinstance(image, np.ndarray):
+        return image, image.shape[:2]
+    if not isinstance(image, (bytes, bytearray, memoryview)):
+        try:
+            image = np.fromfile(str(image), dtype=np.uint8)
+        except OSError:
+            return None, None
+    dims = image_dimensions(image)
+    if dims is not None and min(dims) < MIN_DIMENSION:
+        return None, dims  # Too small: no need to decode
+    gray = decode_image_buffer(image, REFERENCE_DIMENSION, grayscale=True)
+    if gray is None:
+        return None, None
+    return fit_to_dimension(gray, REFERENCE_DIMENSION), dims or gray.shape[:2]
+
+
+def _gray(img: np.ndarray) -> np.ndarray:
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+
+
+def sampled_laplacian_variance(img: np.ndarray, rows: int = SHARPNESS_SAMPLE_ROWS) -> float:
+    """
+    Estimate cv2.Laplacian(gray, CV_64F).var() from one random row per
+    horizontal stratum. Only the sampled rows and their neighbours are
+    converted to gray; the estimate is unbiased and deterministic.
+    """
+    height = img.shape[0]
+    if height < 3 or rows >= height - 2:
+        return float(cv2.Laplacian(_gray(img), cv2.CV_64F).var())
+    bounds = np.linspace(1, height - 1, rows + 1).astype(np.int64)
+    picked = bounds[:-1] + (np.random.default_rng(0).random(rows) * (bounds[1:] - bounds[:-1])).astype(np.int64)
+    band = _gray(img[(picked[:, None] + _LAPLACIAN_NEIGHBOURS).ravel()]).astype(np.int32).reshape(rows, 3, -1)
+    center = np.pad(band[:, 1], ((0, 0), (1, 1)), mode="reflect")  # Same border as cv2 (reflect 101)
+    lap = band[:, 0] + band[:, 2] + center[:, :-2] + center[:, 2:] - 4 * center[:, 1:-1]
+    return float(lap.var(dtype=np.float64))
+
+
+def measure_image(img: np.ndarray) -> Dict[str, float]:
+    """
+    Sharpness and brightness of a decoded image.
     Args:
-        image_path: Path to image file.
+        img: BGR, BGRA or grayscale ndarray
     Returns:
-        dict: {status: "passed"|"rejected", reason: str}
+        dict: {sharpness, brightness}
     """
-    img = cv2.imread(image_path, cv2.IMREAD_COLOR)
-    if img is None:
-        return {"status": "rejected", "reason": "File not readable"}
+    height, width = img.shape[:2]
+    scale = min(PREVIEW_DIMENSION / max(height, width), 1.0)
+    # Nearest-neighbour reads only the grid pixels; the mean of ~10^5 of them is within a gray level
+    preview = cv2.resize(img, (max(round(width * scale), 1), max(round(height * scale), 1)), interpolation=cv2.INTER_NEAREST)
+    return {
+        "sharpness": round(sampled_laplacian_variance(img), 2),
+        "brightness": round(float(_gray(preview).mean()), 2),
+    }
 
-    h, w = img.shape[:2]
-    if h < 1000 or w < 1000:
-        return {"status": "rejected", "reason": "Image too small (<1000px)"}
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    lap_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-    if lap_var < 100:
-        return {"status": "rejected", "reason": "Image too blurry (variance < 100)"}
+def check_image_quality(image: Any) -> Dict[str, Any]:
+    """
+    Checks image for sharpness, brightness, and minimum size.
+    Args:
+        image: Path to image file, encoded bytes, or a decoded BGR ndarray.
+    Returns:
+        dict: {status: "passed"|"rejected", reason: str, metrics: {width,
+            height, sharpness, brightness}}; metrics has only what was
+            measured before the verdict
+    """
+    img, dims = _reference_image(image)
+    metrics: Dict[str, Any] = {}
+    if dims is not None:
+        metrics["height"], metrics["width"] = int(dims[0]), int(dims[1])
+        if min(dims) < MIN_DIMENSION:
+            return {"status": "rejected", "reason": "Image too small (<1000px)", "metrics": metrics}
+    if img is None:
+        return {"status": "rejected", "reason": "File not readable", "metrics": metrics}
 
-    brightness = float(np.mean(gray))
-    if brightness < 80:
-        return {"status": "rejected", "reason": "Image too dark (brightness < 80)"}
-    if brightness > 200:
-        return {"status": "rejected", "reason": "Image too bright (brightness > 200)"}
+    metrics.update(measure_image(img))
+    if metrics["sharpness"] < MIN_SHARPNESS:
+        return {"status": "rejected", "reason": "Image too blurry (variance < 100)", "metrics": metrics}
+    if metrics["brightness"] < MIN_BRIGHTNESS:
+        return {"status": "rejected", "reason": "Image too dark (brightness < 80)", "metrics": metrics}
+    if metrics["brightness"] > MAX_BRIGHTNESS:
+        return {"status": "rejected", "reason": "Image too bright (brightness > 200)", "metrics": metrics}
 
-    return {"status": "passed", "reason": "OK"}
+    return {"status": "passed", "reason": "OK", "metrics": metrics}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+"""
+Response Format Module
+Encodes OCR responses in the format negotiated from the Accept header.
+Token tables inside the payload are written as record dicts in plain JSON
+(the default, unchanged for existing clients), as columns in columnar JSON,
+or as columns with raw float32 buffers in msgpack (see tokens.py).
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.responses import Response
+
+from tokens import TokenTable
+
+try:
+    import msgpack
+except ImportError:  # Optional: msgpack responses are only offered when installed
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.autogst.columnar+json"
+MSGPACK = "application/msgpack"
+_ALIASES = {"application/x-msgpack": MSGPACK}
+
+
+def _encoder(convert: Callable[[TokenTable], Any]) -> Callable[[Any], Any]:
+    def default(value: Any) -> Any:
+        if isinstance(value, TokenTable):
+            return convert(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+    return default
+
+
+_DEFAULTS: Dict[str, Callable[[Any], Any]] = {
+    JSON: _encoder(TokenTable.to_records),
+    COLUMNAR_JSON: _encoder(TokenTable.to_columnar),
+    MSGPACK: _encoder(TokenTable.to_packed),
+}
+
+
+def available() -> List[str]:
+    """Media types this process can produce."""
+    return [JSON, COLUMNAR_JSON] + ([MSGPACK] if msgpack is not None else [])
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Media type for a response: the supported type with the highest q in the
+    Accept header (earlier entries win ties); JSON when none matches.
+    """
+    if not accept:
+        return JSON
+    supported = available()
+    best, best_q = JSON, -1.0
+    for entry in accept.split(","):
+        media, _, params = entry.strip().partition(";")
+        media = _ALIASES.get(media.strip().lower(), media.strip().lower())
+        if media not in supported:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q and q > 0:
+            best, best_q = media, q
+    return best
+
+
+def dumps(content: Any, media_type: str = JSON) -> bytes:
+    """Serialize a payload that may contain TokenTables in the given media type."""
+    if media_type == MSGPACK:
+        return msgpack.packb(content, default=_DEFAULTS[MSGPACK], use_bin_type=True)
+    # Same settings as FastAPI's JSONResponse
+    return json.dumps(content, default=_DEFAULTS[media_type], ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def render(content: Any, media_type: str = JSON, status_code: int = 200) -> Response:
+    """A Response with the payload encoded as media_type."""
+    return Response(content=dumps(content, media_type), status_code=status_code, media_type=media_type,
+                    headers={"Vary": "Accept"})
@@ -0,0 +1,150 @@
+"""
+Region-of-Interest Recovery Module
+Targeted recovery for a failed attempt: instead of OCR'ing the whole page
+again, pick the tokens that are likely wrong (low confidence, or under a
+field / row that validation flagged), crop and upscale just those regions,
+run recognition only on the crops and patch the better readings back.
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from normalization import binarize, recovery_filters
+from rule_extractor import extract_matches
+from tokens import TokenTable
+
+ROI_CONFIDENCE = 0.85        # Tokens below this are re-read
+ROI_MAX_SHARE = 0.3          # More of the page than this: whole-page recovery is the better bet
+ROI_TARGET_HEIGHT = 64       # Crops are upscaled to about this text height...
+ROI_MAX_SCALE = 4.0          # ...but never by more than this
+ROI_PAD = (0.4, 0.2)         # Padding around a box as a share of its height (x, y)
+
+# validate_invoice error key -> extracted fields whose text it depends on
+FIELD_SOURCES = {
+    "gstin": ("gstin",),
+    "taxable": ("taxable_value",),
+    "grand_total": ("taxable_value", "total_tax", "grand_total"),
+    "totals": ("taxable_value", "total_tax", "grand_total"),
+    "sgst": ("cgst", "sgst"),
+    "igst": ("cgst", "sgst", "igst"),
+}
+
+
+def _text_with_tokens(layout: Dict[str, Any]) -> Tuple[str, np.ndarray]:
+    """
+    The layout text as pipeline.layout_text builds it, plus the token index
+    behind every character (-1 for separators).
+    """
+    parts: List[str] = []
+    owners: List[np.ndarray] = []
+    for r, row in enumerate(layout["rows"]):
+        if r:
+            parts.append("\n")
+            owners.append(np.array([-1]))
+        for c, cell in enumerate(row):
+            if c:
+                parts.append(" ")
+                owners.append(np.array([-1]))
+            parts.append(cell["text"])
+            owners.append(np.full(len(cell["text"]), cell["token"]))
+    owner = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+    return "".join(parts), owner
+
+
+def select_regions(attempt: Dict[str, Any], min_confidence: float = ROI_CONFIDENCE) -> List[int]:
+    """
+    Indices (into the attempt's TokenTable) of the tokens worth re-reading: low
+    confidence, part of a field named in field_errors, or in a table row
+    named in row_errors (line i is the i-th table row of the layout).
+    """
+    tokens = attempt["tokens"]
+    layout = attempt["layout"]
+    selected: Set[int] = set(np.flatnonzero(tokens.confidences < min_confidence).tolist())
+
+    wanted = {field for key in attempt.get("field_errors", {}) for field in FIELD_SOURCES.get(key, ())}
+    if wanted:
+        text, owner = _text_with_tokens(layout)
+        for match in extract_matches(text):
+            if match["field"] in wanted:
+                span = owner[match["start"]:match["end"]]
+                selected.update(span[span >= 0].tolist())
+
+    rows = layout["rows"]
+    table = rows[2:-2] if len(rows) > 4 else []  # Same table heuristic as layout_reconstruction
+    for error in attempt.get("row_errors", []):
+        if error["row"] < len(table):
+            selected.update(cell["token"] for cell in table[error["row"]])
+    return sorted(selected)
+
+
+def crop_region(image: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """Padded axis-aligned crop around a token polygon, upscaled for recognition."""
+    pts = np.asarray(box, dtype=np.float32).reshape(-1, 2)
+    x0, y0 = pts.min(axis=0)
+    x1, y1 = pts.max(axis=0)
+    height = max(y1 - y0, 1.0)
+    pad_x, pad_y = ROI_PAD[0] * height, ROI_PAD[1] * height
+    h, w = image.shape[:2]
+    left, right = int(max(x0 - pad_x, 0)), int(min(np.ceil(x1 + pad_x), w))
+    top, bottom = int(max(y0 - pad_y, 0)), int(min(np.ceil(y1 + pad_y), h))
+    crop = image[top:max(bottom, top + 1), left:max(right, left + 1)]
+    scale = min(max(ROI_TARGET_HEIGHT / height, 1.0), ROI_MAX_SCALE)
+    if scale > 1.0:
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    return crop
+
+
+def crop_candidates(image: np.ndarray, box: np.ndarray) -> List[np.ndarray]:
+    """
+    The renderings of one region handed to the recognizer: the upscaled gray
+    crop, and the same crop binarized with the recovery filters. Filtering
+    only the crop is what makes this cheap.
+    """
+    crop = crop_region(image, box)
+    return [crop, recovery_filters(binarize(crop))]
+
+
+def reread_tokens(tokens: TokenTable, indices: List[int], image: np.ndarray,
+                  recognize) -> Tuple[TokenTable, int]:
+    """
+    Re-read the given tokens from crops of `image` (the geometry the tokens
+    were detected on) and keep a reading only when it is more confident.
+    Args:
+        tokens: OCR tokens
+        indices: Tokens to re-read
+        image: Image the boxes refer to
+        recognize: Callable taking a list of crops, returning (text, score) per crop
+    Returns:
+        (patched copy of tokens, number of tokens replaced)
+    """
+    crops: List[np.ndarray] = []
+    for i in indices:
+        crops.extend(crop_candidates(image, tokens.boxes[i]))
+    readings = recognize(crops)
+    per_token = len(crops) // len(indices) if indices else 0
+
+    better: List[Tuple[int, str, float]] = []
+    for n, i in enumerate(indices):
+        candidates = readings[n * per_token:(n + 1) * per_token]
+        text, score = max(candidates, key=lambda reading: reading[1])
+        if text.strip() and score > tokens.confidences[i]:
+            better.append((i, text, score))
+    if not better:
+        return tokens, 0
+    changed, texts, scores = zip(*better)
+    return tokens.replace(changed, texts, scores), len(better)
+
+
+def plan_roi_recovery(attempt: Dict[str, Any], max_share: float = ROI_MAX_SHARE) -> Optional[List[int]]:
+    """
+    Tokens to re-read for a failed attempt, or None when targeted recovery
+    does not apply (nothing to point at, or so much that the page is bad).
+    """
+    tokens = attempt.get("tokens")
+    if tokens is None or not len(tokens) or not attempt.get("layout"):
+        return None
+    indices = select_regions(attempt)
+    if not indices or len(indices) > max(1, max_share * len(tokens)):
+        return None
+    return indices
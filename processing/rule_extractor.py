@@ -1,9 +1,152 @@
 """
 Rule-Based Extractor Module
-Extracts GSTIN, invoice number, date, phone, HSN, tax using regex.
+Extracts GSTIN, invoice number, dates, phone, PAN, place of supply, HSN/SAC,
+tax rates and labelled amounts using regex.
+
+All patterns are compiled once into a single alternation and the text is
+scanned in one pass; every match is reported with its character offsets.
+Labels cover the wording common on Indian GST invoices.
 """
 import re
-from typing import Dict, Any
+from typing import Any, Dict, List, Tuple
+
+# Separator between a label and its value: ":", "-", "=", brackets, currency
+_SEP = r"[\s:=\-()]*(?:(?i:rs\.?|inr)|₹)?[\s:=\-().]*"
+
+# Indian grouping (1,23,456.00) or plain digits; never the start of a rate
+_AMOUNT = r"\d{1,3}(?:,\d{2,3})+(?:\.\d{1,2})?(?![\d%])|\d+(?:\.\d{1,2})?(?![\d%]|\.\d|\s*%)"
+
+_RATE = r"\d{1,2}(?:\.\d{1,2})?"
+
+# 12/02/2026, 12-02-26, 12.02.2026, 12 Feb 2026, 12-February-26, 2026-02-12
+_DATE = (r"(?:\d{1,2}(?:[/.\-]\d{1,2}[/.\-](?:\d{4}|\d{2})"
+         r"|[\s\-/]*(?i:(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*)[\s\-/,]*\d{2,4})"
+         r"|\d{4}-\d{2}-\d{2})\b")
+
+# (name, pattern) in priority order. The name is the field reported for the
+# whole match unless the pattern has named groups, which then give the
+# fields (the group name up to "__" is the field; group names are unique
+# across all rules). Earlier rules win when two match at the same position.
+
+# Label-led fields: patterns start at a word
+_LABEL_RULES: List[Tuple[str, str]] = [
+    ("invoice_number",
+     r"\b(?i:(?:tax\s+)?(?:invoice|inv|bill|voucher)\.?\s*(?:no|number|num|#)\.?)"
+     r"[\s:#\-]*(?P<invoice_number>(?=[A-Za-z0-9\-/]*\d)[A-Za-z0-9][A-Za-z0-9\-/]*)"),
+    ("labelled_date",
+     r"\b(?i:(?P<label__invoice_date>(?:invoice|inv|bill)\.?\s*date|dated|date\s+of\s+(?:invoice|issue))"
+     r"|(?P<label__due_date>due\s+date|payment\s+due))"
+     rf"[\s:\-]*(?P<date__labelled>{_DATE})"),
+    ("pan", r"\b(?i:pan)(?:\s*(?i:no|number)\.?)?[\s:\-]*(?P<pan>[A-Z]{5}[0-9]{4}[A-Z])\b"),
+    ("place_of_supply",
+     r"\b(?i:place\s+of\s+supply)[\s:\-]*(?P<place_of_supply>[A-Za-z][A-Za-z .&]*?)"
+     r"(?:\s*[(\-]\s*(?P<state_code__pos>\d{2})\s*\)?)?[ \t]*(?=$|,|;|\n)"),
+    ("state_code", r"\b(?i:state\s*code)[\s:\-]*(?P<state_code>\d{2})\b"),
+    ("hsn_labelled", r"\b(?i:hsn|sac|hsn\s*/\s*sac)(?:\s*(?i:code))?[\s:\-]*(?P<hsn>\d{4,8})\b"),
+    # Consumed so a labelled PIN code is not read as a bare HSN code; not reported
+    ("pin_code", r"\b(?i:pin\s*code|pin|postal\s+code)[\s:\-]*(?P<pin_code>[1-9]\d{2}\s?\d{3})\b"),
+    # Amount labels, most specific first so "Total" doesn't take "Total Tax"
+    ("taxable_value",
+     rf"\b(?i:taxable\s+(?:value|amount|amt)|sub\s*-?\s*total|assessable\s+value){_SEP}(?P<taxable_value>{_AMOUNT})"),
+    ("tax_amount",
+     rf"\b(?i:(?P<label__cgst>cgst)|(?P<label__sgst>sgst|utgst)|(?P<label__igst>igst)|(?P<label__cess>cess))"
+     rf"(?:\s*@?\s*(?P<tax_percent__head>{_RATE})\s*%)?(?:{_SEP}(?P<amount__tax>{_AMOUNT}))?"),
+    ("total_tax", rf"\b(?i:total\s+(?:tax|gst)(?:\s+amount)?|tax\s+amount){_SEP}(?P<total_tax>{_AMOUNT})"),
+    ("grand_total",
+     r"\b(?i:grand\s+total|total\s+invoice\s+(?:value|amount)|invoice\s+(?:total|value)|"
+     r"net\s+(?:amount|payable)|amount\s+payable|total\s+amount(?:\s+payable)?|total)"
+     rf"{_SEP}(?P<grand_total>{_AMOUNT})"),
+]
+
+# Self-identifying values: patterns start at a digit or "+"
+_VALUE_RULES: List[Tuple[str, str]] = [
+    # Not "\b" in front: a GSTIN may be glued to its label ("GSTIN27AAAPL...")
+    ("gstin", r"(?<![0-9])(?i:[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z])\b"),
+    ("date", rf"\b{_DATE}"),
+    ("phone", r"(?<![\d])(?:\+91[\-\s]?|0)?[6-9][0-9]{9}\b"),
+    ("tax_percent", rf"(?<![\d.])(?P<tax_percent>{_RATE})\s*%"),
+    # Bare HSN/SAC codes in item rows: 4, 6 or 8 digits, not part of an amount
+    # or an alphanumeric token, and followed on the row by another number
+    # (qty, rate), which a PIN code ending an address line is not
+    ("hsn_bare", r"(?<![A-Za-z0-9.,\-])(?P<hsn__bare>\d{4}(?:\d{2}){0,2})(?![A-Za-z0-9,]|\.\d)(?=[^\S\n]+\d)"),
+]
+
+# Fields returned as single values by rule_based_extract (first match)
+SCALAR_FIELDS = ("gstin", "invoice_number", "date", "invoice_date", "due_date", "phone", "pan",
+                 "place_of_supply", "state_code", "hsn", "tax_percent")
+
+# Fields where every distinct value is also returned as a list
+LIST_FIELDS = {"gstin": "gstins", "hsn": "hsn_codes", "tax_percent": "tax_rates"}
+
+AMOUNT_FIELDS = ("taxable_value", "cgst", "sgst", "igst", "cess", "total_tax", "grand_total")
+
+# Matched case-insensitively, reported upper-case
+_UPPERCASE = {"gstin"}
+
+
+def _compile() -> Tuple[re.Pattern, Dict[str, List[str]]]:
+    """
+    One scanner for all rules. The leading lookaheads send a position to the
+    value or the label rules only, and a run that matches no rule is
+    consumed whole by "_skip" instead of being retried at every character.
+    A "." is skipped on its own unless it follows a digit, so a value right
+    after "No." is still tried.
+    """
+    groups: Dict[str, List[str]] = {}
+
+    def alternation(rules: List[Tuple[str, str]]) -> str:
+        for name, pattern in rules:
+            inner = re.compile(pattern).groupindex
+            groups[name] = sorted(inner, key=inner.get)
+        return "|".join(f"(?P<_{name}>{pattern})" for name, pattern in rules)
+
+    scanner = (
+        f"(?=[0-9+])(?:{alternation(_VALUE_RULES)})"
+        f"|(?=[A-Za-z])(?:{alternation(_LABEL_RULES)})"
+        r"|(?P<_skip>[0-9,+][0-9.,+]*|\.|[A-Za-z]+)"
+    )
+    return re.compile(scanner, re.MULTILINE), groups
+
+
+_SCANNER, _RULE_GROUPS = _compile()
+
+
+def extract_matches(text: str) -> List[Dict[str, Any]]:
+    """
+    Every field occurrence in one scan of the text.
+    Args:
+        text: OCR text (joined)
+    Returns:
+        list: {field, value, start, end, rule} in text order, offsets of the
+            value; labelled amounts and dates are named after their label
+            (cgst, grand_total, invoice_date, due_date, ...), GSTINs are
+            upper-cased
+    """
+    matches = []
+    for m in _SCANNER.finditer(text):
+        rule = m.lastgroup[1:]
+        if rule == "skip":
+            continue
+        inner = _RULE_GROUPS[rule]
+        if not inner:
+            value = m.group().upper() if rule in _UPPERCASE else m.group()
+            matches.append({"field": rule, "value": value, "start": m.start(), "end": m.end(), "rule": rule})
+            continue
+        label = next((g.split("__", 1)[1] for g in inner if g.startswith("label__") and m.group(g)), None)
+        for group in inner:
+            value = m.group(group)
+            if value is None or group.startswith("label__"):
+                continue
+            field = group.split("__", 1)[0]
+            if field in ("amount", "date"):
+                field = label  # Amount or date named after its label (cgst, due_date, ...)
+            matches.append({"field": field, "value": value, "start": m.start(group), "end": m.end(group), "rule": rule})
+    return matches
+
+
+def _amount(value: str) -> str:
+    return value.replace(",", "")
+
 
 def rule_based_extract(text: str) -> Dict[str, Any]:
     """
@@ -11,23 +154,38 @@ def rule_based_extract(text: str) -> Dict[str, Any]:
     Args:
         text: OCR text (joined)
     Returns:
-        dict: Partial structured invoice
+        dict: Partial structured invoice. Single-valued fields hold the first
+            match (date prefers an explicit invoice date); gstins, hsn_codes
+            and tax_rates list every distinct value, HSN/SAC codes coming
+            from item rows only when none is labelled; labelled amounts are
+            under "amounts" with Indian digit grouping removed
     """
-    patterns = {
-        "gstin": r"[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}",
-        "invoice_number": r"(?:Invoice\s*No\.?|Inv\.?\s*No\.?|Bill\s*No\.?)[^\dA-Z]*([A-Z0-9\-/]+)",
-        "date": r"\b(\d{2}[/-]\d{2}[/-]\d{4})\b",
-        "phone": r"\b[6-9][0-9]{9}\b",
-        "hsn": r"\b[0-9]{4,8}\b",
-        "tax_percent": r"(\d{1,2}\.\d{1,2}|\d{1,2})%"
-    }
-    result = {}
-    for key, pat in patterns.items():
-        m = re.search(pat, text, re.IGNORECASE)
-        if m:
-            result[key] = m.group(1) if m.lastindex else m.group(0)
+    result: Dict[str, Any] = {}
+    lists: Dict[str, List[str]] = {}
+    amounts: Dict[str, str] = {}
+    matches = extract_matches(text)
+    if any(match["rule"] == "hsn_labelled" for match in matches):
+        # Labelled HSN/SAC codes are trusted over bare digit runs
+        matches = [match for match in matches if match["rule"] != "hsn_bare"]
+    for match in matches:
+        field, value = match["field"], match["value"]
+        if field in AMOUNT_FIELDS:
+            amounts.setdefault(field, _amount(value))
+            continue
+        if field in SCALAR_FIELDS:
+            result.setdefault(field, value)
+        if field in LIST_FIELDS:
+            values = lists.setdefault(LIST_FIELDS[field], [])
+            if value not in values:
+                values.append(value)
+    if "invoice_date" in result:
+        result["date"] = result["invoice_date"]
+    result.update(lists)
+    if amounts:
+        result["amounts"] = amounts
     return result
 
+
 if __name__ == "__main__":
     # Example usage
     sample = "GSTIN: 22AAAAA0000A1Z5\nInvoice No: INV-1234\nDate: 12/02/2026\nPhone: 9876543210\nHSN: 123456\nCGST 9% SGST 9%"
@@ -0,0 +1,103 @@
+"""
+Startup Module
+Model-load modes, warm-up and readiness for the OCR service.
+
+    background  bind the port at once, load and warm every pool worker in a
+                background task; /health/ready turns 200 when done (default)
+    eager       load and warm every worker before the port binds
+    lazy        load each worker's models on its first request; ready at once
+
+Startup phases (process age at each milestone, time spent per phase, and
+per-worker engine load / warm-up times) are kept for /health and the logs.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+MODEL_LOAD_MODES = ("background", "eager", "lazy")
+
+_IMPORTED = time.monotonic()
+
+
+def process_age_seconds() -> float:
+    """Seconds since this process started (Linux /proc), else since this module was imported."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])  # Field 22: starttime
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 3)
+    except (OSError, ValueError, IndexError):
+        return round(time.monotonic() - _IMPORTED, 3)
+
+
+def warmup_image() -> np.ndarray:
+    """
+    Built-in tiny invoice snippet (96x480 BGR, two printed lines): enough for
+    detection, angle classification and recognition to run once.
+    """
+    img = np.full((96, 480, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "GSTIN 27AAPFU0939F1ZV", (12, 38), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 2, cv2.LINE_AA)
+    cv2.putText(img, "Total 1180.00", (12, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (20, 20, 20), 2, cv2.LINE_AA)
+    return img
+
+
+class StartupState:
+    """
+    What startup did and whether the service should get traffic yet.
+    status: starting -> loading -> ready, or failed.
+    """
+
+    def __init__(self, mode: str):
+        if mode not in MODEL_LOAD_MODES:
+            raise ValueError(f"Unknown model load mode: {mode}")
+        self.mode = mode
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.milestones: Dict[str, float] = {}  # Process age (s) at each milestone
+        self.phases: Dict[str, float] = {}      # Duration (ms) of each phase
+        self.workers: List[Dict[str, Any]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def milestone(self, name: str) -> None:
+        self.milestones[name] = process_age_seconds()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def loading(self) -> None:
+        self.status = "loading"
+
+    def mark_ready(self, workers: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.workers = workers or []
+        self.status = "ready"
+        self.milestone("ready")
+
+    def mark_failed(self, error: BaseException) -> None:
+        self.status = "failed"
+        self.error = f"{type(error).__name__}: {error}"
+        self.milestone("failed")
+
+    def report(self) -> Dict[str, Any]:
+        """Mode, status, milestones, phases and per-worker load times."""
+        return {
+            "mode": self.mode,
+            "status": self.status,
+            "error": self.error,
+            "uptime_s": process_age_seconds(),
+            "milestones_s": dict(self.milestones),
+            "phases_ms": dict(self.phases),
+            "workers": list(self.workers),
+        }
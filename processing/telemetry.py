@@ -0,0 +1,284 @@
+"""
+Telemetry Module
+Prometheus metrics and per-request trace spans for the OCR service.
+
+Metrics live in one registry served at /metrics: request, queue-wait and
+inference latency by file type (and page count for requests), decode and
+pipeline stage times, upload bytes, PDF pages, errors and process RSS.
+prometheus_client is optional: without it every metric is a no-op and
+/metrics answers 503.
+
+A trace is a request-scoped list of (name, start, duration) spans, found
+through a contextvar. It carries the caller's job_id and X-Request-ID (and
+the trace id of a W3C traceparent), and ends up in the Server-Timing header,
+the response metrics and one JSON log line per request. Both are cheap
+enough to leave on: a histogram observation is a lock and a bisect, a span
+is two perf_counter() calls and an append.
+
+In process pool mode, work inside the workers is visible only through what
+they return (pool wait/run times, pipeline stage timings).
+"""
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, ProcessCollector
+except ImportError:  # Optional: metrics are only collected when installed
+    prometheus_client = None
+    CollectorRegistry = Counter = Gauge = Histogram = ProcessCollector = None
+
+logger = logging.getLogger("ocr-service.trace")
+
+OCR_METRICS = os.getenv("OCR_METRICS", "1") == "1"      # 0 = no Prometheus metrics
+OCR_TRACE_LOG = os.getenv("OCR_TRACE_LOG", "1") == "1"  # 0 = no per-request trace log line
+MAX_SPANS = 256  # Per trace; a 20-page PDF records well under 100
+
+# Request buckets straddle the worker's 60s axios timeout
+REQUEST_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = tuple(float(2 ** i) for i in range(14, 25))  # 16 KB .. 16 MB
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$")
+
+
+class _NoopMetric:
+    """Stands in for every metric when prometheus_client is missing or metrics are off."""
+
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        pass
+
+
+def enabled() -> bool:
+    return prometheus_client is not None and OCR_METRICS
+
+
+REGISTRY = CollectorRegistry() if enabled() else None
+if REGISTRY is not None:
+    ProcessCollector(registry=REGISTRY)  # process_resident_memory_bytes, CPU seconds, open fds
+
+
+def _metric(kind: Any, name: str, documentation: str, labels: Tuple[str, ...] = (), **kwargs: Any) -> Any:
+    if REGISTRY is None:
+        return _NoopMetric()
+    return kind(name, documentation, labels, registry=REGISTRY, **kwargs)
+
+
+REQUESTS = _metric(Counter, "ocr_requests", "OCR requests by outcome",
+                   ("endpoint", "file_type", "status_code"))
+REQUEST_SECONDS = _metric(Histogram, "ocr_request_duration_seconds", "Request wall time, upload to response",
+                          ("endpoint", "file_type", "pages"), buckets=REQUEST_BUCKETS)
+QUEUE_WAIT_SECONDS = _metric(Histogram, "ocr_queue_wait_seconds", "Wait for a free inference pool worker",
+                             ("task", "file_type"), buckets=STAGE_BUCKETS)
+INFERENCE_SECONDS = _metric(Histogram, "ocr_inference_seconds", "Run time of a task on an inference pool worker",
+                            ("task", "file_type"), buckets=STAGE_BUCKETS)
+DECODE_SECONDS = _metric(Histogram, "ocr_decode_seconds", "Image decode and resize / PDF page render time",
+                         ("file_type",), buckets=STAGE_BUCKETS)
+STAGE_SECONDS = _metric(Histogram, "ocr_pipeline_stage_seconds", "Extraction pipeline stage time",
+                        ("stage",), buckets=STAGE_BUCKETS)
+UPLOAD_BYTES = _metric(Histogram, "ocr_upload_bytes", "Upload size", ("file_type",), buckets=BYTES_BUCKETS)
+PDF_PAGES = _metric(Histogram, "ocr_pdf_pages", "Pages per PDF", buckets=PAGE_BUCKETS)
+ERRORS = _metric(Counter, "ocr_errors", "Failed requests by error", ("endpoint", "error"))
+
+
+def gauge(name: str, documentation: str, fn: Callable[[], float]) -> None:
+    """A gauge read from fn at scrape time (pool depth, cache size, ...)."""
+    _metric(Gauge, name, documentation).set_function(fn)
+
+
+def page_bucket(pages: Optional[int]) -> str:
+    """Page count as a bounded label value."""
+    if not pages:
+        return "0"
+    if pages <= 2:
+        return str(pages)
+    return "3-5" if pages <= 5 else "6-20" if pages <= 20 else "21+"
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """(body, content type) of the Prometheus text exposition."""
+    return prometheus_client.generate_latest(REGISTRY), prometheus_client.CONTENT_TYPE_LATEST
+
+
+class Trace:
+    """
+    Spans of one request. Starts are perf_counter() values; spans reported by
+    pool workers (pipeline stages) have no start, only a duration.
+    """
+
+    __slots__ = ("trace_id", "job_id", "request_id", "endpoint", "file_type", "pages", "error", "started", "spans")
+
+    def __init__(self, endpoint: str, job_id: Optional[str] = None, request_id: Optional[str] = None,
+                 traceparent: Optional[str] = None):
+        match = _TRACEPARENT.match((traceparent or "").strip().lower())
+        self.trace_id = match.group(1) if match else request_id or uuid.uuid4().hex
+        self.job_id = job_id
+        self.request_id = request_id
+        self.endpoint = endpoint
+        self.file_type = "unknown"
+        self.pages: Optional[int] = None
+        self.error: Optional[str] = None
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, Optional[float], float]] = []
+
+    def add(self, name: str, start: Optional[float], seconds: float) -> None:
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((name, start, seconds))
+
+    def stages(self) -> Dict[str, float]:
+        """Milliseconds per span name (repeated spans, e.g. per page, are summed)."""
+        totals: Dict[str, float] = {}
+        for name, _, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return {name: round(seconds * 1000, 2) for name, seconds in totals.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        """Trace ids, elapsed time and per-stage totals, for response bodies."""
+        return {
+            "trace_id": self.trace_id,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages": self.stages(),
+        }
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: per-stage totals plus the whole request."""
+        entries = [f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)};dur={ms}" for name, ms in self.stages().items()]
+        entries.append(f"total;dur={round((time.perf_counter() - self.started) * 1000, 1)}")
+        return ", ".join(entries)
+
+    def log_record(self, status_code: int) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "job_id": self.job_id,
+            "request_id": self.request_id,
+            "endpoint": self.endpoint,
+            "file_type": self.file_type,
+            "pages": self.pages,
+            "status_code": status_code,
+            "error": self.error,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            # [name, start offset ms (None: measured inside a pool worker), duration ms]
+            "spans": [
+                [name, round((start - self.started) * 1000, 1) if start is not None else None, round(seconds * 1000, 2)]
+                for name, start, seconds in self.spans
+            ],
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("ocr_trace", default=None)
+
+
+def begin_trace(endpoint: str, job_id: Optional[str] = None, request_id: Optional[str] = None,
+                traceparent: Optional[str] = None) -> Trace:
+    """Start a trace and make it current for this request's context."""
+    trace = Trace(endpoint, job_id, request_id, traceparent)
+    _current.set(trace)
+    return trace
+
+
+def activate(trace: Trace) -> None:
+    """Make an existing trace current (e.g. inside a streaming response body)."""
+    _current.set(trace)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def current_file_type() -> str:
+    trace = _current.get()
+    return trace.file_type if trace is not None else "unknown"
+
+
+def finish_trace(trace: Trace, status_code: int, headers: Optional[Any] = None) -> None:
+    """
+    Record the request in the metrics, log its spans, and add Server-Timing
+    and X-Trace-Id to `headers` (a response's mutable headers) when given.
+    """
+    elapsed = time.perf_counter() - trace.started
+    REQUESTS.labels(trace.endpoint, trace.file_type, str(status_code)).inc()
+    REQUEST_SECONDS.labels(trace.endpoint, trace.file_type, page_bucket(trace.pages)).observe(elapsed)
+    if status_code >= 400 or trace.error:
+        ERRORS.labels(trace.endpoint, trace.error or f"http_{status_code}").inc()
+    if headers is not None:
+        headers["Server-Timing"] = trace.server_timing()
+        headers["X-Trace-Id"] = trace.trace_id
+    if OCR_TRACE_LOG:
+        logger.info(json.dumps(trace.log_record(status_code), separators=(",", ":")))
+
+
+@contextmanager
+def span(name: str, histogram: Any = None, **labels: str) -> Iterator[None]:
+    """Time a block into the current trace (if any) and, optionally, a histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current.get()
+        if trace is not None:
+            trace.add(name, start, elapsed)
+        if histogram is not None:
+            histogram.labels(**labels).observe(elapsed)
+
+
+def observe_task(task: str, submitted: float, wait: float, run: float) -> None:
+    """A task that went through the inference pool: queue wait, then run time."""
+    file_type = current_file_type()
+    QUEUE_WAIT_SECONDS.labels(task, file_type).observe(wait)
+    INFERENCE_SECONDS.labels(task, file_type).observe(run)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(f"queue.{task}", submitted, wait)
+        trace.add(task, submitted + wait, run)
+
+
+def record_stages(timings: Dict[str, float]) -> None:
+    """Pipeline StageTimer timings (ms) from a pool worker: stage histograms and spans."""
+    trace = _current.get()
+    for stage, ms in timings.items():
+        STAGE_SECONDS.labels(stage).observe(ms / 1000)
+        if stage == "decode":
+            DECODE_SECONDS.labels(current_file_type()).observe(ms / 1000)
+        if trace is not None:
+            trace.add(f"pipeline.{stage}", None, ms / 1000)
+
+
+def record_error(error: BaseException) -> None:
+    """Name the error of the current request (counted when the trace finishes)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.error = type(error).__name__
+
+
+def observe_upload(file_type: str, size: int) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.file_type = file_type
+        if file_type == "image":
+            trace.pages = 1
+    UPLOAD_BYTES.labels(file_type).observe(size)
+
+
+def observe_pages(pages: int) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.pages = pages
+    PDF_PAGES.observe(pages)
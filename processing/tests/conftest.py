@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service modules are flat in processing/, imported by name as in the service
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,167 @@
+"""
+OllamaClient and the llm_extract helpers against the Ollama stub server.
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import llm_extractor
+from llm_extractor import OllamaClient, allm_extract, llm_extract
+from ollama_stub import start_stub_server
+
+INVOICE_TEXT = "GSTIN: 22AAAAA0000A1Z5\nInvoice No: INV-1234\nDate: 12/02/2026\nTotal: 1,180.00"
+EXPECTED = {"gstin": "22AAAAA0000A1Z5", "invoice_number": "INV-1234", "grand_total": "1180.00"}
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, url, calls = start_stub_server(**kwargs)
+        servers.append(server)
+        return url, calls
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def default_client(stub, monkeypatch):
+    """Point the process-wide client used by llm_extract/allm_extract at a stub."""
+    url, calls = stub()
+    client = OllamaClient(base_url=url)
+    monkeypatch.setattr(llm_extractor, "_default_client", client)
+    yield calls
+    client.close()
+
+
+class ConcurrencyProbe:
+    """Responder that records how many generations run at once."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return {"prompt": prompt}
+
+
+def test_generate_json_uses_json_mode(stub):
+    # The stub only answers with JSON text when the request asked for format=json
+    url, calls = stub()
+    client = OllamaClient(base_url=url)
+    try:
+        assert client.generate_json(INVOICE_TEXT) == EXPECTED
+    finally:
+        client.close()
+    assert calls["generate"] == 1
+
+
+def test_llm_extract_sync_and_async(default_client):
+    assert llm_extract(INVOICE_TEXT) == EXPECTED
+    assert asyncio.run(allm_extract(INVOICE_TEXT)) == EXPECTED
+    assert default_client["generate"] == 2
+
+
+def test_sync_concurrency_limit(stub):
+    probe = ConcurrencyProbe()
+    url, calls = stub(responder=probe)
+    client = OllamaClient(base_url=url, max_concurrency=2)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(client.generate_json(f"p{i}"))) for i in range(6)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        client.close()
+    assert sorted(r["prompt"] for r in results) == [f"p{i}" for i in range(6)]
+    assert probe.peak == 2
+    assert calls["generate"] == 6
+
+
+def test_async_concurrency_limit(stub):
+    probe = ConcurrencyProbe()
+    url, _ = stub(responder=probe)
+    client = OllamaClient(base_url=url, max_concurrency=2)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(client.agenerate_json(f"p{i}") for i in range(6)))
+        finally:
+            await client.aclose()
+
+    results = asyncio.run(run())
+    client.close()
+    assert [r["prompt"] for r in results] == [f"p{i}" for i in range(6)]
+    assert probe.peak == 2
+
+
+def test_invalid_json_raises_value_error(stub):
+    url, _ = stub(responder=lambda prompt: "Sure! Here are the fields: {gstin: ...")
+    client = OllamaClient(base_url=url)
+    try:
+        with pytest.raises(ValueError, match="Invalid JSON"):
+            client.generate_json(INVOICE_TEXT)
+        with pytest.raises(ValueError, match="Invalid JSON"):
+            asyncio.run(client.agenerate_json(INVOICE_TEXT))
+    finally:
+        client.close()
+
+
+def test_timeout_is_retried_once(stub):
+    url, calls = stub(delay_ms=500)
+    client = OllamaClient(base_url=url, timeout=0.1)
+    try:
+        with pytest.raises(TimeoutError):
+            client.generate_json(INVOICE_TEXT)
+    finally:
+        client.close()
+    assert calls["generate"] == 2
+
+
+def test_http_error_is_raised(stub):
+    url, _ = stub()
+    client = OllamaClient(base_url=url + "/missing")
+    try:
+        with pytest.raises(httpx.HTTPStatusError):
+            client.generate_json(INVOICE_TEXT)
+    finally:
+        client.close()
+
+
+def test_unreachable_server_raises_transport_error(stub):
+    url, _ = stub()
+    client = OllamaClient(base_url=url.rsplit(":", 1)[0] + ":9", timeout=1)
+    try:
+        with pytest.raises(httpx.TransportError):
+            client.generate_json(INVOICE_TEXT)
+        with pytest.raises(httpx.TransportError):
+            asyncio.run(client.agenerate_json(INVOICE_TEXT))
+    finally:
+        client.close()
+
+
+def test_warm_sends_empty_prompt(stub):
+    url, calls = stub(responder=lambda prompt: pytest.fail("warm-up must not generate"))
+    client = OllamaClient(base_url=url)
+    try:
+        client.warm()
+    finally:
+        client.close()
+    assert calls["generate"] == 1
@@ -0,0 +1,44 @@
+"""
+MultiPassOCR merging over a skewed scan, with a stand-in detection engine.
+"""
+import cv2
+import numpy as np
+
+from ocr_engine import MultiPassOCR
+
+BAR_WIDTHS = (300, 500, 700, 900)
+
+
+class BlobEngine:
+    """Reports every dark blob as a token named after its width, like a detector would."""
+
+    def ocr(self, image, cls=True):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        count, _, stats, _ = cv2.connectedComponentsWithStats((gray < 128).astype(np.uint8))
+        lines = []
+        for x, y, w, h, area in stats[1:count].tolist():
+            if area < 500:
+                continue
+            box = [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+            lines.append([box, (f"bar{round(w / 100)}", 0.8)])
+        return [lines]
+
+
+def skewed_scan(angle: float = 4.0) -> np.ndarray:
+    img = np.full((1600, 1200, 3), 255, dtype=np.uint8)
+    for i, width in enumerate(BAR_WIDTHS):
+        y = 300 + i * 150
+        cv2.rectangle(img, (150, y), (150 + width, y + 30), (0, 0, 0), -1)
+    M = cv2.getRotationMatrix2D((600, 800), angle, 1.0)
+    return cv2.warpAffine(img, M, (1200, 1600), borderValue=(255, 255, 255))
+
+
+def test_skewed_scan_merges_without_duplicates():
+    ocr = MultiPassOCR(engines=[BlobEngine()], skip_confidence=1.0)
+    try:
+        tokens, stats = ocr.run_with_stats(skewed_scan())
+    finally:
+        ocr.close()
+    assert sorted(stats["pass_seconds"]) == ["denoised", "high_contrast", "normal"]
+    texts = [token["text"] for token in tokens]
+    assert sorted(texts) == [f"bar{w // 100}" for w in BAR_WIDTHS]
@@ -0,0 +1,115 @@
+"""
+InvoicePipeline and the service's pipeline entry points, with a stand-in OCR engine.
+"""
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+import llm_extractor
+import ocr_service
+import pipeline as pipeline_module
+from llm_extractor import OllamaClient
+from ocr_engine import MultiPassOCR
+from ollama_stub import start_stub_server
+from pipeline import InvoicePipeline, allm_fallback
+from tokens import TokenTable
+from uploads import Upload
+
+RULED_INVOICE = [
+    "GSTIN: 29ABCDE1234F1Z3",
+    "Invoice No: INV-1234",
+    "Date: 12/02/2026",
+    "Taxable Value: 1,000.00",
+    "CGST @ 9% 90.00",
+    "SGST @ 9% 90.00",
+    "Grand Total: 1,180.00",
+]
+
+
+class LinesEngine:
+    """Returns the same text lines, one per row, for any image."""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def ocr(self, image, cls=True):
+        return [[[line_box(i), (text, 0.95)] for i, text in enumerate(self.lines)]]
+
+
+def line_box(i):
+    return [[20, 40 * i + 10], [600, 40 * i + 10], [600, 40 * i + 40], [20, 40 * i + 40]]
+
+
+def line_tokens(lines):
+    return TokenTable(lines, [line_box(i) for i in range(len(lines))], np.full(len(lines), 0.95))
+
+
+@pytest.fixture
+def no_sync_llm(monkeypatch):
+    monkeypatch.setattr(pipeline_module, "llm_extract", lambda text: pytest.fail("LLM must not run here"))
+
+
+@pytest.fixture
+def llm_stub(monkeypatch):
+    server, url, calls = start_stub_server(responder=lambda prompt: {"gstin": "29ABCDE1234F1Z3", "date": "12/02/2026"})
+    client = OllamaClient(base_url=url)
+    monkeypatch.setattr(llm_extractor, "_default_client", client)
+    yield calls
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pipeline():
+    ocr = MultiPassOCR(engines=[LinesEngine(["Invoice No: INV-1234", "Date: 12/02/2026"])])
+    yield InvoicePipeline(ocr=ocr, use_llm=False)
+    ocr.close()
+
+
+def test_service_gate_off_keeps_elongated_receipts(pipeline, monkeypatch):
+    # 1200 x 5000 passes the size check as uploaded, but not once fitted to 2000 px
+    receipt = np.full((5000, 1200, 3), 255, dtype=np.uint8)
+    upload = Upload(bytearray(cv2.imencode(".png", receipt)[1].tobytes()))
+    monkeypatch.setattr(ocr_service, "OCR_QUALITY_GATE", False)
+    monkeypatch.setattr(ocr_service, "get_worker_pipeline", lambda use_llm: pipeline)
+    result = ocr_service.run_image_pipeline(upload)
+    assert result["exit_reason"] != "quality_rejected"
+    assert result["quality"] is None
+    assert "quality_gate" not in result["timings"]
+
+
+def test_fully_ruled_invoice_skips_the_llm(no_sync_llm):
+    result = InvoicePipeline(use_llm=True).run_tokens(line_tokens(RULED_INVOICE))
+    assert result["exit_reason"] == "rules_valid"
+    assert result["source"] == "rules"
+    invoice = result["invoice"]
+    assert (invoice["taxable"], invoice["tax"], invoice["grand_total"]) == ("1000.00", "180.00", "1180.00")
+    assert "llm" not in result["timings"]
+
+
+def test_ruled_amounts_are_validated():
+    lines = [line.replace("1,180.00", "1,200.00") for line in RULED_INVOICE]
+    result = InvoicePipeline(use_llm=False).run_tokens(line_tokens(lines))
+    assert result["exit_reason"] == "rules_invalid"
+    assert "grand_total" in result["validation"]["field_errors"]
+
+
+def test_llm_fallback_runs_on_the_event_loop(no_sync_llm, llm_stub):
+    # GSTIN and date missing: the worker result is incomplete, the LLM fills it in
+    result = InvoicePipeline(use_llm=False).run_tokens(line_tokens(RULED_INVOICE[1:2] + RULED_INVOICE[3:]))
+    assert result["exit_reason"] == "rules_valid_incomplete"
+    completed = asyncio.run(allm_fallback(result))
+    assert llm_stub["generate"] == 1
+    assert completed["exit_reason"] == "llm_valid"
+    assert completed["source"] == "rules+llm"
+    assert completed["invoice"]["gstin"] == "29ABCDE1234F1Z3"
+    assert completed["invoice"]["invoice_number"] == "INV-1234"
+    assert "llm" in completed["timings"]
+
+    # Settled results are left alone
+    settled = InvoicePipeline(use_llm=False).run_tokens(line_tokens(RULED_INVOICE))
+    assert asyncio.run(allm_fallback(settled)) is settled
+    assert llm_stub["generate"] == 1
@@ -0,0 +1,48 @@
+"""
+GSTIN and HSN/SAC rules of the single-pass rule extractor.
+"""
+from rule_extractor import extract_matches, rule_based_extract
+
+
+def test_lowercase_gstin_is_reported_upper_case():
+    out = rule_based_extract("GSTIN: 22aaaaa0000a1z5\nInvoice No: INV-1234")
+    assert out["gstin"] == "22AAAAA0000A1Z5"
+    assert out["gstins"] == ["22AAAAA0000A1Z5"]
+    assert "hsn" not in out
+
+
+def test_gstin_after_a_dot_or_glued_to_its_label():
+    for text, gstin in (("GSTIN No.27AAAPL1234C1ZV", "27AAAPL1234C1ZV"),
+                        ("No.22AAAAA0000A1Z5", "22AAAAA0000A1Z5"),
+                        ("GSTIN27AAAPL1234C1ZV", "27AAAPL1234C1ZV")):
+        assert rule_based_extract(text).get("gstin") == gstin, text
+
+
+def test_no_hsn_from_digits_inside_a_token():
+    out = rule_based_extract("Model 1234abc 2 500.00\nRef X8471 1 100.00")
+    assert "hsn" not in out
+
+
+def test_pin_code_is_not_an_hsn_code():
+    for text in ("Acme Traders, MG Road\nBangalore 560001\nGSTIN: 29AAAAA0000A1Z5",
+                 "Bangalore - 560001 Ph 9876543210",
+                 "PIN: 560001 Tel 080 2345"):
+        assert "hsn" not in rule_based_extract(text), text
+
+
+def test_bare_hsn_codes_in_item_rows():
+    out = rule_based_extract("1 Item 8471 2 500.00 1,000.00\n2 Service 998314 1 200.00 200.00")
+    assert out["hsn"] == "8471"
+    assert out["hsn_codes"] == ["8471", "998314"]
+
+
+def test_labelled_hsn_is_preferred():
+    out = rule_based_extract("1 Widget 8471 2 500.00 1,000.00\nHSN: 8443")
+    assert out["hsn"] == "8443"
+    assert out["hsn_codes"] == ["8443"]
+
+
+def test_matches_report_the_rule():
+    matches = extract_matches("HSN/SAC: 998314\n1 Widget 8471 2 500.00")
+    assert [(m["field"], m["value"], m["rule"]) for m in matches if m["field"] == "hsn"] == [
+        ("hsn", "998314", "hsn_labelled"), ("hsn", "8471", "hsn_bare")]
@@ -0,0 +1,32 @@
+"""
+Text-layer tokens of generated PDF pages, upright and rotated.
+"""
+import fitz
+import pytest
+
+from text_layer import page_tokens
+
+
+def text_page(rotation: int) -> fitz.Page:
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)  # A4 portrait
+    for i in range(14):
+        page.insert_text((50, 60 + 50 * i), f"line{i} alpha")
+    page.insert_text((500, 800), "FARRIGHT")
+    page.set_rotation(rotation)
+    return page
+
+
+@pytest.mark.parametrize("rotation", [90, 180, 270])
+def test_rotated_page_keeps_every_word(rotation):
+    upright = page_tokens(text_page(0), 2.0)
+    page = text_page(rotation)
+    rotated = page_tokens(page, 2.0)
+    assert sorted(t["text"] for t in rotated) == sorted(t["text"] for t in upright)
+    assert len(rotated) == 15
+
+    # Boxes are in the rotated raster's pixel space
+    width, height = page.rect.width * 2, page.rect.height * 2
+    for token in rotated:
+        (x0, y0), _, (x1, y1), _ = token["box"]
+        assert 0 <= x0 < x1 <= width and 0 <= y0 < y1 <= height
@@ -0,0 +1,68 @@
+"""
+validate_invoices_batch against validate_invoice, invoice by invoice.
+"""
+from decimal import Decimal
+from itertools import product
+
+from validation_engine import validate_gstin, validate_invoice, validate_invoices_batch
+
+VALID_GSTIN = "29ABCDE1234F1Z3"
+
+GSTINS = [
+    VALID_GSTIN,
+    "29ABCDE1234F1Z4",   # Bad checksum
+    VALID_GSTIN.lower(),
+    "29ABCDE1234F1Z",    # Wrong length
+    "29ABCDE1234F1Z33",
+    "29ABCDE1234F0Z3",   # 0 where 1-9A-Z is required
+    "29ABCDE1234F1Zé",   # Non-ASCII
+    "",
+    None,
+]
+
+AMOUNTS = [
+    0, "0", 0.0, "0.00", 1000, "1000", "1000.00", 1000.0, "1000.5", "1000.50", 0.1, 0.2, 0.30000000000000004,
+    "0.01", "-5", -5, "-0.01", "+7", "1,000.00", "1e3", " 12", "12.345", "12.", ".5", "abc", None, True,
+    Decimal("1.50"), Decimal("NaN"), 10 ** 20, "9" * 16, 1e15,
+]
+
+
+def _invoice(gstin, amount, i):
+    """One-row invoice that checks out when amount is exact; i picks a variation to break."""
+    invoice = {
+        "gstin": gstin,
+        "lines": [{"qty": "1", "rate": amount, "total": amount}],
+        "taxable": amount,
+        "tax": 0,
+        "grand_total": amount,
+    }
+    variant = i % 6
+    if variant == 1:
+        invoice.update(cgst=9, sgst=9)
+    elif variant == 2:
+        invoice.update(cgst=9, igst=18)
+    elif variant == 3:
+        invoice["lines"].append({"qty": 2, "rate": "50.00", "total": 99})
+    elif variant == 4:
+        invoice["tax"] = "18.00"
+    elif variant == 5:
+        del invoice["lines"][0]["total"]
+    return invoice
+
+
+def test_valid_gstin_fixture():
+    assert validate_gstin(VALID_GSTIN)
+
+
+def test_batch_equals_single_on_edge_amounts_and_gstins():
+    invoices = [_invoice(gstin, amount, i) for i, (gstin, amount) in enumerate(product(GSTINS, AMOUNTS))]
+    invoices += [{}, {"lines": []}, {"lines": [{}]}, {"gstin": VALID_GSTIN, "cgst": "", "sgst": None},
+                 {"taxable": "1000.00", "tax": "180.00", "grand_total": "1180.00"},  # No line items to sum
+                 {"lines": [], "taxable": 5, "grand_total": 6}]
+    assert validate_invoices_batch(invoices) == [validate_invoice(x) for x in invoices]
+    # Cached GSTIN results give the same answers on a second batch
+    assert validate_invoices_batch(invoices) == [validate_invoice(x) for x in invoices]
+
+
+def test_empty_batch():
+    assert validate_invoices_batch([]) == []
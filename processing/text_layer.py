@@ -0,0 +1,104 @@
+"""
+PDF Text Layer Module
+Reads OCR-shaped tokens ({text, box, confidence}) straight from the text
+layer of machine-generated PDF pages, so they skip rendering and inference.
+Pages that look scanned return None and go through raster OCR as before.
+"""
+import logging
+import os
+from typing import List, Optional
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from image_io import pdf_page_zoom
+from tokens import TokenTable
+
+logger = logging.getLogger("ocr-service.text_layer")
+
+PDF_TEXT_LAYER = os.getenv("PDF_TEXT_LAYER", "1") == "1"  # 0 = always rasterize and OCR
+PDF_TEXT_MIN_WORDS = int(os.getenv("PDF_TEXT_MIN_WORDS", "10"))  # Fewer: treat the page as scanned
+PDF_TEXT_MAX_IMAGE_SHARE = 0.5   # Images covering more of the page: a scan (maybe with an OCR layer)
+PDF_TEXT_MAX_BAD_CHARS = 0.05    # Unmapped glyphs (U+FFFD, private use) above this: broken font encoding
+PDF_TEXT_MERGE_GAP = 1.0         # Words closer than this many line heights form one token, like OCR lines
+
+def _bad_char_share(words: List[tuple]) -> float:
+    chars = bad = 0
+    for word in words:
+        text = word[4]
+        chars += len(text)
+        bad += sum(1 for ch in text if ch == "\ufffd" or "\ue000" <= ch <= "\uf8ff" or ch < " ")
+    return bad / chars if chars else 1.0
+
+
+def _unrotated_rect(page: fitz.Page) -> fitz.Rect:
+    """The page rect in unrotated page space, where words and image boxes are given."""
+    return (page.rect * page.derotation_matrix).normalize()
+
+
+def _image_share(page: fitz.Page) -> float:
+    """Share of the page area covered by raster images (overlaps counted once per image)."""
+    rect = _unrotated_rect(page)
+    area = abs(rect)
+    if not area or not page.get_images():  # Cheap xref listing; image placement needs a content parse
+        return 0.0
+    covered = sum(abs(fitz.Rect(info["bbox"]) & rect) for info in page.get_image_info())
+    return min(covered / area, 1.0)
+
+
+def _merge_words(words: List[tuple]) -> List[List[tuple]]:
+    """
+    Group the words of each text line into runs separated by wide gaps,
+    so a token is a phrase or table cell as the OCR detector would box it.
+    """
+    runs: List[List[tuple]] = []
+    for word in sorted(words, key=lambda w: (w[5], w[6], w[7])):
+        if runs:
+            last = runs[-1][-1]
+            height = max(last[3] - last[1], word[3] - word[1], 1.0)
+            if (last[5], last[6]) == (word[5], word[6]) and word[0] - last[2] <= PDF_TEXT_MERGE_GAP * height:
+                runs[-1].append(word)
+                continue
+        runs.append([word])
+    return runs
+
+
+def page_tokens(page: fitz.Page, zoom: float) -> Optional[TokenTable]:
+    """
+    Tokens of one page in the pixel space of a raster rendered at `zoom`
+    (boxes match what raster OCR would have returned), or None when the
+    page has no usable text layer.
+    """
+    left, top, right, bottom = _unrotated_rect(page)
+    words = [w for w in page.get_text("words", sort=False)
+             if w[0] < right and w[2] > left and w[1] < bottom and w[3] > top]
+    if len(words) < PDF_TEXT_MIN_WORDS:
+        return None
+    if _bad_char_share(words) > PDF_TEXT_MAX_BAD_CHARS or _image_share(page) > PDF_TEXT_MAX_IMAGE_SHARE:
+        return None
+
+    # Word rects are in unrotated page space; the raster is rendered rotated.
+    # Page rotations are multiples of 90 degrees, so boxes stay axis-aligned.
+    a, b, c, d, e, f = page.rotation_matrix * fitz.Matrix(zoom, zoom)
+    runs = _merge_words(words)
+    boxes = []
+    for run in runs:
+        wx0 = min(w[0] for w in run)
+        wy0 = min(w[1] for w in run)
+        wx1 = max(w[2] for w in run)
+        wy1 = max(w[3] for w in run)
+        px0, py0 = a * wx0 + c * wy0 + e, b * wx0 + d * wy0 + f
+        px1, py1 = a * wx1 + c * wy1 + e, b * wx1 + d * wy1 + f
+        x0, x1 = round(min(px0, px1), 1), round(max(px0, px1), 1)
+        y0, y1 = round(min(py0, py1), 1), round(max(py0, py1), 1)
+        boxes.append(((x0, y0), (x1, y0), (x1, y1), (x0, y1)))
+    return TokenTable([" ".join(word[4] for word in run) for run in runs], boxes, np.ones(len(runs)))
+
+
+def pdf_text_tokens(doc: fitz.Document, index: int, dpi: int, max_dimension: int) -> Optional[TokenTable]:
+    """
+    Text-layer tokens of page `index`, in the coordinates render_pdf_page
+    would produce with the same dpi / max_dimension; None for scanned pages.
+    """
+    page = doc.load_page(index)
+    return page_tokens(page, pdf_page_zoom(page, dpi, max_dimension))
@@ -0,0 +1,206 @@
+"""
+OCR Token Module
+Columnar container for OCR tokens: one text list plus float32 box and
+confidence arrays, instead of a dict with a list-of-lists box per token.
+Stages that work on geometry (merge, layout, recovery) read the arrays
+directly; record dicts ({text, box, confidence}) are only built at the edges.
+
+Wire layouts (see to_records / to_columnar / to_packed):
+    records   [{text, box: [[x, y] * 4], confidence}, ...]   (default JSON)
+    columnar  {text: [...], box: [x0, y0, ... 8 per token], confidence: [...]}
+    packed    {text: [...], box: float32 LE bytes (N, 4, 2), confidence: float32 LE bytes}
+"""
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+Record = Dict[str, Any]
+
+# Marker key for token tables inside JSON cache payloads
+_JSON_TAG = "__tokens__"
+
+
+class TokenTable:
+    """
+    Immutable-by-convention table of N OCR tokens.
+
+    Attributes:
+        texts: N strings
+        boxes: (N, 4, 2) float32 quadrilaterals, clockwise from top-left
+        confidences: (N,) float32 recognition scores
+
+    Indexing with an int returns the token as a record dict, so code that
+    only reads a few tokens can keep treating the table as a list.
+    """
+
+    __slots__ = ("texts", "boxes", "confidences")
+
+    def __init__(self, texts: Iterable[str], boxes: Any, confidences: Any):
+        self.texts: List[str] = list(texts)
+        self.boxes: np.ndarray = np.ascontiguousarray(boxes, dtype=np.float32).reshape(-1, 4, 2)
+        self.confidences: np.ndarray = np.ascontiguousarray(confidences, dtype=np.float32).reshape(-1)
+        if not len(self.texts) == len(self.boxes) == len(self.confidences):
+            raise ValueError("texts, boxes and confidences differ in length")
+
+    @classmethod
+    def empty(cls) -> "TokenTable":
+        return cls([], np.empty((0, 4, 2), dtype=np.float32), np.empty(0, dtype=np.float32))
+
+    @classmethod
+    def from_records(cls, records: Sequence[Record]) -> "TokenTable":
+        """
+        Build from {text, box, confidence} dicts. Polygons with other than
+        four points are reduced to their axis-aligned bounding quad.
+        """
+        if isinstance(records, TokenTable):
+            return records
+        if not records:
+            return cls.empty()
+        texts = [item["text"] for item in records]
+        confidences = np.fromiter((item.get("confidence", 0.0) for item in records), dtype=np.float32,
+                                  count=len(records))
+        # One flat pass over the coordinates is much cheaper than asarray on nested lists
+        flat = np.fromiter(chain.from_iterable(chain.from_iterable(item["box"] for item in records)),
+                           dtype=np.float32)
+        if flat.size == len(records) * 8:
+            boxes = flat.reshape(-1, 4, 2)
+        else:
+            boxes = np.empty((len(records), 4, 2), dtype=np.float32)
+            for i, item in enumerate(records):
+                pts = np.asarray(item["box"], dtype=np.float32).reshape(-1, 2)
+                (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+                boxes[i] = ((x0, y0), (x1, y0), (x1, y1), (x0, y1))
+        return cls(texts, boxes, confidences)
+
+    @classmethod
+    def from_paddle(cls, result: Any) -> "TokenTable":
+        """From PaddleOCR's ocr() output for one image: [[box, (text, score)], ...]."""
+        lines = result[0] if result and result[0] else []
+        if not lines:
+            return cls.empty()
+        return cls(
+            [line[1][0] for line in lines],
+            [line[0] for line in lines],
+            [float(line[1][1]) for line in lines],
+        )
+
+    @classmethod
+    def from_columnar(cls, data: Dict[str, Any]) -> "TokenTable":
+        return cls(data["text"], data["box"], data["confidence"])
+
+    @classmethod
+    def from_packed(cls, data: Dict[str, Any]) -> "TokenTable":
+        return cls(
+            data["text"],
+            np.frombuffer(data["box"], dtype="<f4"),
+            np.frombuffer(data["confidence"], dtype="<f4"),
+        )
+
+    @classmethod
+    def concat(cls, tables: Sequence["TokenTable"], y_offsets: Optional[Sequence[float]] = None) -> "TokenTable":
+        """Stack tables into one, optionally shifting each table down by its offset."""
+        tables = [as_token_table(t) for t in tables]
+        if not tables:
+            return cls.empty()
+        boxes = np.concatenate([t.boxes for t in tables])
+        if y_offsets is not None:
+            boxes[:, :, 1] += np.repeat(np.asarray(y_offsets, dtype=np.float32), [len(t) for t in tables])[:, None]
+        return cls(
+            [text for t in tables for text in t.texts],
+            boxes,
+            np.concatenate([t.confidences for t in tables]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Record, "TokenTable"]:
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        return {
+            "text": self.texts[index],
+            "box": np.round(self.boxes[index].astype(np.float64), 2).tolist(),
+            "confidence": round(float(self.confidences[index]), 4),
+        }
+
+    def __iter__(self) -> Iterator[Record]:
+        return iter(self.to_records())
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, TokenTable):
+            return NotImplemented
+        return (self.texts == other.texts and np.array_equal(self.boxes, other.boxes)
+                and np.array_equal(self.confidences, other.confidences))
+
+    def __repr__(self) -> str:
+        return f"TokenTable({len(self)} tokens)"
+
+    def bounds(self) -> np.ndarray:
+        """Axis-aligned [x0, y0, x1, y1] per token, (N, 4) float32."""
+        return np.concatenate([self.boxes.min(axis=1), self.boxes.max(axis=1)], axis=1)
+
+    def take(self, indices: Any) -> "TokenTable":
+        """Tokens at the given indices (or boolean mask), in that order."""
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        return TokenTable([self.texts[i] for i in indices.tolist()], self.boxes[indices], self.confidences[indices])
+
+    def replace(self, indices: Sequence[int], texts: Sequence[str], confidences: Sequence[float]) -> "TokenTable":
+        """Copy with the text and confidence of some tokens replaced; boxes are kept."""
+        new_texts = list(self.texts)
+        new_conf = self.confidences.copy()
+        for i, text, score in zip(indices, texts, confidences):
+            new_texts[i] = text
+            new_conf[i] = score
+        return TokenTable(new_texts, self.boxes, new_conf)
+
+    def to_records(self) -> List[Record]:
+        """The tokens as {text, box, confidence} dicts (boxes to 0.01 px, scores to 4 places)."""
+        boxes = np.round(self.boxes.astype(np.float64), 2).tolist()
+        confidences = np.round(self.confidences.astype(np.float64), 4).tolist()
+        return [
+            {"text": text, "box": box, "confidence": score}
+            for text, box, score in zip(self.texts, boxes, confidences)
+        ]
+
+    def to_columnar(self) -> Dict[str, Any]:
+        """One list per field; boxes flattened to 8 numbers per token."""
+        return {
+            "text": self.texts,
+            "box": np.round(self.boxes.astype(np.float64), 2).ravel().tolist(),
+            "confidence": np.round(self.confidences.astype(np.float64), 4).tolist(),
+        }
+
+    def to_packed(self) -> Dict[str, Any]:
+        """Columnar with the numeric columns as raw little-endian float32 bytes (for msgpack)."""
+        return {
+            "text": self.texts,
+            "box": self.boxes.astype("<f4", copy=False).tobytes(),
+            "confidence": self.confidences.astype("<f4", copy=False).tobytes(),
+        }
+
+
+Tokens = Union[TokenTable, Sequence[Record]]
+
+
+def as_token_table(tokens: Optional[Tokens]) -> TokenTable:
+    """Accept a TokenTable or a list of record dicts (None is empty)."""
+    if tokens is None:
+        return TokenTable.empty()
+    return TokenTable.from_records(tokens)
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps hook that stores token tables columnar, tagged for json_object_hook."""
+    if isinstance(value, TokenTable):
+        return {_JSON_TAG: value.to_columnar()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_object_hook(obj: Dict[str, Any]) -> Any:
+    """json.loads hook reviving the token tables written by json_default."""
+    if len(obj) == 1 and _JSON_TAG in obj:
+        return TokenTable.from_columnar(obj[_JSON_TAG])
+    return obj
@@ -0,0 +1,91 @@
+"""
+Upload Module
+An upload's bytes without a second copy in RAM.
+
+The multipart parser has already spooled every upload over 1 MB to a temp
+file before the endpoint runs. Uploads up to the map threshold are read into
+memory as before; larger ones are mapped read-only from that temp file, so
+decoders (OpenCV, PyMuPDF, hashing) read the file's pages straight from the
+page cache. The kernel pages them in on demand and can drop them again
+under memory pressure, and the mapping outlives the request (queued jobs).
+"""
+import logging
+import mmap
+from typing import Any, Optional, Union
+
+logger = logging.getLogger("ocr-service.uploads")
+
+READ_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the size limit."""
+
+
+class Upload:
+    """
+    Bytes of one upload as `data`: a bytearray, or a read-only memoryview of
+    a memory-mapped temp file (`mapped`). Both work wherever the decoders
+    accept a bytes-like buffer. close() releases the mapping; pickling (for
+    process pool workers) ships a copy of the bytes.
+    """
+
+    __slots__ = ("data", "size", "_map")
+
+    def __init__(self, data: Union[bytearray, memoryview], mapping: Optional[mmap.mmap] = None):
+        self.data = data
+        self.size = len(data)
+        self._map = mapping
+
+    @property
+    def mapped(self) -> bool:
+        return self._map is not None
+
+    def close(self) -> None:
+        """Unmap a mapped upload; decoders must no longer hold views of it."""
+        if self._map is None:
+            return
+        mapping, data = self._map, self.data
+        self._map, self.data = None, bytearray()
+        try:
+            data.release()
+            mapping.close()
+        except BufferError:  # A view still exists somewhere: unmapped when it is collected
+            logger.debug("Upload mapping still exported; leaving it to the garbage collector")
+
+    def __reduce__(self) -> Any:
+        return Upload, (bytearray(self.data),)
+
+
+async def read_upload(file: Any, max_size: int, map_threshold: int) -> Upload:
+    """
+    Bytes of a Starlette UploadFile, enforcing max_size.
+    Args:
+        file: the UploadFile
+        max_size: largest accepted upload in bytes (UploadTooLarge beyond)
+        map_threshold: uploads larger than this are memory-mapped instead of read
+    Returns:
+        Upload: the bytes; close() it when done
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > max_size:
+        raise UploadTooLarge(f"File exceeds size limit of {max_size / 1024 / 1024}MB")
+    if size is not None and size > map_threshold:
+        try:
+            mapping = mmap.mmap(file.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:  # No real file behind the upload: read it instead
+            logger.debug(f"Upload not mappable ({e}); reading it into memory")
+        else:
+            return Upload(memoryview(mapping), mapping)
+
+    # Read in chunks to avoid blowing RAM on huge bombs (size may be unknown)
+    content = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        content.extend(chunk)
+        if len(content) > max_size:
+            raise UploadTooLarge(f"File exceeds size limit of {max_size / 1024 / 1024}MB")
+        del chunk
+    return Upload(content)
@@ -1,22 +1,29 @@
 """
 Validation Engine Module
 Validates GSTIN, math, and GST rules. Uses Decimal for math.
+validate_invoices_batch checks many invoices at once with the same results.
 """
 import re
+from itertools import chain, repeat
+from operator import itemgetter
 from decimal import Decimal, InvalidOperation
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Sequence
+import numpy as np
+
+_GSTIN_PATTERN = re.compile(r"^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$")
+_GSTIN_CHARSET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+_GSTIN_VALUE = {c: i for i, c in enumerate(_GSTIN_CHARSET)}
+_GSTIN_FACTOR = [1, 2] * 7
 
 def validate_gstin(gstin: str) -> bool:
     """Validates GSTIN format and checksum."""
-    if not re.match(r"^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$", gstin):
+    if not _GSTIN_PATTERN.match(gstin):
         return False
     # Checksum validation (mod 36)
-    factor = [1,2]*7
-    charset = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
     s = 0
     for i, c in enumerate(gstin[:-1]):
-        s += factor[i%14] * charset.index(c)
-    check = charset[s%36]
+        s += _GSTIN_FACTOR[i % 14] * _GSTIN_VALUE[c]
+    check = _GSTIN_CHARSET[s % 36]
     return gstin[-1] == check
 
 def validate_invoice(invoice: Dict[str, Any]) -> Dict[str, Any]:
@@ -56,7 +63,8 @@ def validate_invoice(invoice: Dict[str, Any]) -> Dict[str, Any]:
         taxable = Decimal(str(invoice.get('taxable', '0')))
         tax = Decimal(str(invoice.get('tax', '0')))
         grand_total = Decimal(str(invoice.get('grand_total', '0')))
-        if taxable_sum != taxable:
+        # Without line items (e.g. rule extraction) there is nothing to sum
+        if lines and taxable_sum != taxable:
             field_errors['taxable'] = 'Sum of line totals != taxable'
             score -= Decimal('0.1')
         if taxable + tax != grand_total:
@@ -82,6 +90,268 @@ def validate_invoice(invoice: Dict[str, Any]) -> Dict[str, Any]:
         'confidence_score': float(max(score, Decimal('0')))
     }
 
+# ---------------------------------------------------------------------------
+# Batch validation
+# ---------------------------------------------------------------------------
+
+def _gstin_tables():
+    digit = np.zeros(256, dtype=bool)
+    digit[ord('0'):ord('9') + 1] = True
+    upper = np.zeros(256, dtype=bool)
+    upper[ord('A'):ord('Z') + 1] = True
+    alnum = digit | upper
+    alnum_no_zero = alnum.copy()
+    alnum_no_zero[ord('0')] = False
+    z = np.zeros(256, dtype=bool)
+    z[ord('Z')] = True
+    # Allowed bytes per position, same classes as _GSTIN_PATTERN
+    allowed = np.stack([digit] * 2 + [upper] * 5 + [digit] * 4 + [upper, alnum_no_zero, z, alnum])
+    values = np.zeros(256, dtype=np.int64)
+    values[np.frombuffer(_GSTIN_CHARSET.encode(), dtype=np.uint8)] = np.arange(36)
+    return allowed, values
+
+_GSTIN_ALLOWED, _GSTIN_VALUES = _gstin_tables()
+_GSTIN_CHECK_CHARS = np.frombuffer(_GSTIN_CHARSET.encode(), dtype=np.uint8)
+
+GSTIN_CACHE_MAX = 200_000  # Distinct GSTINs remembered across batches
+_gstin_cache: Dict[str, bool] = {}
+
+def validate_gstins(gstins: Sequence[str]) -> np.ndarray:
+    """
+    validate_gstin over many strings at once.
+    Format and checksum are computed with byte lookup tables over a
+    (n, 15) array; each distinct GSTIN is checked once and remembered, since
+    the same suppliers recur across invoices.
+    Args:
+        gstins: GSTIN strings
+    Returns:
+        np.ndarray: bool per input
+    """
+    unknown = [g for g in dict.fromkeys(gstins) if g not in _gstin_cache]
+    if unknown:
+        results = dict.fromkeys(unknown, False)
+        # Only 15-char ASCII strings can match the pattern
+        candidates = [g for g in unknown if len(g) == 15 and g.isascii()]
+        if candidates:
+            codes = np.frombuffer("".join(candidates).encode("ascii"), dtype=np.uint8).reshape(-1, 15)
+            well_formed = _GSTIN_ALLOWED[np.arange(15), codes].all(axis=1)
+            checksum = (_GSTIN_VALUES[codes[:, :14]] * _GSTIN_FACTOR).sum(axis=1) % 36
+            valid = well_formed & (codes[:, 14] == _GSTIN_CHECK_CHARS[checksum])
+            results.update(zip(candidates, valid.tolist()))
+        if len(_gstin_cache) + len(results) > GSTIN_CACHE_MAX:
+            _gstin_cache.clear()
+        _gstin_cache.update(results)
+    return np.fromiter((_gstin_cache[g] for g in gstins), dtype=bool, count=len(gstins))
+
+# Amounts in the integer path are paise (value * 100). Bounded so qty * rate
+# fits in int64 and every Decimal operation on them is exact (< 28 digits).
+_PAISE_LIMIT = 2 ** 31
+_MAX_NUMBER_CHARS = 19  # sign + 15 digits + "." + 2 decimals
+
+_POWERS_OF_TEN = 10 ** np.arange(18, dtype=np.int64)
+
+_INT, _FLOAT, _TEXT, _OTHER = range(4)
+_KINDS = {int: _INT, float: _FLOAT, str: _TEXT, Decimal: _TEXT}
+
+def _text_to_paise(strs: List[str]):
+    """
+    Plain decimal strings ([+-]digits[.d or .dd]) to paise, parsed over one
+    byte buffer of all strings; per-string sums are differences of running
+    sums (int64 wrap-around cancels out). Returns (paise, ok).
+    """
+    n = len(strs)
+    lengths = np.fromiter(map(len, strs), dtype=np.int64, count=n)
+    text = "".join(strs)
+    if not text.isascii():
+        ascii_only = np.fromiter(map(str.isascii, strs), dtype=bool, count=n)
+        strs = [s if a else "" for s, a in zip(strs, ascii_only.tolist())]
+        lengths[~ascii_only] = 0
+        text = "".join(strs)
+    chars = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    owner = np.repeat(np.arange(n), lengths)
+    pos = np.arange(chars.size) - starts[owner]
+
+    def per_string(values):
+        running = np.concatenate([[0], np.cumsum(values, dtype=np.int64)])
+        return running[ends] - running[starts]
+
+    first = np.zeros(n, dtype=np.uint8)
+    first[lengths > 0] = chars[starts[lengths > 0]]
+    signed = (first == ord("-")) | (first == ord("+"))
+    digits = chars - np.uint8(ord("0"))  # Wraps around for anything below "0"
+    is_digit = digits <= 9
+    is_dot = chars == ord(".")
+    dots = per_string(is_dot)
+    dot_at = np.where(dots == 1, per_string(is_dot * pos), lengths)
+    whole_digits = dot_at - signed
+    frac_digits = np.where(dots == 1, lengths - dot_at - 1, 0)
+    ok = ((lengths <= _MAX_NUMBER_CHARS) & (dots <= 1) & (per_string(is_digit) + dots + signed == lengths)
+          & (whole_digits >= 1) & (whole_digits <= 15) & ((dots == 0) | (frac_digits >= 1)) & (frac_digits <= 2))
+
+    # Each digit's place value in paise: the last whole digit is 100, then 10 and 1 after the dot
+    dot_of_char = dot_at[owner]
+    place = dot_of_char + 1 - pos + (pos > dot_of_char)
+    np.clip(place, 0, len(_POWERS_OF_TEN) - 1, out=place)
+    paise = per_string(np.where(is_digit, digits, 0) * _POWERS_OF_TEN[place])
+    return np.where(first == ord("-"), -paise, paise), ok
+
+def _to_paise(values: List[Any]):
+    """
+    Exact paise for every value, equal to what Decimal(str(value)) gives in
+    validate_invoice. Returns (paise, ok); ok is False for anything outside
+    the exact int64 domain (whitespace, exponents, NaN, >2 decimals, None,
+    bools, huge amounts, ...), which is left to Decimal.
+    - int: value * 100
+    - float: repr() is the shortest round-tripping string, so a float that
+      is exactly paise / 100 (floats are < 0.01 apart here) has that value
+    - str / Decimal: parsed from str()
+    """
+    n = len(values)
+    paise = np.zeros(n, dtype=np.int64)
+    ok = np.zeros(n, dtype=bool)
+    if not n:
+        return paise, ok
+    kinds = np.fromiter(map(_KINDS.get, map(type, values), repeat(_OTHER, n)), dtype=np.int8, count=n)
+    objects = np.fromiter(values, dtype=object, count=n)
+
+    idx = np.flatnonzero(kinds == _INT)
+    if idx.size:
+        try:
+            as_float = objects[idx].astype(np.float64)
+        except OverflowError:
+            as_float = np.full(idx.size, np.inf)
+        fits = np.abs(as_float) < _PAISE_LIMIT / 100
+        paise[idx[fits]] = objects[idx[fits]].astype(np.int64) * 100
+        ok[idx] = fits
+
+    idx = np.flatnonzero(kinds == _FLOAT)
+    if idx.size:
+        as_float = objects[idx].astype(np.float64)
+        scaled = np.rint(as_float * 100)
+        fits = (np.abs(scaled) < _PAISE_LIMIT) & (scaled / 100 == as_float)
+        paise[idx[fits]] = scaled[fits].astype(np.int64)
+        ok[idx] = fits
+
+    idx = np.flatnonzero(kinds == _TEXT)
+    if idx.size:
+        text_paise, text_ok = _text_to_paise(list(map(str, objects[idx])))
+        fits = text_ok & (np.abs(text_paise) < _PAISE_LIMIT)
+        paise[idx[fits]] = text_paise[fits]
+        ok[idx] = fits
+    return paise, ok
+
+_row_values = itemgetter('qty', 'rate', 'total')
+
+def _score(decrements: int) -> float:
+    """Same float as validate_invoice's Decimal score; decrements in hundredths."""
+    return max(100 - decrements, 0) / 100
+
+def validate_invoices_batch(invoices: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validates many invoices; element-for-element equal to validate_invoice.
+    GSTINs go through validate_gstins. Line and total math runs as int64
+    paise over all rows of the batch at once; an invoice with any value
+    outside that exact domain is validated with the Decimal path instead.
+    Args:
+        invoices: Structured invoice dicts
+    Returns:
+        list: {is_valid, field_errors, row_errors, confidence_score} per invoice
+    """
+    n = len(invoices)
+    fallback = np.zeros(n, dtype=bool)
+    row_counts = np.zeros(n, dtype=np.int64)
+    get = dict.get
+    heads = list(chain.from_iterable(
+        (get(invoice, 'taxable', '0'), get(invoice, 'tax', '0'), get(invoice, 'grand_total', '0'))
+        if type(invoice) is dict else ('0', '0', '0') for invoice in invoices
+    ))  # taxable, tax, grand_total for every invoice
+    all_lines = [invoice.get('lines', []) for invoice in invoices]
+    # Rows must be plain dicts: itemgetter and .get differ on subclasses (defaultdict)
+    plain_rows = set(map(type, chain.from_iterable(
+        lines for lines in all_lines if type(lines) is list))) <= {dict}
+    cells: List[Any] = []   # qty, rate, total for every row
+    for i, lines in enumerate(all_lines):
+        if type(lines) is not list or not (plain_rows or all(type(row) is dict for row in lines)):
+            fallback[i] = True
+            continue
+        start = len(cells)
+        try:
+            cells.extend(chain.from_iterable(map(_row_values, lines)))
+        except KeyError:  # Missing cells count as '0', like row.get(..., '0')
+            del cells[start:]
+            cells.extend(chain.from_iterable(
+                (row.get('qty', '0'), row.get('rate', '0'), row.get('total', '0')) for row in lines
+            ))
+        row_counts[i] = len(lines)
+
+    cell_paise, cell_ok = _to_paise(cells)
+    rows = cell_paise.reshape(-1, 3)
+    head_paise, head_ok = _to_paise(heads)
+    totals = head_paise.reshape(-1, 3)
+
+    row_invoice = np.repeat(np.arange(n), row_counts)
+    fallback |= np.bincount(row_invoice[~cell_ok.reshape(-1, 3).all(axis=1)], minlength=n) > 0
+    fallback |= ~head_ok.reshape(-1, 3).all(axis=1)
+
+    mismatch = rows[:, 0] * rows[:, 1] != rows[:, 2] * 100  # qty x rate != total, both in 1/10000
+    ends = np.cumsum(row_counts)
+    starts = ends - row_counts
+    running = np.concatenate([[0], np.cumsum(rows[:, 2])])
+    taxable_error = (row_counts > 0) & (running[ends] - running[starts] != totals[:, 0])
+    grand_total_error = totals[:, 0] + totals[:, 1] != totals[:, 2]
+
+    bad_rows: Dict[int, List[Dict[str, Any]]] = {}
+    for r in np.flatnonzero(mismatch).tolist():
+        i = int(row_invoice[r])
+        bad_rows.setdefault(i, []).append({'row': r - int(starts[i]), 'error': 'qty x rate != total'})
+
+    gstins = [invoice.get('gstin') for invoice in invoices]
+    checked = [i for i, g in enumerate(gstins) if g and type(g) is str]
+    gstin_error = np.zeros(n, dtype=bool)
+    gstin_error[checked] = ~validate_gstins([gstins[i] for i in checked])
+    for i, g in enumerate(gstins):
+        if g and type(g) is not str:
+            gstin_error[i] = not validate_gstin(g)
+
+    # Score decrements in hundredths, all but the GST rules
+    decrements = (20 * gstin_error + 10 * taxable_error + 10 * grand_total_error
+                  + 5 * np.bincount(row_invoice[mismatch], minlength=n)).tolist()
+    flags = zip(fallback.tolist(), gstin_error.tolist(), taxable_error.tolist(), grand_total_error.tolist())
+    results = []
+    append = results.append
+    for i, (use_decimal, bad_gstin, bad_taxable, bad_grand_total) in enumerate(flags):
+        invoice = invoices[i]
+        if use_decimal:
+            append(validate_invoice(invoice))
+            continue
+        field_errors = {}
+        if bad_gstin:
+            field_errors['gstin'] = 'Invalid GSTIN'
+        if bad_taxable:
+            field_errors['taxable'] = 'Sum of line totals != taxable'
+        if bad_grand_total:
+            field_errors['grand_total'] = 'taxable + tax != grand_total'
+        decrement = decrements[i]
+        cgst = invoice.get('cgst')
+        sgst = invoice.get('sgst')
+        igst = invoice.get('igst')
+        if cgst and not sgst:
+            field_errors['sgst'] = 'CGST present, SGST missing'
+            decrement += 10
+        if igst and (cgst or sgst):
+            field_errors['igst'] = 'IGST with CGST/SGST not allowed'
+            decrement += 10
+        row_errors = bad_rows.get(i, [])
+        append({
+            'is_valid': not field_errors and not row_errors,
+            'field_errors': field_errors,
+            'row_errors': row_errors,
+            'confidence_score': _score(decrement)
+        })
+    return results
+
 if __name__ == "__main__":
     # Example usage
     sample = {